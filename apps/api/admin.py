@@ -0,0 +1,16 @@
+from django.contrib import admin
+from apps.api.models import Measurement, PVString, Site
+
+# Register your models here.
+
+
+admin.site.register(Site)
+admin.site.register(PVString)
+
+
+@admin.register(Measurement)
+class MeasurementAdmin(admin.ModelAdmin):
+    list_display = ('string', 'measured_at', 'fault_class', 'probability', 'model_version')
+    list_filter = ('fault_class',)
+    raw_id_fields = ('site', 'string')
+    exclude = ('curve',)
@@ -0,0 +1,159 @@
+"""
+RandomForest + StandardScaler compiled to flat NumPy arrays.
+
+Every tree of the fitted forest is appended to one set of node arrays
+(feature, threshold, left, right) with global child indices. Leaves point to
+themselves, so a batch descends all trees at once in exactly `max_depth`
+vectorized steps, with no per-node branching. Each leaf holds its normalized
+class distribution. Trees are summed in the same order as
+RandomForestClassifier.predict_proba and features are compared as float32
+like sklearn's trees, so the probabilities are identical. Serving from the
+exported .npz needs only numpy, not sklearn or joblib.
+"""
+
+import os
+import tempfile
+
+import numpy as np
+
+
+# Bump when the file layout changes; older files are then rejected
+COMPILED_VERSION = 1
+
+
+def compile_forest(scaler, classifier, source_version=''):
+    """
+    Flattens a fitted StandardScaler and RandomForestClassifier into arrays.
+    :param source_version str: model version of the pickles it came from, so
+        both backends report the same model_version
+    :rtype: dict of arrays, as stored by save_compiled
+    """
+    if getattr(classifier, 'n_outputs_', 1) != 1:
+        raise ValueError('Only single-output forests can be compiled')
+
+    features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+    offset, max_depth = 0, 0
+    for estimator in classifier.estimators_:
+        tree = estimator.tree_
+        n = tree.node_count
+        leaf = tree.children_left == -1
+        own = np.arange(offset, offset + n)
+
+        features.append(np.where(leaf, 0, tree.feature).astype(np.int32))
+        thresholds.append(np.where(leaf, np.inf, tree.threshold))
+        lefts.append(np.where(leaf, own, tree.children_left + offset).astype(np.int32))
+        rights.append(np.where(leaf, own, tree.children_right + offset).astype(np.int32))
+
+        # Older sklearn stores class counts and normalizes them in
+        # DecisionTreeClassifier.predict_proba; 1.4+ stores the fractions and
+        # returns them as-is, so those (summing to 1 within rounding) are kept
+        value = tree.value[:, 0, :].astype(float)
+        normalizer = value.sum(axis=1, keepdims=True)
+        normalizer[(normalizer == 0.0) | (np.abs(normalizer - 1) < 1e-9)] = 1.0
+        values.append(value / normalizer)
+
+        roots.append(offset)
+        offset += n
+        max_depth = max(max_depth, tree.max_depth)
+
+    with_mean = getattr(scaler, 'with_mean', True) and scaler.mean_ is not None
+    with_std = getattr(scaler, 'with_std', True) and scaler.scale_ is not None
+    n_features = len(scaler.feature_names_in_)
+    classes = np.asarray(classifier.classes_)
+    if classes.dtype == object:
+        # Object arrays would need pickle to load
+        classes = classes.astype(str)
+    return {
+        'format': np.array(COMPILED_VERSION),
+        'source_version': np.array(source_version),
+        'feature_names': np.asarray(scaler.feature_names_in_, dtype=str),
+        'classes': classes,
+        'mean': np.asarray(scaler.mean_, dtype=float) if with_mean else np.zeros(n_features),
+        'scale': np.asarray(scaler.scale_, dtype=float) if with_std else np.ones(n_features),
+        'feature': np.concatenate(features),
+        'threshold': np.concatenate(thresholds),
+        'left': np.concatenate(lefts),
+        'right': np.concatenate(rights),
+        'value': np.concatenate(values),
+        'roots': np.array(roots, dtype=np.int32),
+        'max_depth': np.array(max_depth),
+    }
+
+
+def save_compiled(path, arrays):
+    """
+    Writes the compiled arrays as an uncompressed .npz, atomically.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.npz')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, path)
+    except Exception:
+        os.unlink(tmp_path)
+        raise
+
+
+class CompiledForest:
+    """
+    Drop-in for the (scaler, classifier) pair used by apps.api.inference.classify:
+    exposes feature_names_in_ and transform() like the scaler, classes_ and
+    predict_proba() like the forest.
+    """
+
+    def __init__(self, arrays):
+        if int(arrays['format']) != COMPILED_VERSION:
+            raise ValueError('Unsupported compiled forest format')
+        self.source_version = str(arrays['source_version'])
+        self.feature_names_in_ = np.asarray(arrays['feature_names'], dtype=object)
+        self.classes_ = np.asarray(arrays['classes'])
+        self.mean = np.asarray(arrays['mean'], dtype=float)
+        self.scale = np.asarray(arrays['scale'], dtype=float)
+        self.feature = np.asarray(arrays['feature'])
+        self.threshold = np.asarray(arrays['threshold'])
+        self.left = np.asarray(arrays['left'])
+        self.right = np.asarray(arrays['right'])
+        self.value = np.asarray(arrays['value'])
+        self.roots = np.asarray(arrays['roots'])
+        self.max_depth = int(arrays['max_depth'])
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as arrays:
+            return cls({name: arrays[name] for name in arrays.files})
+
+    def transform(self, X):
+        """
+        StandardScaler.transform: (X - mean) / scale in float64.
+        """
+        X = np.array(X, dtype=float)
+        X -= self.mean
+        X /= self.scale
+        return X
+
+    def leaves(self, X):
+        """
+        Leaf node index of every (row, tree), shape (N, n_trees).
+        """
+        # sklearn trees compare float32 features against float64 thresholds
+        X = np.asarray(X, dtype=np.float32)
+        rows = np.arange(len(X))[:, None]
+        node = np.broadcast_to(self.roots, (len(X), len(self.roots)))
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[node]] <= self.threshold[node]
+            node = np.where(go_left, self.left[node], self.right[node])
+        return node
+
+    def predict_proba(self, X):
+        node = self.leaves(X)
+        proba = np.zeros((len(node), len(self.classes_)))
+        # Tree by tree, like RandomForestClassifier, for bit-identical sums
+        for tree in range(node.shape[1]):
+            proba += self.value[node[:, tree]]
+        proba /= node.shape[1]
+        return proba
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
@@ -0,0 +1,119 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+def quantize(value, step):
+    """
+    Rounds `value` to the nearest multiple of `step`, so nearby slider positions
+    share one cache entry.
+    """
+    return round(round(float(value) / step) * step, 6)
+
+
+# Bump when the cached payload layout changes so shared caches and client
+# ETags from older deploys are not served
+PAYLOAD_VERSION = 2
+
+
+def curve_key(*parts):
+    """
+    Builds a stable cache key (also used as the ETag) from the curve inputs.
+    """
+    raw = '|'.join(str(p) for p in (PAYLOAD_VERSION,) + parts)
+    return 'iv-curve:' + hashlib.sha1(raw.encode()).hexdigest()
+
+
+class CurveCache:
+    """
+    Two-tier cache for computed IV-curve payloads: a bounded in-process LRU in
+    front of a shared Django cache (Redis in production).
+    """
+
+    def __init__(self, maxsize, alias=None, timeout=None):
+        self.maxsize = maxsize
+        self.alias = alias
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._local = OrderedDict()
+        self.local_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.shared_errors = 0
+
+    def _shared(self):
+        return caches[self.alias] if self.alias else None
+
+    def _remember(self, key, value):
+        with self._lock:
+            self._local[key] = value
+            self._local.move_to_end(key)
+            while len(self._local) > self.maxsize:
+                self._local.popitem(last=False)
+
+    def get_or_compute(self, key, compute):
+        """
+        Returns `(value, tier)` where tier is 'local', 'shared' or 'miss'.
+        """
+        with self._lock:
+            if key in self._local:
+                self._local.move_to_end(key)
+                self.local_hits += 1
+                return self._local[key], 'local'
+
+        shared = self._shared()
+        if shared is not None:
+            try:
+                value = shared.get(key)
+            except Exception:
+                # A down cache server must not take the endpoint with it
+                value = None
+                self.shared_errors += 1
+            if value is not None:
+                self.shared_hits += 1
+                self._remember(key, value)
+                return value, 'shared'
+
+        value = compute()
+        self.misses += 1
+        self._remember(key, value)
+        if shared is not None:
+            try:
+                shared.set(key, value, self.timeout)
+            except Exception:
+                self.shared_errors += 1
+        return value, 'miss'
+
+    def clear(self):
+        with self._lock:
+            self._local.clear()
+
+    def stats(self):
+        lookups = self.local_hits + self.shared_hits + self.misses
+        return {
+            'size': len(self._local),
+            'maxsize': self.maxsize,
+            'local_hits': self.local_hits,
+            'shared_hits': self.shared_hits,
+            'misses': self.misses,
+            'shared_errors': self.shared_errors,
+            'hit_ratio': (self.local_hits + self.shared_hits) / lookups if lookups else 0,
+        }
+
+
+_cache = None
+
+
+def get_curve_cache():
+    """
+    Returns the process-wide curve cache configured from settings.
+    """
+    global _cache
+    if _cache is None:
+        _cache = CurveCache(settings.IV_CURVE_CACHE_SIZE,
+                            alias=settings.IV_CURVE_CACHE_ALIAS,
+                            timeout=settings.IV_CURVE_CACHE_TIMEOUT)
+    return _cache
@@ -0,0 +1,360 @@
+"""
+Precomputed IV-curve lookup surfaces.
+
+For a given module, a surface tabulates the exact singlediode solution on an
+(irradiance, temperature) grid. Each node stores:
+
+- the KEY_POINTS of one module;
+- the curve shape I / Isc sampled at SHAPE_POINTS uniform fractions of Voc.
+
+Queries inside the grid are answered by bilinear interpolation of both. The
+interpolated shape is then rescaled by the interpolated Isc and Voc, so no
+solver runs. When a surface is built, each grid cell is checked against the
+exact solver on a PROBES x PROBES lattice spanning the cell (edges and centre
+included). The worst relative error, plus PROBE_MARGIN, is stored per cell.
+A query is interpolated only when its cell's error is within the allowed
+bound. Queries outside the grid, or in a cell above the bound, go to the
+exact solver.
+"""
+
+import hashlib
+import os
+import tempfile
+import threading
+
+import numpy as np
+from django.conf import settings
+
+from apps.api.iv_curves import CEC_FIELDS, KEY_POINTS, adaptive_voltage_grid, compute_iv_curves, stack_module_params
+
+
+# Curve shape samples per grid node, uniform in V / Voc
+SHAPE_POINTS = 256
+
+# Points per axis at which each cell is checked against the exact solver
+PROBES = 5
+
+# The error peaks between probes, away from the cell centre along the
+# irradiance axis; the worst probe is scaled by this to bound the whole cell
+PROBE_MARGIN = 1.1
+
+# Bump when the file layout or the error check changes; older files are then ignored
+SURFACE_VERSION = 2
+
+# R_sh is inversely proportional to irradiance in the CEC model, so its
+# inverse is tabulated to keep it linear along the irradiance axis
+_SHUNT = KEY_POINTS.index('r_sh')
+
+
+def surface_filename(manufacturer, model):
+    digest = hashlib.sha1(f'{manufacturer}|{model}'.encode()).hexdigest()
+    return digest + '.npz'
+
+
+def _params_vector(params):
+    return np.array([float(np.asarray(params[field]).ravel()[0]) for field in CEC_FIELDS])
+
+
+def _tile(params, n):
+    return {key: np.repeat(np.asarray(value, dtype=float).ravel()[:1], n) for key, value in params.items()}
+
+
+def _exact(params, irradiance, temperature, points=SHAPE_POINTS):
+    n = len(irradiance)
+    return compute_iv_curves(_tile(params, n), irradiance, temperature, points=points)
+
+
+def _locate(grid, x):
+    """
+    Cell index and weight of each query along one grid axis.
+    """
+    index = np.clip(np.searchsorted(grid, x, side='right') - 1, 0, len(grid) - 2)
+    weight = (x - grid[index]) / (grid[index + 1] - grid[index])
+    return index, weight
+
+
+def _bilinear(table, gi, gw, ti, tw):
+    """
+    Interpolates table (G, T, K) at N located points, giving (N, K).
+    """
+    gw, tw = gw[:, None], tw[:, None]
+    return ((1 - gw) * (1 - tw) * table[gi, ti] + gw * (1 - tw) * table[gi + 1, ti]
+            + (1 - gw) * tw * table[gi, ti + 1] + gw * tw * table[gi + 1, ti + 1])
+
+
+def _sample_shapes(shapes, fractions):
+    """
+    Row-wise linear interpolation of shapes (N, S), sampled uniformly on
+    [0, 1], at fractions (N, P) of Voc. Past Voc the current is 0.
+    """
+    last = shapes.shape[1] - 1
+    position = np.clip(np.nan_to_num(fractions), 0, 1) * last
+    lo = np.minimum(position.astype(int), last - 1)
+    weight = position - lo
+    y0 = np.take_along_axis(shapes, lo, axis=1)
+    y1 = np.take_along_axis(shapes, lo + 1, axis=1)
+    return np.where(fractions > 1, 0, y0 + weight * (y1 - y0))
+
+
+class Surface:
+    """
+    Interpolation tables of one module, as written by build_surface.
+    """
+
+    def __init__(self, arrays, version=None):
+        self.irradiance = np.asarray(arrays['irradiance'], dtype=float)
+        self.temperature = np.asarray(arrays['temperature'], dtype=float)
+        self.key_points = np.asarray(arrays['key_points'], dtype=float)
+        self.shapes = np.asarray(arrays['shapes'])
+        self.params = np.asarray(arrays['params'], dtype=float)
+        self.cell_error = np.asarray(arrays['cell_error'], dtype=float)
+        self.version = version
+
+    @property
+    def error_bound(self):
+        """
+        Worst relative error over all cells.
+        """
+        return float(self.cell_error.max())
+
+    def matches(self, row):
+        """
+        True when the surface was built from the same CEC parameters as `row`.
+        """
+        return np.allclose(self.params, [float(row[field]) for field in CEC_FIELDS], rtol=1e-12, atol=0)
+
+    def error_at(self, irradiance, temperature):
+        """
+        Error bound of the cells holding the queries; inf outside the grid.
+        """
+        irradiance = np.atleast_1d(np.asarray(irradiance, dtype=float))
+        temperature = np.broadcast_to(np.asarray(temperature, dtype=float), irradiance.shape)
+        inside = ((irradiance >= self.irradiance[0]) & (irradiance <= self.irradiance[-1])
+                  & (temperature >= self.temperature[0]) & (temperature <= self.temperature[-1]))
+        gi, _ = _locate(self.irradiance, irradiance)
+        ti, _ = _locate(self.temperature, temperature)
+        return np.where(inside, self.cell_error[gi, ti], np.inf)
+
+    def lookup(self, irradiance, temperature):
+        """
+        Interpolated module-level key points (dict of length-N arrays) and
+        shapes (N, SHAPE_POINTS).
+        """
+        irradiance = np.atleast_1d(np.asarray(irradiance, dtype=float))
+        temperature = np.broadcast_to(np.asarray(temperature, dtype=float), irradiance.shape)
+        gi, gw = _locate(self.irradiance, irradiance)
+        ti, tw = _locate(self.temperature, temperature)
+        table = _bilinear(self.key_points, gi, gw, ti, tw)
+        key_points = {name: table[:, k] for k, name in enumerate(KEY_POINTS)}
+        with np.errstate(divide='ignore'):
+            key_points['r_sh'] = 1 / key_points['r_sh']
+        return key_points, _bilinear(self.shapes, gi, gw, ti, tw).astype(float)
+
+    def evaluate(self, irradiance, temperature, modules=1, points=100, sampling='uniform', degradation=0):
+        """
+        Same contract as compute_iv_curves for N operating points of this module.
+        """
+        kp, shapes = self.lookup(irradiance, temperature)
+        n = len(kp['v_oc'])
+        modules = np.broadcast_to(np.asarray(modules, dtype=float), (n,))
+        retained = 1 - np.broadcast_to(np.asarray(degradation, dtype=float), (n,))
+        scale = np.sqrt(retained)
+
+        if sampling == 'adaptive':
+            V = adaptive_voltage_grid(kp['v_mp'], kp['v_oc'], points)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                fractions = V / kp['v_oc'][:, None]
+        else:
+            fractions = np.broadcast_to(np.linspace(0, 1, points), (n, points))
+            V = kp['v_oc'][:, None] * fractions
+        I = kp['i_sc'][:, None] * _sample_shapes(shapes, fractions)
+
+        V = V * (modules * scale)[:, None]
+        I = I * scale[:, None]
+        P = I * V
+
+        i_sc = kp['i_sc'] * scale
+        v_oc = kp['v_oc'] * modules * scale
+        p_mp = kp['p_mp'] * modules * retained
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ff = np.where(i_sc * v_oc != 0, p_mp / (i_sc * v_oc), 0)
+        key_points = {
+            'i_sc': i_sc,
+            'v_oc': v_oc,
+            'i_mp': kp['i_mp'] * scale,
+            'v_mp': kp['v_mp'] * modules * scale,
+            'p_mp': p_mp,
+            'ff': ff,
+            'r_s': kp['r_s'] * modules,
+            'r_sh': kp['r_sh'] * modules,
+        }
+        return V, I, P, key_points
+
+
+def compare(surface, params, irradiance, temperature):
+    """
+    Compares the surface with the exact solver at N operating points.
+    :rtype: (exact key points, interpolated key points, current error): the
+        current error is the worst |I_interp - I_exact| / Isc per curve, taken
+        at the exact curve's voltages
+    """
+    irradiance = np.atleast_1d(np.asarray(irradiance, dtype=float))
+    temperature = np.broadcast_to(np.asarray(temperature, dtype=float), irradiance.shape)
+    V, I, _, exact = _exact(params, irradiance, temperature)
+    approx, shapes = surface.lookup(irradiance, temperature)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        current = approx['i_sc'][:, None] * _sample_shapes(shapes, V / approx['v_oc'][:, None])
+        error = np.nanmax(np.abs(current - I), axis=1) / exact['i_sc']
+    return exact, approx, error
+
+
+def _relative_error(exact, approx, error):
+    """
+    Worst of the current error and every key point's relative error, per curve.
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        errors = [error] + [np.where(exact[name] != 0, np.abs(approx[name] - exact[name]) / np.abs(exact[name]), 0)
+                            for name in KEY_POINTS]
+    return np.nan_to_num(np.max(errors, axis=0), nan=np.inf)
+
+
+def build_surface(params, irradiance, temperature):
+    """
+    Tabulates one module on the (irradiance, temperature) grid and measures the
+    interpolation error of every cell on a PROBES x PROBES lattice over it.
+    :param params dict: CEC parameters of one module (stack_module_params([row]))
+    :param irradiance: ascending grid, W/m2 (all > 0)
+    :param temperature: ascending grid, degC
+    :rtype: Surface
+    """
+    irradiance = np.asarray(irradiance, dtype=float)
+    temperature = np.asarray(temperature, dtype=float)
+    if irradiance.size < 2 or temperature.size < 2:
+        raise ValueError('Surface grids need at least 2 points per axis')
+    if np.any(np.diff(irradiance) <= 0) or np.any(np.diff(temperature) <= 0):
+        raise ValueError('Surface grids must be strictly ascending')
+    if irradiance[0] <= 0:
+        raise ValueError('Surface irradiance grid must be positive')
+
+    G, T = np.meshgrid(irradiance, temperature, indexing='ij')
+    _, I, _, key_points = _exact(params, G.ravel(), T.ravel())
+    i_sc = key_points['i_sc'][:, None]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        shapes = np.nan_to_num(np.where(i_sc > 0, I / i_sc, 0))
+    table = np.stack([key_points[name] for name in KEY_POINTS], axis=1)
+    table[:, _SHUNT] = 1 / table[:, _SHUNT]
+
+    shape = (len(irradiance), len(temperature))
+    surface = Surface({
+        'irradiance': irradiance,
+        'temperature': temperature,
+        'key_points': table.reshape(shape + (len(KEY_POINTS),)),
+        # float32 halves the file; its ~1e-7 rounding is far below the error bound
+        'shapes': shapes.astype(np.float32).reshape(shape + (SHAPE_POINTS,)),
+        'params': _params_vector(params),
+        'cell_error': np.zeros((shape[0] - 1, shape[1] - 1)),
+    })
+
+    # Probe coordinates (cells, PROBES) along each axis, nodes to nodes: the
+    # error peaks between nodes, not only at the cell centre
+    fractions = np.linspace(0, 1, PROBES)
+    g = irradiance[:-1, None] + np.diff(irradiance)[:, None] * fractions
+    t = temperature[:-1, None] + np.diff(temperature)[:, None] * fractions
+    G = np.broadcast_to(g[:, None, :, None], surface.cell_error.shape + (PROBES, PROBES))
+    T = np.broadcast_to(t[None, :, None, :], G.shape)
+    exact, approx, error = compare(surface, params, G.ravel(), T.ravel())
+    errors = _relative_error(exact, approx, error).reshape(surface.cell_error.shape + (-1,))
+    surface.cell_error = errors.max(axis=2) * PROBE_MARGIN
+    return surface
+
+
+def save_surface(path, surface):
+    """
+    Writes the surface as an uncompressed .npz, atomically.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.npz')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.savez(f, format=SURFACE_VERSION, irradiance=surface.irradiance, temperature=surface.temperature,
+                     key_points=surface.key_points, shapes=surface.shapes, params=surface.params,
+                     cell_error=surface.cell_error)
+        os.replace(tmp_path, path)
+    except Exception:
+        os.unlink(tmp_path)
+        raise
+
+
+def load_surface(path, version=None):
+    with np.load(path) as arrays:
+        if int(arrays['format']) != SURFACE_VERSION:
+            return None
+        return Surface({name: arrays[name] for name in arrays.files}, version=version)
+
+
+class SurfaceStore:
+    """
+    Loads surfaces from a directory on first use and keeps them for the
+    lifetime of the worker. A surface is reloaded when its file changes, and
+    ignored when it was built from other CEC parameters than the catalog row.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._loaded = {}
+
+    def path(self, manufacturer, model):
+        return os.path.join(self.directory, surface_filename(manufacturer, model))
+
+    def get(self, row):
+        """
+        Returns the Surface for a catalog row, or None when there is no usable one.
+        """
+        path = self.path(row['Manufacturer'], row['Model'])
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+        cached = self._loaded.get(path)
+        if cached is None or cached[0] != mtime:
+            try:
+                surface = load_surface(path, version=mtime)
+            except (OSError, ValueError, KeyError):
+                # Mid-write or foreign file; fall back to the exact solver
+                surface = None
+            with self._lock:
+                self._loaded[path] = cached = (mtime, surface)
+
+        surface = cached[1]
+        if surface is None or not surface.matches(row):
+            return None
+        return surface
+
+    def build(self, row, irradiance, temperature):
+        """
+        Builds and stores the surface of a catalog row.
+        :rtype: (path, Surface)
+        """
+        surface = build_surface(stack_module_params([row]), irradiance, temperature)
+        path = self.path(row['Manufacturer'], row['Model'])
+        save_surface(path, surface)
+        return path, surface
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_surface_store():
+    """
+    Returns the process-wide surface store bound to settings.IV_SURFACE_DIR.
+    """
+    global _store
+    if _store is None or _store.directory != settings.IV_SURFACE_DIR:
+        with _store_lock:
+            if _store is None or _store.directory != settings.IV_SURFACE_DIR:
+                _store = SurfaceStore(settings.IV_SURFACE_DIR)
+    return _store
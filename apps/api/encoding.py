@@ -0,0 +1,116 @@
+"""
+Response encodings for IV-curve arrays.
+
+- json:   {"voltage": [...], "current": [...], "power": [...], "key_points": {...}} (default)
+- binary: 16-byte header followed by the raw little-endian arrays
+          header = b'IVC1', uint8 itemsize (4|8), uint8 n_arrays, uint16 reserved,
+                   uint32 n_curves, uint32 n_points
+          body   = voltage, current, power, each (n_curves, n_points) row-major
+- npy:    one (3, n_curves, n_points) array in NumPy .npy format
+
+Clients pick a format with `?format=` or the Accept header, and the float width
+with `?dtype=float32|float64`.
+"""
+
+import gzip
+import io
+import struct
+
+import numpy as np
+
+
+CONTENT_TYPES = {
+    'json': 'application/json',
+    'binary': 'application/x-iv-curves',
+    'npy': 'application/x-npy',
+}
+
+DTYPES = {'float32': '<f4', 'float64': '<f8'}
+
+MAGIC = b'IVC1'
+
+# Below this size gzip costs more than it saves
+COMPRESS_MIN_BYTES = 1024
+
+
+def negotiate(request):
+    """
+    Returns (format, dtype) for the request, defaulting to JSON / float64.
+    Raises ValueError on unknown values.
+    """
+    fmt = request.GET.get('format')
+    if fmt is None:
+        accept = request.META.get('HTTP_ACCEPT', '')
+        fmt = next((name for name, ctype in CONTENT_TYPES.items()
+                    if name != 'json' and ctype in accept), 'json')
+    if fmt not in CONTENT_TYPES:
+        raise ValueError('format must be one of: ' + ', '.join(CONTENT_TYPES))
+
+    dtype = request.GET.get('dtype', 'float64')
+    if dtype not in DTYPES:
+        raise ValueError('dtype must be one of: ' + ', '.join(DTYPES))
+    return fmt, dtype
+
+
+def encode_binary(arrays, dtype='float64'):
+    """
+    Packs equally shaped (N, K) arrays behind the IVC1 header.
+    """
+    arrays = [np.ascontiguousarray(a, dtype=DTYPES[dtype]) for a in arrays]
+    n_curves, n_points = arrays[0].shape
+    header = MAGIC + struct.pack('<BBHII', arrays[0].itemsize, len(arrays), 0, n_curves, n_points)
+    # memoryviews avoid an intermediate bytes copy per array
+    return b''.join([header] + [memoryview(a).cast('B') for a in arrays])
+
+
+def decode_binary(payload):
+    """
+    Inverse of encode_binary, returning a list of (N, K) arrays (views on payload).
+    """
+    if payload[:4] != MAGIC:
+        raise ValueError('Not an IVC1 payload')
+    itemsize, n_arrays, _, n_curves, n_points = struct.unpack('<BBHII', payload[4:16])
+    dtype = '<f4' if itemsize == 4 else '<f8'
+    data = np.frombuffer(payload, dtype=dtype, offset=16, count=n_arrays * n_curves * n_points)
+    return list(data.reshape(n_arrays, n_curves, n_points))
+
+
+def encode_npy(arrays, dtype='float64'):
+    buffer = io.BytesIO()
+    np.save(buffer, np.stack(arrays).astype(DTYPES[dtype], copy=False), allow_pickle=False)
+    return buffer.getvalue()
+
+
+def encode_curves(fmt, V, I, P, dtype='float64', key_points=None):
+    """
+    Serializes (N, K) voltage/current/power arrays. JSON output holds flat lists
+    when N == 1, matching the single-curve endpoint, and lists of rows otherwise.
+    `key_points` (length-N arrays, see compute_iv_curves) are only carried by JSON.
+    """
+    if fmt == 'binary':
+        return encode_binary([V, I, P], dtype)
+    if fmt == 'npy':
+        return encode_npy([V, I, P], dtype)
+
+    import json
+    rows = (lambda a: a[0].tolist()) if len(V) == 1 else (lambda a: a.tolist())
+    payload = {'voltage': rows(V), 'current': rows(I), 'power': rows(P)}
+    if key_points is not None:
+        values = {name: np.asarray(column, dtype=float) for name, column in key_points.items()}
+        payload['key_points'] = {name: column[0].item() if len(V) == 1 else column.tolist()
+                                 for name, column in values.items()}
+    return json.dumps(payload).encode()
+
+
+def accepts_gzip(request):
+    return 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', '')
+
+
+def compress(body, request):
+    """
+    Returns (body, content_encoding). Gzips when the client accepts it and the
+    payload is big enough to benefit.
+    """
+    if accepts_gzip(request) and len(body) >= COMPRESS_MIN_BYTES:
+        return gzip.compress(body, compresslevel=5), 'gzip'
+    return body, None
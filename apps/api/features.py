@@ -0,0 +1,240 @@
+"""
+IV-curve feature extraction shared by inference and training.
+
+Only depends on NumPy at import time, so the web tier can import it cheaply.
+"""
+
+import numpy as np
+
+# --- Feature extraction ---
+def extract_iv_features(voltage, current, nameplate, key_points=None):
+    """
+    :param key_points dict: optional exact 'i_sc', 'v_oc', 'i_mp', 'v_mp' of the
+        curve (e.g. from compute_iv_curves); used instead of the sampled values
+    """
+    # scipy.stats / scipy.signal take ~0.5 s to import; only pay for it here
+    from scipy.signal import find_peaks
+    from scipy.stats import linregress
+
+    Isc = current[0] if key_points is None else key_points['i_sc']
+    Voc = voltage[-1] if key_points is None else key_points['v_oc']
+
+    Isc_norm = Isc / nameplate['I_sc_ref'] if nameplate['I_sc_ref'] else 0
+    Voc_norm = Voc / nameplate['V_oc_ref'] if nameplate['V_oc_ref'] else 0
+
+    power = voltage * current
+    idx_max_power = np.argmax(power)
+    Imp = current[idx_max_power] if key_points is None else key_points['i_mp']
+    Vmp = voltage[idx_max_power] if key_points is None else key_points['v_mp']
+
+    Imp_norm = Imp / nameplate['I_mp_ref'] if nameplate['I_mp_ref'] else 0
+    Vmp_norm = Vmp / nameplate['V_mp_ref'] if nameplate['V_mp_ref'] else 0
+
+    FF = (Vmp * Imp) / (Voc * Isc) if (Isc != 0 and Voc != 0) else 0
+
+    slope_at_Isc = (current[1] - current[0]) / (voltage[1] - voltage[0]) if voltage[1] != voltage[0] else 0
+    slope_at_Voc = (current[-1] - current[-2]) / (voltage[-1] - voltage[-2]) if voltage[-1] != voltage[-2] else 0
+
+    curvature = np.gradient(np.gradient(current, voltage), voltage)
+    max_curvature = np.max(np.abs(curvature)) if not np.isnan(curvature).any() else 0
+
+    # Diode ideality factor approximation
+    try:
+        exp_region_mask = (voltage > 0.1 * Voc) & (voltage < 0.9 * Voc)
+        lnI = np.log(np.clip(current[exp_region_mask], 1e-10, None))
+        slope, intercept, _, _, _ = linregress(voltage[exp_region_mask], lnI)
+        diode_ideality_fit = 1 / slope if slope != 0 else 0
+    except Exception:
+        diode_ideality_fit = 0
+
+    # Steps (bypass diodes, shading, mismatch)
+    dI = np.diff(current)
+    step_indices = np.where(np.abs(dI) > 0.1 * Isc)[0]
+    num_steps = len(step_indices)
+
+    peaks, _ = find_peaks(power)
+    if len(peaks) >= 2:
+        top_two = np.sort(power[peaks])[-2:]
+        Pmp_ratio = top_two[-1] / top_two[-2] if top_two[-2] != 0 else 1
+    else:
+        Pmp_ratio = 1
+
+    # NEW: Area under IV curve vs ideal area (rectangular shape ideal)
+    area_under_curve = np.trapz(current, voltage)
+    ideal_area = Isc * Voc
+    area_ratio = area_under_curve / ideal_area if ideal_area != 0 else 0
+
+    # NEW: Knee sharpness (curvature at MPP region)
+    if 2 <= idx_max_power < len(curvature) - 2:
+        knee_curvature = np.abs(curvature[idx_max_power])
+    else:
+        knee_curvature = 0
+
+    features = {
+        'Isc_norm': Isc_norm,
+        'Voc_norm': Voc_norm,
+        'Imp_norm': Imp_norm,
+        'Vmp_norm': Vmp_norm,
+        'FF': FF if not np.isnan(FF) else 0,
+        'slope_at_Isc': slope_at_Isc if not np.isnan(slope_at_Isc) else 0,
+        'slope_at_Voc': slope_at_Voc if not np.isnan(slope_at_Voc) else 0,
+        'max_curvature': max_curvature if not np.isnan(max_curvature) else 0,
+        'diode_ideality_fit': diode_ideality_fit if not np.isnan(diode_ideality_fit) else 0,
+        'num_steps': num_steps,
+        'Pmp_ratio': Pmp_ratio if not np.isnan(Pmp_ratio) else 1,
+        'area_ratio': area_ratio if not np.isnan(area_ratio) else 0,
+        'knee_curvature': knee_curvature if not np.isnan(knee_curvature) else 0
+    }
+    return features
+
+# --- Vectorized feature extraction ---
+FEATURE_NAMES = [
+    'Isc_norm', 'Voc_norm', 'Imp_norm', 'Vmp_norm', 'FF', 'slope_at_Isc', 'slope_at_Voc',
+    'max_curvature', 'diode_ideality_fit', 'num_steps', 'Pmp_ratio', 'area_ratio', 'knee_curvature'
+]
+
+def _gradient_rows(f, x):
+    """
+    Row-wise np.gradient(f, x) for (N, K) arrays, including numpy's switch to the
+    uniform-spacing formula when a row's steps are exactly equal.
+    """
+    dx = np.diff(x, axis=1)
+    dx1, dx2 = dx[:, :-1], dx[:, 1:]
+    out = np.empty_like(f, dtype=float)
+
+    a = -(dx2) / (dx1 * (dx1 + dx2))
+    b = (dx2 - dx1) / (dx1 * dx2)
+    c = dx1 / (dx2 * (dx1 + dx2))
+    interior = a * f[:, :-2] + b * f[:, 1:-1] + c * f[:, 2:]
+
+    uniform = (dx == dx[:, :1]).all(axis=1)
+    if uniform.any():
+        interior[uniform] = (f[uniform, 2:] - f[uniform, :-2]) / (2. * dx[uniform, :1])
+
+    out[:, 1:-1] = interior
+    out[:, 0] = (f[:, 1] - f[:, 0]) / dx[:, 0]
+    out[:, -1] = (f[:, -1] - f[:, -2]) / dx[:, -1]
+    return out
+
+def _peak_mask(x):
+    """
+    Row-wise equivalent of scipy.signal.find_peaks(x) without conditions: strict
+    local maxima, with flat peaks counted once.
+    """
+    n, k = x.shape
+    sign = np.sign(np.diff(x, axis=1))
+    # Sign of the next non-flat step at or after each position (0 past the end)
+    positions = np.where(sign != 0, np.arange(k - 1), k - 1)
+    next_step = np.minimum.accumulate(positions[:, ::-1], axis=1)[:, ::-1]
+    padded = np.concatenate([sign, np.zeros((n, 1))], axis=1)
+    next_sign = np.take_along_axis(padded, next_step, axis=1)
+
+    mask = np.zeros((n, k), dtype=bool)
+    mask[:, 1:-1] = (sign[:, :-1] == 1) & (next_sign[:, 1:] == -1)
+    return mask
+
+def _ratio(num, den, default):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(den != 0, num / np.where(den != 0, den, 1), default)
+
+def extract_iv_feature_matrix(voltage, current, nameplate, key_points=None):
+    """
+    Vectorized extract_iv_features over N curves sampled on K points each.
+    :param voltage ndarray: (N, K) voltages, one curve per row
+    :param current ndarray: (N, K) currents
+    :param nameplate dict: 'I_sc_ref', 'V_oc_ref', 'I_mp_ref', 'V_mp_ref' as scalars or length-N arrays
+    :param key_points dict: optional exact 'i_sc', 'v_oc', 'i_mp', 'v_mp' length-N
+        arrays, used instead of the sampled endpoints and argmax(V * I)
+    :rtype: ndarray (N, 13), columns in FEATURE_NAMES order
+    """
+    V = np.atleast_2d(np.asarray(voltage, dtype=float))
+    I = np.atleast_2d(np.asarray(current, dtype=float))
+    if V.shape != I.shape or V.shape[1] < 3:
+        raise ValueError('voltage and current must be (N, K) arrays with K >= 3')
+    n, k = V.shape
+    ref = {key: np.broadcast_to(np.asarray(nameplate[key], dtype=float), (n,))
+           for key in ('I_sc_ref', 'V_oc_ref', 'I_mp_ref', 'V_mp_ref')}
+    rows = np.arange(n)
+
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        power = V * I
+        idx_max_power = np.argmax(power, axis=1)
+        if key_points is None:
+            Isc = I[:, 0]
+            Voc = V[:, -1]
+            Imp = I[rows, idx_max_power]
+            Vmp = V[rows, idx_max_power]
+        else:
+            Isc, Voc, Imp, Vmp = (np.broadcast_to(np.asarray(key_points[key], dtype=float), (n,))
+                                  for key in ('i_sc', 'v_oc', 'i_mp', 'v_mp'))
+
+        Isc_norm = _ratio(Isc, ref['I_sc_ref'], 0)
+        Voc_norm = _ratio(Voc, ref['V_oc_ref'], 0)
+        Imp_norm = _ratio(Imp, ref['I_mp_ref'], 0)
+        Vmp_norm = _ratio(Vmp, ref['V_mp_ref'], 0)
+
+        FF = np.where((Isc != 0) & (Voc != 0), (Vmp * Imp) / (Voc * Isc), 0)
+
+        slope_at_Isc = _ratio(I[:, 1] - I[:, 0], V[:, 1] - V[:, 0], 0)
+        slope_at_Voc = _ratio(I[:, -1] - I[:, -2], V[:, -1] - V[:, -2], 0)
+
+        curvature = _gradient_rows(_gradient_rows(I, V), V)
+        max_curvature = np.where(np.isnan(curvature).any(axis=1), 0, np.max(np.abs(curvature), axis=1))
+
+        # Diode ideality factor approximation: least squares of ln(I) on V over the mid region
+        mask = (V > 0.1 * Voc[:, None]) & (V < 0.9 * Voc[:, None])
+        count = mask.sum(axis=1)
+        lnI = np.where(mask, np.log(np.clip(I, 1e-10, None)), 0)
+        Vm = np.where(mask, V, 0)
+        mean_v = Vm.sum(axis=1) / count
+        mean_ln = lnI.sum(axis=1) / count
+        dv = np.where(mask, V - mean_v[:, None], 0)
+        ssxm = (dv * dv).sum(axis=1)
+        ssxym = (dv * np.where(mask, lnI - mean_ln[:, None], 0)).sum(axis=1)
+        # linregress raises when x is constant, which the scalar path maps to 0
+        fit_ok = (count >= 2) & (ssxm != 0)
+        slope = np.where(fit_ok, ssxym / np.where(fit_ok, ssxm, 1), 0)
+        diode_ideality_fit = _ratio(1, slope, 0)
+
+        # Steps (bypass diodes, shading, mismatch)
+        num_steps = (np.abs(np.diff(I, axis=1)) > 0.1 * Isc[:, None]).sum(axis=1)
+
+        peaks = _peak_mask(power)
+        peak_power = np.sort(np.where(peaks, power, -np.inf), axis=1)
+        has_two = peaks.sum(axis=1) >= 2
+        Pmp_ratio = np.where(has_two, _ratio(peak_power[:, -1], peak_power[:, -2], 1), 1)
+
+        area_under_curve = np.trapz(I, V, axis=1)
+        area_ratio = _ratio(area_under_curve, Isc * Voc, 0)
+
+        knee_ok = (idx_max_power >= 2) & (idx_max_power < k - 2)
+        knee_curvature = np.where(knee_ok, np.abs(curvature[rows, idx_max_power]), 0)
+
+    features = np.column_stack([
+        Isc_norm, Voc_norm, Imp_norm, Vmp_norm, FF, slope_at_Isc, slope_at_Voc,
+        max_curvature, diode_ideality_fit, num_steps, Pmp_ratio, area_ratio, knee_curvature
+    ])
+    # Same NaN replacement as extract_iv_features, which leaves the *_norm columns as they are
+    nan_default = np.zeros(len(FEATURE_NAMES))
+    nan_default[FEATURE_NAMES.index('Pmp_ratio')] = 1
+    sanitized = np.ones(len(FEATURE_NAMES), dtype=bool)
+    sanitized[:4] = False
+    return np.where(np.isnan(features) & sanitized, nan_default, features)
+
+def resample_curves(curves, points=100):
+    """
+    Interpolates ragged (voltage, current) curves onto a common per-curve grid
+    of `points` samples between each curve's first and last voltage, returning
+    (N, points) arrays suitable for extract_iv_feature_matrix.
+    """
+    grid = np.linspace(0, 1, points)
+    V = np.empty((len(curves), points))
+    I = np.empty((len(curves), points))
+    for row, (voltage, current) in enumerate(curves):
+        voltage = np.asarray(voltage, dtype=float)
+        current = np.asarray(current, dtype=float)
+        order = np.argsort(voltage, kind='stable')
+        voltage, current = voltage[order], current[order]
+        V[row] = voltage[0] + grid * (voltage[-1] - voltage[0])
+        I[row] = np.interp(V[row], voltage, current)
+    return V, I
@@ -0,0 +1,156 @@
+"""
+Fleet analysis: classification of very large IV-tracer exports on Celery.
+
+The coordinator streams the export once (apps.api.ingest) and writes its
+traces into chunk files of at most `chunk_curves` curves on shared storage.
+One worker task per chunk extracts features and classifies them in a single
+batched predict call, then writes its results next to the chunk. A chord
+callback merges the chunk results in order into one CSV and one summary. All
+the per-curve work runs in the chunk tasks, so throughput grows with the
+number of workers.
+
+Chunk files (.npz): `ids` (str), `offsets` (int64, one more than ids) and the
+concatenated `voltage` / `current` of every trace.
+"""
+
+import csv
+import os
+import shutil
+from collections import Counter
+
+import numpy as np
+
+from apps.api.inference import classify, feature_frame
+
+
+def split_traces(traces, directory, chunk_curves, progress=None):
+    """
+    Writes traces into chunk files. Traces with fewer than 3 points are skipped.
+    :param traces iterable: (trace_id, voltage, current), e.g. from apps.api.ingest.iter_traces
+    :param progress callable: called with (chunks, curves) after each chunk file
+    :rtype: (chunk paths, curves written, curves skipped)
+    """
+    os.makedirs(directory, exist_ok=True)
+    paths, batch = [], []
+    curves = skipped = 0
+
+    def flush():
+        path = os.path.join(directory, f'chunk-{len(paths):06d}.npz')
+        lengths = [len(voltage) for _, voltage, _ in batch]
+        np.savez(path,
+                 ids=np.array([str(trace_id) for trace_id, _, _ in batch]),
+                 offsets=np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64),
+                 voltage=np.concatenate([voltage for _, voltage, _ in batch]),
+                 current=np.concatenate([current for _, _, current in batch]))
+        paths.append(path)
+        if progress is not None:
+            progress(len(paths), curves)
+
+    for trace_id, voltage, current in traces:
+        if len(voltage) < 3:
+            skipped += 1
+            continue
+        batch.append((trace_id, np.asarray(voltage, dtype=float), np.asarray(current, dtype=float)))
+        curves += 1
+        if len(batch) >= chunk_curves:
+            flush()
+            batch = []
+    if batch:
+        flush()
+    return paths, curves, skipped
+
+
+def read_chunk(path):
+    """
+    :rtype: (trace ids list, list of (voltage, current) array pairs)
+    """
+    with np.load(path) as chunk:
+        ids, offsets = chunk['ids'].tolist(), chunk['offsets']
+        voltage, current = chunk['voltage'], chunk['current']
+    curves = [(voltage[lo:hi], current[lo:hi]) for lo, hi in zip(offsets[:-1], offsets[1:])]
+    return ids, curves
+
+
+def result_path(chunk_path):
+    return chunk_path[:-len('.npz')] + '.result.npz'
+
+
+def classify_chunk(path, nameplate, module_type_code=0, target=None):
+    """
+    Classifies every curve of a chunk file and writes `<chunk>.result.npz`.
+    :param target dict: site, measured_at, irradiance, temperature; when given,
+        every curve is also stored as a measurement of the string named by its trace id
+    :rtype: summary dict: chunk, curves, counts per class, stored, model_version
+    """
+    from apps.api.history import record_measurements
+
+    ids, curves = read_chunk(path)
+    features = feature_frame(curves, [nameplate] * len(curves), [module_type_code] * len(curves))
+    labels, probabilities, model = classify(features)
+    np.savez(result_path(path), ids=np.array(ids), labels=labels.astype(str),
+             probabilities=probabilities.astype(np.float32),
+             classes=np.asarray(model.classifier.classes_).astype(str))
+
+    stored = 0
+    if target is not None:
+        stored = record_measurements(
+            {**target, 'string': trace_id, 'voltage': voltage, 'current': current, 'features': row,
+             'fault_class': label, 'probability': float(proba.max()), 'model_version': model.version}
+            for trace_id, (voltage, current), row, label, proba
+            in zip(ids, curves, features.to_dict('records'), labels.tolist(), probabilities))
+
+    return {
+        'chunk': os.path.basename(path),
+        'curves': len(ids),
+        'counts': {str(label): count for label, count in Counter(labels.tolist()).items()},
+        'stored': stored,
+        'model_version': model.version,
+    }
+
+
+def merge_results(chunk_paths, output):
+    """
+    Concatenates the chunk results, in chunk order, into one CSV:
+    trace, anomaly, then one probability column per class.
+    :rtype: number of rows written
+    """
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    rows = 0
+    tmp_path = output + '.tmp'
+    with open(tmp_path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        header = None
+        for path in chunk_paths:
+            with np.load(result_path(path)) as result:
+                classes = result['classes'].tolist()
+                if header is None:
+                    header = ['trace', 'anomaly'] + classes
+                    writer.writerow(header)
+                elif header[2:] != classes:
+                    raise ValueError('Chunks were classified with different models')
+                probabilities = result['probabilities'].round(4).tolist()
+                writer.writerows([trace_id, label] + row for trace_id, label, row
+                                 in zip(result['ids'].tolist(), result['labels'].tolist(), probabilities))
+                rows += len(probabilities)
+    os.replace(tmp_path, output)
+    return rows
+
+
+def merge_summaries(summaries):
+    """
+    Sums the per-chunk summaries returned by classify_chunk.
+    """
+    counts = Counter()
+    for summary in summaries:
+        counts.update(summary['counts'])
+    return {
+        'chunks': len(summaries),
+        'curves': sum(summary['curves'] for summary in summaries),
+        'stored': sum(summary['stored'] for summary in summaries),
+        'counts': dict(counts.most_common()),
+        'model_versions': sorted({summary['model_version'] for summary in summaries}),
+    }
+
+
+def remove_work_dir(directory):
+    shutil.rmtree(directory, ignore_errors=True)
@@ -0,0 +1,147 @@
+"""
+Stored history of classified IV curves (apps.api.models.Measurement).
+
+Measurements are written with bulk_create in batches. Sites and strings are
+resolved by name with one query per batch, not one per curve. Fleet queries
+filter on the (fault_class, measured_at) and (site, string, measured_at)
+indexes, so they read the stored predictions instead of reclassifying.
+"""
+
+import datetime
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Max, Min
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from apps.api.models import Measurement, PVString, Site, encode_curve
+
+
+def parse_timestamp(value, default=None):
+    """
+    Parses an ISO 8601 timestamp; naive ones are taken as UTC.
+    :rtype: aware datetime, `default` when value is empty, raises ValueError when invalid
+    """
+    if value in (None, ''):
+        return default
+    if isinstance(value, datetime.datetime):
+        parsed = value
+    else:
+        parsed = parse_datetime(str(value))
+        if parsed is None:
+            parsed = datetime.datetime.combine(datetime.date.fromisoformat(str(value)), datetime.time())
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, datetime.timezone.utc)
+    return parsed
+
+
+def resolve_strings(names):
+    """
+    Looks up, creating when missing, the strings named by (site, string) pairs.
+    :param names iterable: (site name, string name) pairs
+    :rtype: dict (site name, string name) -> PVString
+    """
+    names = set(names)
+    site_names = {site for site, _ in names}
+
+    sites = {site.name: site for site in Site.objects.filter(name__in=site_names)}
+    missing = [Site(name=name) for name in site_names - sites.keys()]
+    if missing:
+        # ignore_conflicts: another worker may create the same site meanwhile
+        Site.objects.bulk_create(missing, ignore_conflicts=True)
+        sites = {site.name: site for site in Site.objects.filter(name__in=site_names)}
+
+    sites_by_id = {site.id: site for site in sites.values()}
+
+    def lookup():
+        queryset = PVString.objects.filter(site__in=sites.values(),
+                                           name__in={string for _, string in names})
+        found = {(sites_by_id[s.site_id].name, s.name): s for s in queryset}
+        return {key: found[key] for key in names if key in found}
+
+    strings = lookup()
+    missing = [PVString(site=sites[site], name=string) for site, string in names - strings.keys()]
+    if missing:
+        PVString.objects.bulk_create(missing, ignore_conflicts=True)
+        strings = lookup()
+    return strings
+
+
+def record_measurements(records, batch_size=None):
+    """
+    Stores classified curves.
+    :param records iterable: dicts with site, string, voltage, current,
+        fault_class, model_version and optionally measured_at, irradiance,
+        temperature, features (dict), probability
+    :rtype: number of measurements stored
+    """
+    batch_size = batch_size or settings.MEASUREMENT_INSERT_BATCH
+    now = timezone.now()
+    stored = 0
+    batch = []
+
+    def flush():
+        strings = resolve_strings((r['site'], r['string']) for r in batch)
+        rows = []
+        for r in batch:
+            string = strings[(r['site'], r['string'])]
+            rows.append(Measurement(
+                site_id=string.site_id,
+                string=string,
+                measured_at=parse_timestamp(r.get('measured_at'), now),
+                irradiance=r.get('irradiance'),
+                temperature=r.get('temperature'),
+                points=len(r['voltage']),
+                curve=encode_curve(r['voltage'], r['current']),
+                features=r.get('features') or {},
+                fault_class=r['fault_class'],
+                probability=r.get('probability'),
+                model_version=r['model_version'],
+            ))
+        with transaction.atomic():
+            Measurement.objects.bulk_create(rows, batch_size=batch_size)
+        return len(rows)
+
+    for record in records:
+        batch.append(record)
+        if len(batch) >= batch_size:
+            stored += flush()
+            batch = []
+    if batch:
+        stored += flush()
+    return stored
+
+
+def string_history(site, string=None, since=None, until=None):
+    """
+    Measurements of a site (or one of its strings), newest first. Served by the
+    (site, string, measured_at) index; the curve blob is deferred.
+    """
+    queryset = Measurement.objects.filter(site__name=site).defer('curve', 'features')
+    if string is not None:
+        queryset = queryset.filter(string__name=string)
+    if since is not None:
+        queryset = queryset.filter(measured_at__gte=since)
+    if until is not None:
+        queryset = queryset.filter(measured_at__lt=until)
+    return queryset.select_related('string').order_by('-measured_at')
+
+
+def fault_strings(fault_class, since=None, until=None, site=None):
+    """
+    Strings with at least one measurement classified as `fault_class` in the
+    period, e.g. all PID suspects of the last quarter. Filtered on the
+    (fault_class, measured_at) index.
+    :rtype: values queryset of site_name, string_name, count, first, last
+    """
+    queryset = Measurement.objects.filter(fault_class=fault_class)
+    if since is not None:
+        queryset = queryset.filter(measured_at__gte=since)
+    if until is not None:
+        queryset = queryset.filter(measured_at__lt=until)
+    if site is not None:
+        queryset = queryset.filter(site__name=site)
+    return (queryset.values(site_name=F('site__name'), string_name=F('string__name'))
+            .annotate(count=Count('id'), first=Min('measured_at'), last=Max('measured_at'))
+            .order_by('-last'))
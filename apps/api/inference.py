@@ -0,0 +1,85 @@
+import numpy as np
+
+from apps.api.features import FEATURE_NAMES, extract_iv_feature_matrix
+from apps.api.model_registry import get_registry
+
+
+def nameplate_from_modeled(voltage, current):
+    """
+    Derives the normalization nameplate (Isc, Voc, Imp, Vmp) from a modeled curve.
+    """
+    voltage = np.asarray(voltage, dtype=float)
+    current = np.asarray(current, dtype=float)
+    max_power_index = np.argmax(voltage * current)
+    return {
+        'I_sc_ref': current.max(),
+        'V_oc_ref': voltage.max(),
+        'I_mp_ref': current[max_power_index],
+        'V_mp_ref': voltage[max_power_index],
+    }
+
+
+def nameplate_from_key_points(key_points):
+    """
+    Normalization nameplate from exact singlediode key points ('i_sc', 'v_oc',
+    'i_mp', 'v_mp'), as returned by the IV-curve endpoints.
+    """
+    return {
+        'I_sc_ref': float(key_points['i_sc']),
+        'V_oc_ref': float(key_points['v_oc']),
+        'I_mp_ref': float(key_points['i_mp']),
+        'V_mp_ref': float(key_points['v_mp']),
+    }
+
+
+def feature_frame(curves, nameplates, module_type_codes):
+    """
+    Builds the feature table for many measured curves. Curves are grouped by
+    sample count so each group goes through one extract_iv_feature_matrix call.
+    :param curves list: (voltage, current) array pairs
+    :param nameplates list: nameplate dicts, one per curve
+    :param module_type_codes list: module type code per curve
+    :rtype: DataFrame with FEATURE_NAMES + 'module_type_code', in input order
+    """
+    import pandas as pd
+
+    features = np.empty((len(curves), len(FEATURE_NAMES)))
+    groups = {}
+    for index, (voltage, _) in enumerate(curves):
+        groups.setdefault(len(voltage), []).append(index)
+
+    for indices in groups.values():
+        voltage = np.stack([curves[i][0] for i in indices])
+        current = np.stack([curves[i][1] for i in indices])
+        nameplate = {key: np.array([nameplates[i][key] for i in indices], dtype=float)
+                     for key in ('I_sc_ref', 'V_oc_ref', 'I_mp_ref', 'V_mp_ref')}
+        features[indices] = extract_iv_feature_matrix(voltage, current, nameplate)
+    # NaN samples at Isc or the MPP leave NaN *_norm features; classify() reads
+    # them as 0, and stored measurements need valid JSON
+    features[np.isnan(features)] = 0
+
+    frame = pd.DataFrame(features, columns=FEATURE_NAMES)
+    frame['module_type_code'] = module_type_codes
+    return frame
+
+
+def classify(features, model=None):
+    """
+    Runs one scaler.transform and one predict_proba over a batch of feature rows.
+    :param features: list of feature dicts or a DataFrame, one row per curve
+    :param model: LoadedModel to use, the registry's current one by default;
+        scaler and classifier always come from the same snapshot
+    :rtype: (labels ndarray, probabilities ndarray (N, n_classes), LoadedModel)
+    """
+    import pandas as pd
+
+    model = model or get_registry().get()
+
+    # Reindex columns to match exactly what the scaler was trained with
+    frame = pd.DataFrame(features).reindex(columns=model.scaler.feature_names_in_).fillna(0)
+    scaled = model.scaler.transform(frame)
+
+    # Same decision rule as RandomForestClassifier.predict, without a second pass
+    probabilities = model.classifier.predict_proba(scaled)
+    labels = model.classifier.classes_[np.argmax(probabilities, axis=1)]
+    return labels, probabilities, model
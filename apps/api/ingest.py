@@ -0,0 +1,180 @@
+"""
+Incremental readers for measured IV-tracer exports.
+
+Every reader yields `(trace_id, voltage, current)` one trace at a time while
+reading the source in fixed-size chunks, so files far larger than memory can be
+classified. Supported layouts:
+
+- csv / tsv: one row per point, columns `trace_id, voltage, current` (optional
+  header row), rows of a trace contiguous. A two-column file is one trace.
+- npy: an (M, 3) float array `[trace_id, voltage, current]`, memory-mapped.
+"""
+
+import io
+import os
+
+import numpy as np
+
+
+TEXT_FORMATS = {'csv': ',', 'tsv': '\t', 'txt': '\t'}
+FORMATS = list(TEXT_FORMATS) + ['npy']
+
+
+def guess_format(filename, content_type=''):
+    """
+    Returns the upload format from the file extension or content type, or None.
+    """
+    ext = os.path.splitext(filename or '')[1].lstrip('.').lower()
+    if ext in FORMATS:
+        return ext
+    if 'tab-separated' in content_type:
+        return 'tsv'
+    if 'csv' in content_type:
+        return 'csv'
+    return None
+
+
+def _has_header(first_line, delimiter):
+    fields = first_line.strip().split(delimiter)
+    try:
+        [float(f) for f in fields[-2:]]
+    except ValueError:
+        return True
+    return False
+
+
+def iter_text_traces(fileobj, delimiter=',', chunk_rows=200000):
+    """
+    Streams traces from a delimited text file object opened in binary mode.
+    """
+    import pandas as pd
+
+    text = io.TextIOWrapper(fileobj, encoding='utf-8', errors='replace', newline='')
+    first_line = text.readline()
+    while first_line and (not first_line.strip() or first_line.startswith('#')):
+        first_line = text.readline()
+    if not first_line:
+        return
+
+    n_columns = len(first_line.strip().split(delimiter))
+    header = _has_header(first_line, delimiter)
+    if n_columns < 2:
+        raise ValueError('Expected at least 2 columns (voltage, current)')
+
+    if n_columns == 2:
+        names, usecols = ['voltage', 'current'], [0, 1]
+    else:
+        names, usecols = ['trace_id', 'voltage', 'current'], [0, 1, 2]
+
+    # Re-feed the line consumed for sniffing unless it was the header
+    source = text if header else _Prepend(first_line, text)
+    reader = pd.read_csv(source, sep=delimiter, header=None, names=names, usecols=usecols,
+                         dtype={'trace_id': str}, comment='#', skip_blank_lines=True,
+                         chunksize=chunk_rows)
+
+    if n_columns == 2:
+        parts = [chunk[['voltage', 'current']].to_numpy(dtype=float) for chunk in reader]
+        if parts:
+            data = np.vstack(parts)
+            yield '0', data[:, 0], data[:, 1]
+        return
+
+    carry = None
+    for chunk in reader:
+        if carry is not None:
+            chunk = pd.concat([carry, chunk], ignore_index=True)
+        ids = chunk['trace_id'].to_numpy()
+        values = chunk[['voltage', 'current']].to_numpy(dtype=float)
+
+        starts = np.flatnonzero(ids[1:] != ids[:-1]) + 1
+        bounds = np.concatenate([[0], starts, [len(ids)]])
+        # The last trace may continue in the next chunk
+        for start, stop in zip(bounds[:-2], bounds[1:-1]):
+            yield ids[start], values[start:stop, 0], values[start:stop, 1]
+        carry = chunk.iloc[bounds[-2]:]
+
+    if carry is not None and len(carry):
+        values = carry[['voltage', 'current']].to_numpy(dtype=float)
+        yield carry['trace_id'].iloc[0], values[:, 0], values[:, 1]
+
+
+class _Prepend(io.TextIOBase):
+    """
+    Text stream that returns `head` before the rest of `stream`.
+    """
+
+    def __init__(self, head, stream):
+        self._head = head
+        self._stream = stream
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        if self._head:
+            if size is None or size < 0:
+                data, self._head = self._head + self._stream.read(), ''
+                return data
+            data, self._head = self._head[:size], self._head[size:]
+            return data
+        return self._stream.read(size)
+
+    def readline(self, size=-1):
+        if self._head:
+            data, self._head = self._head, ''
+            return data
+        return self._stream.readline(size)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        line = self.readline()
+        if not line:
+            raise StopIteration
+        return line
+
+
+def iter_npy_traces(source, chunk_rows=1000000):
+    """
+    Streams traces from an (M, 3) .npy file. `source` is a path (memory-mapped)
+    or a binary file object.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        array = np.load(source, mmap_mode='r', allow_pickle=False)
+    else:
+        array = np.load(source, allow_pickle=False)
+
+    if array.ndim != 2 or array.shape[1] < 3:
+        raise ValueError('Expected an (M, 3) array of [trace_id, voltage, current]')
+
+    start = 0
+    total = len(array)
+    while start < total:
+        stop = min(start + chunk_rows, total)
+        ids = np.asarray(array[start:stop, 0])
+        bounds = np.concatenate([[0], np.flatnonzero(ids[1:] != ids[:-1]) + 1, [len(ids)]])
+        if stop < total:
+            # The last trace may continue past the window
+            bounds = bounds[:-1]
+            if len(bounds) < 2:
+                chunk_rows *= 2
+                continue
+
+        for lo, hi in zip(bounds[:-1], bounds[1:]):
+            rows = np.asarray(array[start + lo:start + hi, 1:3], dtype=float)
+            trace_id = float(ids[lo])
+            yield (str(int(trace_id)) if trace_id.is_integer() else str(trace_id)), rows[:, 0], rows[:, 1]
+        start += bounds[-1]
+
+
+def iter_traces(fileobj, fmt, path=None):
+    """
+    Dispatches to the reader for `fmt`. `path` lets npy uploads that Django
+    spooled to disk be memory-mapped instead of read.
+    """
+    if fmt == 'npy':
+        return iter_npy_traces(path if path else fileobj)
+    if fmt in TEXT_FORMATS:
+        return iter_text_traces(fileobj, delimiter=TEXT_FORMATS[fmt])
+    raise ValueError('Unsupported format: ' + str(fmt))
@@ -0,0 +1,63 @@
+import json
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.api.ingest import FORMATS, guess_format
+
+
+class Command(BaseCommand):
+    help = ('Queues a fleet analysis of an IV-tracer export on shared storage (csv / tsv / npy): '
+            'the file is split into chunks classified in parallel by the Celery workers')
+
+    def add_arguments(self, parser):
+        parser.add_argument('file', help='Export readable by the workers at the same path')
+        parser.add_argument('--manufacturer', required=True)
+        parser.add_argument('--model', required=True)
+        parser.add_argument('--irradiance', type=float, default=1000)
+        parser.add_argument('--temperature', type=float, default=25)
+        parser.add_argument('--modules', type=int, default=1)
+        parser.add_argument('--module-type-code', type=int, default=0)
+        parser.add_argument('--format', choices=FORMATS)
+        parser.add_argument('--site', help='Store every curve as a measurement of this site')
+        parser.add_argument('--measured-at', help='ISO 8601 timestamp of the stored measurements')
+        parser.add_argument('--wait', action='store_true', help='Print progress until the job finishes')
+
+    def handle(self, *args, **options):
+        from apps.api.tasks import fleet_analysis_task, fleet_progress
+
+        source = os.path.abspath(options['file'])
+        fmt = options['format'] or guess_format(source)
+        if not os.path.isfile(source):
+            raise CommandError('No such file: ' + source)
+        if fmt not in FORMATS:
+            raise CommandError('Unsupported format, pass --format')
+
+        task = fleet_analysis_task.delay({
+            'source': source,
+            'format': fmt,
+            'manufacturer': options['manufacturer'],
+            'model': options['model'],
+            'irradiance': options['irradiance'],
+            'temperature': options['temperature'],
+            'modules': options['modules'],
+            'module_type_code': options['module_type_code'],
+            'site': options['site'],
+            'measured_at': options['measured_at'],
+        })
+        self.stdout.write('Fleet analysis queued: task ' + task.id)
+        if not options['wait']:
+            return
+
+        started = time.perf_counter()
+        while True:
+            state = fleet_progress(task.id)
+            if state['state'] in ('SUCCESS', 'FAILURE'):
+                break
+            self.stdout.write(json.dumps(state.get('progress', {'state': state['state']})))
+            time.sleep(2)
+        state['seconds'] = round(time.perf_counter() - started, 1)
+        self.stdout.write(json.dumps(state, indent=2))
+        if state['state'] == 'FAILURE':
+            raise CommandError('Fleet analysis failed')
@@ -0,0 +1,61 @@
+import json
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.api.iv_curves import stack_module_params
+from apps.api.mismatch import simulate_array
+from apps.api.module_catalog import get_catalog
+
+
+class Command(BaseCommand):
+    help = 'Times the string/array mismatch solver on randomly shaded arrays'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--manufacturer', required=True)
+        parser.add_argument('--model', required=True)
+        parser.add_argument('--strings', type=int, nargs='+', default=[1, 10, 100, 300])
+        parser.add_argument('--modules', type=int, default=30, help='Modules per string')
+        parser.add_argument('--bypass-diodes', type=int, default=3)
+        parser.add_argument('--shaded', type=float, default=0.1,
+                            help='Fraction of substrings shaded to a random 100-600 W/m2')
+        parser.add_argument('--points', type=int, default=400)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        try:
+            m = get_catalog().get(options['manufacturer'], options['model'])
+        except (OSError, ValueError) as e:
+            raise CommandError('Module catalog unavailable: ' + str(e))
+        if m is None:
+            raise CommandError('Module not found')
+
+        params = stack_module_params([m])
+        rng = np.random.default_rng(options['seed'])
+        substrings = max(options['bypass_diodes'], 1)
+        results = []
+
+        for strings in options['strings']:
+            shape = (strings, options['modules'], substrings)
+            shaded = rng.random(shape) < options['shaded']
+            irradiance = np.where(shaded, rng.uniform(100, 600, shape), 1000.0)
+
+            timings = []
+            for _ in range(options['repeat']):
+                started = time.perf_counter()
+                result = simulate_array(params, irradiance, 45, bypass_diodes=options['bypass_diodes'],
+                                        points=options['points'])
+                timings.append(time.perf_counter() - started)
+
+            results.append({
+                'strings': strings,
+                'modules': strings * options['modules'],
+                'best_ms': round(min(timings) * 1000, 1),
+                'median_ms': round(float(np.median(timings)) * 1000, 1),
+                'p_mp_kw': round(result['key_points']['p_mp'] / 1000, 2),
+                'power_peaks': result['key_points']['power_peaks'],
+            })
+
+        self.stdout.write(json.dumps(results, indent=2))
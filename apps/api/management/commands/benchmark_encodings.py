@@ -0,0 +1,63 @@
+import gzip
+import json
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.api.encoding import CONTENT_TYPES, DTYPES, encode_curves
+from apps.api.iv_curves import compute_iv_curves, stack_module_params
+from apps.api.module_catalog import get_catalog
+
+
+class Command(BaseCommand):
+    help = 'Compares serialization time and payload size of the IV-curve response encodings'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--manufacturer', required=True)
+        parser.add_argument('--model', required=True)
+        parser.add_argument('--curves', type=int, nargs='+', default=[1, 100, 1000])
+        parser.add_argument('--points', type=int, default=100)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def _time(self, fn, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = fn()
+            timings.append(time.perf_counter() - started)
+        return result, round(min(timings) * 1000, 3)
+
+    def handle(self, *args, **options):
+        try:
+            m = get_catalog().get(options['manufacturer'], options['model'])
+        except (OSError, ValueError) as e:
+            raise CommandError('Module catalog unavailable: ' + str(e))
+        if m is None:
+            raise CommandError('Module not found')
+
+        rng = np.random.default_rng(options['seed'])
+        results = []
+        for n in options['curves']:
+            V, I, P, key_points = compute_iv_curves(stack_module_params([m] * n), rng.uniform(100, 1200, n),
+                                                    rng.uniform(-10, 70, n), points=options['points'])
+            for fmt in CONTENT_TYPES:
+                # JSON always carries float64 values
+                for dtype in (['float64'] if fmt == 'json' else DTYPES):
+                    body, encode_ms = self._time(
+                        lambda: encode_curves(fmt, V, I, P, dtype, key_points if fmt == 'json' else None),
+                        options['repeat'])
+                    compressed, gzip_ms = self._time(lambda: gzip.compress(body, compresslevel=5),
+                                                     options['repeat'])
+                    results.append({
+                        'curves': n,
+                        'format': fmt,
+                        'dtype': dtype,
+                        'encode_ms': encode_ms,
+                        'bytes': len(body),
+                        'gzip_ms': gzip_ms,
+                        'gzip_bytes': len(compressed),
+                    })
+
+        self.stdout.write(json.dumps(results, indent=2))
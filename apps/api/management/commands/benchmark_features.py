@@ -0,0 +1,65 @@
+import json
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.api.features import FEATURE_NAMES, extract_iv_feature_matrix, extract_iv_features
+from apps.api.iv_curves import compute_iv_curves, stack_module_params
+from apps.api.module_catalog import get_catalog
+
+
+class Command(BaseCommand):
+    help = ('Times IV feature extraction on N noisy, partly shaded curves: the per-curve '
+            'extract_iv_features loop against the vectorized extract_iv_feature_matrix')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--manufacturer', required=True)
+        parser.add_argument('--model', required=True)
+        parser.add_argument('--curves', type=int, default=10000)
+        parser.add_argument('--points', type=int, default=100)
+        parser.add_argument('--shaded', type=float, default=0.3,
+                            help='Fraction of curves with a bypass-diode step')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs of the vectorized path')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        try:
+            m = get_catalog().get(options['manufacturer'], options['model'])
+        except (OSError, ValueError) as e:
+            raise CommandError('Module catalog unavailable: ' + str(e))
+        if m is None:
+            raise CommandError('Module not found')
+
+        n, points = options['curves'], options['points']
+        rng = np.random.default_rng(options['seed'])
+        params = stack_module_params([m] * n)
+        V, I, _, _ = compute_iv_curves(params, rng.uniform(100, 1200, n), rng.uniform(-10, 70, n),
+                                       points=points)
+        # A shaded substring drops the current below a random voltage
+        shaded = rng.random(n) < options['shaded']
+        knee = rng.uniform(0.2, 0.8, n)[:, None] * V[:, -1:]
+        I = np.where(shaded[:, None] & (V < knee), I * rng.uniform(0.3, 0.8, n)[:, None], I)
+        I = I + rng.normal(0, 0.002, I.shape) * I[:, :1]
+        nameplate = {key: float(m[key]) for key in ('I_sc_ref', 'V_oc_ref', 'I_mp_ref', 'V_mp_ref')}
+
+        timings = []
+        for _ in range(options['repeat']):
+            started = time.perf_counter()
+            matrix = extract_iv_feature_matrix(V, I, nameplate)
+            timings.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        rows = np.array([[features[name] for name in FEATURE_NAMES]
+                         for features in (extract_iv_features(v, i, nameplate) for v, i in zip(V, I))])
+        scalar = time.perf_counter() - started
+
+        self.stdout.write(json.dumps({
+            'curves': n,
+            'points': points,
+            'per_curve_s': round(scalar, 3),
+            'vectorized_best_s': round(min(timings), 4),
+            'speedup': round(scalar / min(timings), 1),
+            # Relative to the feature's magnitude, absolute below 1
+            'max_diff': float(np.max(np.abs(matrix - rows) / np.maximum(np.abs(rows), 1))),
+        }, indent=2))
@@ -0,0 +1,48 @@
+import json
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+SCRIPT = '''
+import json, os, sys, time
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+import django
+django.setup()
+heavy = %r
+started = time.perf_counter()
+import apps.api.views, apps.api.urls, apps.api.tasks
+seconds = time.perf_counter() - started
+loaded = [name for name in heavy if name in sys.modules]
+started = time.perf_counter()
+for name in heavy:
+    __import__(name)
+print(json.dumps({'api_seconds': seconds, 'heavy_seconds': time.perf_counter() - started,
+                  'loaded_by_api': loaded}))
+'''
+
+
+class Command(BaseCommand):
+    help = ('Times importing the API views, urls and tasks in a fresh interpreter (after django.setup()), '
+            'and the heavy modules they defer')
+
+    HEAVY = ['pvlib', 'sklearn', 'pandas', 'scipy', 'joblib']
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        runs = []
+        for _ in range(options['repeat']):
+            # A fresh interpreter each time: nothing is imported yet
+            output = subprocess.run([sys.executable, '-c', SCRIPT % self.HEAVY], cwd=settings.BASE_DIR,
+                                    capture_output=True, text=True, check=True).stdout
+            runs.append(json.loads(output.splitlines()[-1]))
+
+        self.stdout.write(json.dumps({
+            'api_ms': round(min(run['api_seconds'] for run in runs) * 1000, 1),
+            'heavy_ms': round(min(run['heavy_seconds'] for run in runs) * 1000, 1),
+            'loaded_by_api': runs[0]['loaded_by_api'],
+        }, indent=2))
@@ -0,0 +1,89 @@
+import json
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+
+from apps.api.iv_curves import compute_iv_curves, stack_module_params
+from apps.api.module_catalog import get_catalog
+
+
+class Command(BaseCommand):
+    help = ('Times N single IV curves against one batch of N, for the vectorized solver and '
+            'end to end through /api/iv-curve/ and /api/iv-curve/batch/')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--manufacturer', required=True)
+        parser.add_argument('--model', required=True)
+        parser.add_argument('--curves', type=int, nargs='+', default=[1, 10, 100, 1000])
+        parser.add_argument('--points', type=int, default=100)
+        parser.add_argument('--repeat', type=int, default=3)
+        parser.add_argument('--seed', type=int)
+
+    def _time(self, fn, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - started)
+        return round(min(timings) * 1000, 1)
+
+    def handle(self, *args, **options):
+        try:
+            m = get_catalog().get(options['manufacturer'], options['model'])
+        except (OSError, ValueError) as e:
+            raise CommandError('Module catalog unavailable: ' + str(e))
+        if m is None:
+            raise CommandError('Module not found')
+
+        # Unseeded by default: the single-curve endpoint caches every curve it
+        # serves, so each run needs operating points it has not seen yet
+        rng = np.random.default_rng(options['seed'])
+        client = Client()
+        points = options['points']
+        results = []
+        # Pays for the deferred pvlib import and the first URL resolution
+        client.get('/api/iv-curve/', {'manufacturer': m['Manufacturer'], 'model': m['Model']})
+
+        for n in options['curves']:
+            irradiance = rng.integers(100, 1200, n).astype(float)
+            temperature = rng.integers(-100, 700, n) / 10
+
+            def singles():
+                for g, t in zip(irradiance, temperature):
+                    compute_iv_curves(stack_module_params([m]), g, t, points=points)
+
+            def batch():
+                compute_iv_curves(stack_module_params([m] * n), irradiance, temperature, points=points)
+
+            # End to end, once: repeats of the single endpoint would hit its cache
+            started = time.perf_counter()
+            tiers = []
+            for g, t in zip(irradiance, temperature):
+                response = client.get('/api/iv-curve/', {'manufacturer': m['Manufacturer'], 'model': m['Model'],
+                                                        'irradiance': g, 'temperature': t, 'points': points})
+                tiers.append(response['X-Cache'] if response.status_code == 200 else str(response.status_code))
+            http_singles = time.perf_counter() - started
+
+            body = json.dumps({'points': points, 'curves': [
+                {'manufacturer': m['Manufacturer'], 'model': m['Model'], 'irradiance': g, 'temperature': t}
+                for g, t in zip(irradiance.tolist(), temperature.tolist())]})
+            started = time.perf_counter()
+            response = client.post('/api/iv-curve/batch/', body, content_type='application/json')
+            b''.join(response.streaming_content if response.streaming else [response.content])
+            http_batch = time.perf_counter() - started
+            if response.status_code != 200:
+                raise CommandError(f'Batch endpoint answered {response.status_code}')
+
+            results.append({
+                'curves': n,
+                'solver_singles_ms': self._time(singles, options['repeat']),
+                'solver_batch_ms': self._time(batch, options['repeat']),
+                'http_singles_ms': round(http_singles * 1000, 1),
+                'http_batch_ms': round(http_batch * 1000, 1),
+                # Should be all MISS, else the singles were partly served from cache
+                'singles_cache': dict(zip(*np.unique(tiers, return_counts=True))),
+            })
+
+        self.stdout.write(json.dumps(results, indent=2, default=int))
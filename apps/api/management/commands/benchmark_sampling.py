@@ -0,0 +1,74 @@
+import json
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.api.iv_curves import compute_iv_curves, stack_module_params
+from apps.api.module_catalog import get_catalog
+
+
+class Command(BaseCommand):
+    help = ('Measures IV-curve accuracy against point count for uniform and adaptive sampling, '
+            'and the points chosen by tolerance-driven sampling')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--manufacturer', required=True)
+        parser.add_argument('--model', required=True)
+        parser.add_argument('--curves', type=int, default=200, help='Random operating points')
+        parser.add_argument('--points', type=int, nargs='+', default=[10, 20, 50, 100, 200])
+        parser.add_argument('--tolerances', type=float, nargs='+', default=[1e-2, 1e-3, 1e-4])
+        parser.add_argument('--reference-points', type=int, default=20000,
+                            help='Uniform samples of the reference curve for the interpolation error')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def _errors(self, V, I, exact, reference):
+        """
+        Worst relative MPP error (sampled max(V * I) against the exact p_mp) and
+        worst linear-interpolation error of the current, relative to Isc.
+        """
+        mpp = np.abs(np.max(V * I, axis=1) - exact['p_mp']) / exact['p_mp']
+        V_ref, I_ref = reference
+        current = np.array([np.interp(v_ref, v, i) for v_ref, v, i in zip(V_ref, V, I)])
+        chord = np.max(np.abs(current - I_ref), axis=1) / exact['i_sc']
+        return float(mpp.max()), float(chord.max())
+
+    def handle(self, *args, **options):
+        try:
+            m = get_catalog().get(options['manufacturer'], options['model'])
+        except (OSError, ValueError) as e:
+            raise CommandError('Module catalog unavailable: ' + str(e))
+        if m is None:
+            raise CommandError('Module not found')
+
+        n = options['curves']
+        rng = np.random.default_rng(options['seed'])
+        params = stack_module_params([m] * n)
+        irradiance, temperature = rng.uniform(100, 1200, n), rng.uniform(-10, 70, n)
+
+        def run(**kwargs):
+            started = time.perf_counter()
+            V, I, _, key_points = compute_iv_curves(params, irradiance, temperature, **kwargs)
+            return V, I, key_points, time.perf_counter() - started
+
+        V_ref, I_ref, exact, _ = run(points=options['reference_points'])
+        reference = (V_ref, I_ref)
+
+        results = []
+        for sampling in ('uniform', 'adaptive'):
+            for points in options['points']:
+                V, I, _, seconds = run(points=points, sampling=sampling)
+                mpp_error, chord_error = self._errors(V, I, exact, reference)
+                results.append({'sampling': sampling, 'tolerance': None, 'points': points,
+                                'max_mpp_error': mpp_error, 'max_current_error': chord_error,
+                                'ms': round(seconds * 1000, 1)})
+
+        for sampling in ('uniform', 'adaptive'):
+            for tolerance in options['tolerances']:
+                V, I, _, seconds = run(points=options['reference_points'], sampling=sampling, tolerance=tolerance)
+                mpp_error, chord_error = self._errors(V, I, exact, reference)
+                results.append({'sampling': sampling, 'tolerance': tolerance, 'points': V.shape[1],
+                                'max_mpp_error': mpp_error, 'max_current_error': chord_error,
+                                'ms': round(seconds * 1000, 1)})
+
+        self.stdout.write(json.dumps(results, indent=2))
@@ -0,0 +1,63 @@
+import json
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.api.curve_surface import get_surface_store
+from apps.api.module_catalog import get_catalog
+
+
+class Command(BaseCommand):
+    help = 'Precomputes IV-curve lookup surfaces (settings.IV_SURFACE_DIR) for the given modules'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--module', nargs=2, action='append', default=[], metavar=('MANUFACTURER', 'MODEL'),
+                            help='Module to tabulate, repeat for several')
+        parser.add_argument('--modules-file',
+                            help='JSON list of {"manufacturer", "model"} objects, e.g. the most requested modules')
+        parser.add_argument('--queue', action='store_true',
+                            help='Queue one Celery task per module instead of building here')
+
+    def handle(self, *args, **options):
+        modules = [tuple(pair) for pair in options['module']]
+        if options['modules_file']:
+            with open(options['modules_file']) as f:
+                modules += [(item['manufacturer'], item['model']) for item in json.load(f)]
+        if not modules:
+            raise CommandError('Pass --module MANUFACTURER MODEL or --modules-file')
+
+        if options['queue']:
+            from apps.api.tasks import build_iv_surface_task
+
+            for manufacturer, model in modules:
+                task = build_iv_surface_task.delay(manufacturer, model)
+                self.stdout.write(f'{manufacturer} {model}: task {task.id}')
+            return
+
+        catalog = get_catalog()
+        store = get_surface_store()
+        results = []
+        for manufacturer, model in modules:
+            try:
+                m = catalog.get(manufacturer, model)
+            except (OSError, ValueError) as e:
+                raise CommandError('Module catalog unavailable: ' + str(e))
+            if m is None:
+                self.stderr.write(f'Module not found: {manufacturer} {model}')
+                continue
+
+            started = time.perf_counter()
+            path, surface = store.build(m, settings.IV_SURFACE_IRRADIANCE, settings.IV_SURFACE_TEMPERATURE)
+            served = surface.cell_error <= settings.IV_SURFACE_MAX_ERROR
+            results.append({
+                'manufacturer': m['Manufacturer'],
+                'model': m['Model'],
+                'path': path,
+                'seconds': round(time.perf_counter() - started, 2),
+                'error_bound': surface.error_bound,
+                # Share of grid cells interpolated rather than solved exactly
+                'cells_served': round(float(served.mean()), 4),
+            })
+
+        self.stdout.write(json.dumps(results, indent=2))
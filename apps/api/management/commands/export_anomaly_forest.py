@@ -0,0 +1,89 @@
+import json
+import os
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.api.compiled_forest import CompiledForest
+from apps.api.training import export_compiled
+
+
+class Command(BaseCommand):
+    help = ('Compiles the served scaler / RandomForest pickles into the pure-NumPy predictor '
+            '(settings.ANOMALY_COMPILED_PATH), checks it against sklearn and times both')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scaler', default=settings.ANOMALY_SCALER_PATH)
+        parser.add_argument('--classifier', default=settings.ANOMALY_CLASSIFIER_PATH)
+        parser.add_argument('--output', default=settings.ANOMALY_COMPILED_PATH)
+        parser.add_argument('--check-rows', type=int, default=10000,
+                            help='Random feature rows compared between sklearn and the compiled forest')
+        parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 10, 100, 1000])
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def _time(self, predict, X, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            predict(X)
+            timings.append(time.perf_counter() - started)
+        return round(float(np.median(timings)) * 1000, 3)
+
+    def handle(self, *args, **options):
+        # Served as soon as it exists, so only move it into place after the check
+        candidate = options['output'] + '.candidate.npz'
+        try:
+            export_compiled(options['scaler'], options['classifier'], candidate)
+        except (OSError, ValueError, AttributeError) as e:
+            raise CommandError('Cannot compile the forest: ' + str(e))
+        try:
+            self._check(candidate, options)
+        except Exception:
+            os.unlink(candidate)
+            raise
+        os.replace(candidate, options['output'])
+        self.stdout.write(self.style.SUCCESS('Compiled forest written to ' + options['output']))
+
+    def _check(self, path, options):
+        scaler = joblib.load(options['scaler'])
+        classifier = joblib.load(options['classifier'])
+        classifier.n_jobs = None  # as served by the model registry
+        forest = CompiledForest.load(path)
+
+        # Rows spread around the training distribution, in raw feature units
+        rng = np.random.default_rng(options['seed'])
+        X = scaler.mean_ + scaler.scale_ * rng.normal(0, 1.5, (options['check_rows'], len(scaler.mean_)))
+
+        def sklearn_predict(rows):
+            return classifier.predict_proba(scaler.transform(rows))
+
+        def compiled_predict(rows):
+            return forest.predict_proba(forest.transform(rows))
+
+        frame = pd.DataFrame(X, columns=scaler.feature_names_in_)
+        expected = sklearn_predict(frame)
+        actual = compiled_predict(X)
+        parity = {
+            'rows': len(X),
+            'identical_probabilities': bool(np.array_equal(expected, actual)),
+            'max_abs_difference': float(np.abs(expected - actual).max()),
+            'label_agreement': float(np.mean(np.argmax(expected, axis=1) == np.argmax(actual, axis=1))),
+        }
+
+        latency = []
+        for size in options['batch_sizes']:
+            rows = X[:size]
+            latency.append({
+                'batch': size,
+                'sklearn_ms': self._time(sklearn_predict, frame.iloc[:size], options['repeat']),
+                'compiled_ms': self._time(compiled_predict, rows, options['repeat']),
+            })
+
+        self.stdout.write(json.dumps({'parity': parity, 'latency': latency}, indent=2))
+        if not parity['identical_probabilities']:
+            raise CommandError('Compiled forest differs from sklearn, not installed')
@@ -0,0 +1,84 @@
+import http.client
+import json
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode, urlsplit
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = ('Measures throughput and latency of API endpoints under concurrent clients, '
+            'e.g. /api/iv-curve/ on the sync server against /api/iv-curve/async/ on an ASGI one')
+
+    def add_arguments(self, parser):
+        parser.add_argument('url', nargs='+', help='Endpoint URLs to compare, run one after another')
+        parser.add_argument('--clients', type=int, default=100, help='Concurrent clients')
+        parser.add_argument('--requests', type=int, default=2000, help='Requests per URL')
+        parser.add_argument('--body', help='JSON file POSTed with every request (GET without it)')
+        parser.add_argument('--distinct', type=int, default=0,
+                            help='Spread GET requests over this many irradiance values (1 W/m2 steps '
+                                 'from 200) so the curve cache does not answer everything')
+        parser.add_argument('--timeout', type=float, default=60)
+
+    def _run(self, url, body, options):
+        parts = urlsplit(url)
+        connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+        local = threading.local()
+        headers = {'Content-Type': 'application/json'} if body is not None else {}
+
+        def request(index):
+            if not hasattr(local, 'connection'):
+                local.connection = connection_class(parts.netloc, timeout=options['timeout'])
+            path = parts.path or '/'
+            query = parts.query
+            if options['distinct'] and body is None:
+                query = '&'.join(filter(None, [query, urlencode({'irradiance': 200 + index % options['distinct']})]))
+            if query:
+                path += '?' + query
+
+            started = time.perf_counter()
+            try:
+                local.connection.request('POST' if body is not None else 'GET', path, body=body, headers=headers)
+                response = local.connection.getresponse()
+                response.read()
+                status = response.status
+            except (OSError, http.client.HTTPException):
+                local.connection.close()
+                del local.connection
+                status = 'error'
+            return status, time.perf_counter() - started
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(options['clients']) as pool:
+            results = list(pool.map(request, range(options['requests'])))
+        elapsed = time.perf_counter() - started
+
+        statuses = Counter(str(status) for status, _ in results)
+        latencies = np.array([latency for _, latency in results]) * 1000
+        return {
+            'url': url,
+            'requests': len(results),
+            'statuses': dict(statuses),
+            'seconds': round(elapsed, 2),
+            'requests_per_second': round(len(results) / elapsed, 1),
+            'p50_ms': round(float(np.percentile(latencies, 50)), 1),
+            'p95_ms': round(float(np.percentile(latencies, 95)), 1),
+            'p99_ms': round(float(np.percentile(latencies, 99)), 1),
+        }
+
+    def handle(self, *args, **options):
+        body = None
+        if options['body']:
+            try:
+                with open(options['body'], 'rb') as f:
+                    body = f.read()
+                json.loads(body)
+            except (OSError, ValueError) as e:
+                raise CommandError('Invalid --body file: ' + str(e))
+
+        results = [self._run(url, body, options) for url in options['url']]
+        self.stdout.write(json.dumps(results, indent=2))
@@ -0,0 +1,58 @@
+import os
+import shutil
+import tempfile
+import urllib.request
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.api.module_catalog import ModuleCatalog, get_catalog
+
+
+class Command(BaseCommand):
+    help = ('Replaces the local module catalog (settings.MODULE_DB_PATH) with a CSV file or URL '
+            '(default settings.MODULE_DB_URL) and reloads it')
+
+    def add_arguments(self, parser):
+        parser.add_argument('source', nargs='?',
+                            help='Path or http(s) URL of a CEC module database CSV file')
+        parser.add_argument('--if-missing', action='store_true',
+                            help='Do nothing when the catalog file already exists (deploy bootstrap)')
+
+    def handle(self, *args, **options):
+        source = options['source'] or settings.MODULE_DB_URL
+        target = settings.MODULE_DB_PATH
+
+        if options['if_missing'] and os.path.isfile(target):
+            self.stdout.write(f'Module catalog present: {target}')
+            return
+
+        target_dir = os.path.dirname(os.path.abspath(target))
+        os.makedirs(target_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=target_dir, suffix='.csv')
+        os.close(fd)
+        try:
+            if source.startswith(('http://', 'https://')):
+                try:
+                    with urllib.request.urlopen(source, timeout=60) as response, open(tmp_path, 'wb') as f:
+                        shutil.copyfileobj(response, f)
+                except OSError as e:
+                    raise CommandError(f'Cannot download {source}: {e}')
+            elif os.path.isfile(source):
+                shutil.copyfile(source, tmp_path)
+            else:
+                raise CommandError('File not found: ' + source)
+
+            # Validate before touching the live file
+            try:
+                rows = len(ModuleCatalog(tmp_path))
+            except Exception as e:
+                raise CommandError('Invalid module catalog: ' + str(e))
+
+            os.replace(tmp_path, target)
+        finally:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+
+        get_catalog().reload()
+        self.stdout.write(self.style.SUCCESS(f'Module catalog refreshed: {rows} modules -> {target}'))
@@ -0,0 +1,51 @@
+import json
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.api.module_catalog import get_catalog
+from apps.api.training import install_artifacts, run_training
+
+
+class Command(BaseCommand):
+    help = 'Generates the synthetic fault-signature library and trains the anomaly classifier'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--samples', type=int, default=20,
+                            help='Severity samples per (technology, fault) pair')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                            help='Simulation processes (1 disables the pool)')
+        parser.add_argument('--chunk-size', type=int, default=5000,
+                            help='Curves simulated per worker task')
+        parser.add_argument('--estimators', type=int, default=100)
+        parser.add_argument('--output-dir', default=settings.ANOMALY_ARTIFACTS_DIR,
+                            help='Directory receiving the versioned artifacts')
+        parser.add_argument('--install', action='store_true',
+                            help='Replace the served scaler/classifier with the new version')
+
+    def handle(self, *args, **options):
+        try:
+            module_db = get_catalog().frame
+        except (OSError, ValueError) as e:
+            raise CommandError('Module catalog unavailable: ' + str(e))
+
+        version_dir, report = run_training(
+            module_db,
+            options['output_dir'],
+            samples_per_fault=options['samples'],
+            seed=options['seed'],
+            workers=options['workers'],
+            n_estimators=options['estimators'],
+            chunk_size=options['chunk_size'],
+        )
+
+        summary = {key: report[key] for key in ('version', 'n_curves', 'timings', 'cv_scores', 'cv_mean') if key in report}
+        self.stdout.write(json.dumps(summary, indent=2))
+        self.stdout.write(self.style.SUCCESS('Artifacts written to ' + version_dir))
+
+        if options['install']:
+            install_artifacts(version_dir, settings.ANOMALY_SCALER_PATH, settings.ANOMALY_CLASSIFIER_PATH,
+                              settings.ANOMALY_COMPILED_PATH)
+            self.stdout.write(self.style.SUCCESS('Installed version ' + report['version']))
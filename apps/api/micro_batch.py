@@ -0,0 +1,161 @@
+import os
+import queue
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future
+
+import numpy as np
+from django.conf import settings
+
+from apps.api.inference import classify
+from apps.api.offload import Overloaded
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent single-curve classifications into batched predict
+    calls. A background thread takes the first queued request and waits up to
+    `window` seconds, or until `max_batch` rows are queued. It then runs one
+    scaler.transform + predict_proba over all of them and resolves each
+    request's future with its own rows. A request with no other arrival in
+    the preceding window is run immediately.
+
+    Metrics: batch-size distribution (power-of-two buckets) and the queueing
+    delay of the last 1000 requests.
+    """
+
+    def __init__(self, classify, window, max_batch, max_queue):
+        self.classify = classify
+        self.window = window
+        self.max_batch = max_batch
+        self._queue = queue.Queue(max_queue)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._last_arrival = float('-inf')
+        self._sizes = Counter()
+        self._delays = deque(maxlen=1000)
+        self._run_times = deque(maxlen=1000)
+        self.batches = 0
+        self.items = 0
+        self.rejected = 0
+
+    def _start(self):
+        # A thread started before a fork does not exist in the child
+        if self._thread is None or self._pid != os.getpid():
+            with self._lock:
+                if self._thread is None or self._pid != os.getpid():
+                    self._thread = threading.Thread(target=self._loop, name='micro-batcher', daemon=True)
+                    self._pid = os.getpid()
+                    self._thread.start()
+
+    def submit(self, features):
+        """
+        Queues a feature DataFrame (one or more rows) for the next batch.
+        :rtype: Future resolving to (labels, probabilities, LoadedModel) for its rows
+        """
+        # Convert here so a malformed request fails alone, not the whole batch
+        values = features.to_numpy(dtype=float)
+        future = Future()
+        self._start()
+        try:
+            self._queue.put_nowait((values, list(features.columns), future, time.perf_counter()))
+        except queue.Full:
+            self.rejected += 1
+            raise Overloaded()
+        return future
+
+    def __call__(self, features):
+        return self.submit(features).result()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        rows = len(batch[0][0])
+        deadline = batch[0][3] + self.window
+        if batch[0][3] - self._last_arrival > self.window and self._queue.empty():
+            # Nothing else arrived within a window: an isolated request (e.g.
+            # on a single sync worker) runs at once instead of waiting
+            deadline = 0
+        while rows < self.max_batch:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            batch.append(item)
+            rows += len(item[0])
+        self._last_arrival = batch[-1][3]
+        return batch, rows
+
+    def _loop(self):
+        import pandas as pd
+
+        while True:
+            batch, rows = self._collect()
+            started = time.perf_counter()
+            try:
+                frame = pd.DataFrame(np.concatenate([item[0] for item in batch]), columns=batch[0][1])
+                labels, probabilities, model = self.classify(frame)
+            except Exception as e:
+                for item in batch:
+                    item[2].set_exception(e)
+                continue
+
+            offset = 0
+            for values, _, future, _ in batch:
+                end = offset + len(values)
+                future.set_result((labels[offset:end], probabilities[offset:end], model))
+                offset = end
+
+            with self._lock:
+                self.batches += 1
+                self.items += len(batch)
+                self._sizes[1 << (rows - 1).bit_length()] += 1
+                self._delays.extend(started - item[3] for item in batch)
+                self._run_times.append(time.perf_counter() - started)
+
+    def stats(self):
+        with self._lock:
+            delays = np.array(self._delays) * 1000
+            run_times = np.array(self._run_times) * 1000
+            sizes = dict(sorted(self._sizes.items()))
+        return {
+            'window_ms': self.window * 1000,
+            'max_batch': self.max_batch,
+            'queued': self._queue.qsize(),
+            'batches': self.batches,
+            'items': self.items,
+            'rejected': self.rejected,
+            'mean_batch_size': self.items / self.batches if self.batches else 0,
+            # Batches per size bucket: rows <= key
+            'batch_sizes': {str(size): count for size, count in sizes.items()},
+            'queue_delay_ms': {
+                'p50': float(np.percentile(delays, 50)) if delays.size else 0,
+                'p95': float(np.percentile(delays, 95)) if delays.size else 0,
+                'max': float(delays.max()) if delays.size else 0,
+            },
+            'mean_predict_ms': float(run_times.mean()) if run_times.size else 0,
+        }
+
+
+_batcher = None
+_batcher_lock = threading.Lock()
+
+
+def get_batcher():
+    """
+    Returns the process-wide micro-batcher, or None when
+    settings.ANOMALY_MICRO_BATCH_WINDOW_MS is 0.
+    """
+    global _batcher
+    if not settings.ANOMALY_MICRO_BATCH_WINDOW_MS:
+        return None
+    if _batcher is None:
+        with _batcher_lock:
+            if _batcher is None:
+                _batcher = MicroBatcher(classify, settings.ANOMALY_MICRO_BATCH_WINDOW_MS / 1000,
+                                        settings.ANOMALY_MICRO_BATCH_MAX, settings.ANOMALY_MICRO_BATCH_MAX_QUEUE)
+    return _batcher
@@ -0,0 +1,66 @@
+# Generated by Django 4.2.9 on 2026-10-16 09:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Site',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('latitude', models.FloatField(blank=True, null=True)),
+                ('longitude', models.FloatField(blank=True, null=True)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PVString',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('manufacturer', models.CharField(blank=True, default='', max_length=255)),
+                ('module', models.CharField(blank=True, default='', max_length=255)),
+                ('modules', models.PositiveIntegerField(default=1)),
+                ('site', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='strings', to='api.site')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Measurement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('measured_at', models.DateTimeField()),
+                ('irradiance', models.FloatField(blank=True, null=True)),
+                ('temperature', models.FloatField(blank=True, null=True)),
+                ('points', models.PositiveIntegerField()),
+                ('curve', models.BinaryField()),
+                ('features', models.JSONField(default=dict)),
+                ('fault_class', models.CharField(max_length=50)),
+                ('probability', models.FloatField(blank=True, null=True)),
+                ('model_version', models.CharField(max_length=64)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('site', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='measurements', to='api.site')),
+                ('string', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='measurements', to='api.pvstring')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='pvstring',
+            constraint=models.UniqueConstraint(fields=('site', 'name'), name='pvstring_site_name'),
+        ),
+        migrations.AddIndex(
+            model_name='measurement',
+            index=models.Index(fields=['site', 'string', 'measured_at'], name='measurement_history'),
+        ),
+        migrations.AddIndex(
+            model_name='measurement',
+            index=models.Index(fields=['fault_class', 'measured_at'], name='measurement_fault'),
+        ),
+    ]
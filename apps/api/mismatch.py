@@ -0,0 +1,182 @@
+"""
+Series/parallel circuit solver for mismatched strings and arrays.
+
+Each module is split into `bypass_diodes` substrings with one bypass diode
+across each. The solver works in three vectorized steps:
+
+1. Every substring's curve comes from pvlib's explicit Bishop '88 form over a
+   grid of diode voltages (no root finding). Substrings that see the same
+   irradiance and temperature share one curve.
+2. Each curve is interpolated onto one shared current grid as V(I), clamped at
+   -bypass_voltage where the bypass diode conducts. These are summed into
+   module and string V(I).
+3. String curves are interpolated onto one shared voltage grid as I(V) and
+   summed into the array curve.
+
+Irradiance can be given per module (strings, modules) or per substring
+(strings, modules, bypass_diodes).
+"""
+
+import numpy as np
+
+from apps.api.iv_curves import DEGDT, EG_REF
+
+
+def _interp_rows(x_new, x, y, left, right):
+    """
+    Row-wise np.interp: x (R, K) ascending per row, y (R, K), x_new (K2,)
+    shared by every row. `left` / `right` are (R,) fill values.
+    :rtype: ndarray (R, K2)
+    """
+    rows, k = x.shape
+    # Shift each row into its own disjoint band so one searchsorted serves all
+    # rows; queries outside a row's band are clipped and then filled below
+    low = x[:, :1]
+    offset = np.arange(rows)[:, None] * (np.max(x[:, -1] - x[:, 0]) + 1)
+    flat = (x - low + offset).ravel()
+    query = x_new[None, :] - low + offset
+
+    hi = np.searchsorted(flat, query.ravel()).reshape(query.shape)
+    hi = np.clip(hi, np.arange(rows)[:, None] * k + 1, np.arange(rows)[:, None] * k + k - 1)
+    lo = hi - 1
+    x0, x1 = x.ravel()[lo], x.ravel()[hi]
+    y0, y1 = y.ravel()[lo], y.ravel()[hi]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        weight = np.where(x1 > x0, (x_new[None, :] - x0) / (x1 - x0), 0)
+    out = y0 + weight * (y1 - y0)
+    out = np.where(x_new[None, :] < x[:, :1], left[:, None], out)
+    return np.where(x_new[None, :] > x[:, -1:], right[:, None], out)
+
+
+def _substring_params(params, bypass_diodes):
+    """
+    CEC parameters of one of `bypass_diodes` equal substrings of the module.
+    """
+    parts = max(bypass_diodes, 1)
+    sub = {key: float(np.asarray(value).ravel()[0]) for key, value in params.items()}
+    sub['a_ref'] /= parts
+    sub['R_s'] /= parts
+    sub['R_sh_ref'] /= parts
+    return sub
+
+
+def substring_curves(pvlib, params, irradiance, temperature, current_grid, bypass_voltage,
+                     diode_points=200):
+    """
+    V(I) on `current_grid` for each (irradiance, temperature) pair, with the
+    bypass diode clamp applied (pass bypass_voltage=np.inf for none).
+    :rtype: ndarray (len(irradiance), len(current_grid))
+    """
+    # A dark substring still conducts through its (huge) shunt; the floor keeps it finite
+    IL, I0, Rs, Rsh, nNsVth = pvlib.pvsystem.calcparams_cec(
+        effective_irradiance=np.maximum(irradiance, 1e-3), temp_cell=temperature,
+        EgRef=EG_REF, dEgdT=DEGDT, **params)
+    n = len(irradiance)
+    IL, I0, Rsh, nNsVth = (np.broadcast_to(np.asarray(a, dtype=float), (n,)) for a in (IL, I0, Rsh, nNsVth))
+    Rs = float(np.asarray(Rs).ravel()[0])
+    i_max = current_grid[-1]
+
+    # Open-circuit diode voltage ignoring the shunt, an upper bound on Voc
+    with np.errstate(divide='ignore', invalid='ignore'):
+        vd_max = np.nan_to_num(nNsVth * np.log1p(IL / I0))
+        # Deep enough in reverse bias to reach i_max, or to pass the bypass clamp
+        vd_min = -np.minimum(bypass_voltage + i_max * Rs, np.maximum(i_max - IL, 0) * Rsh) - 0.1
+
+    # Forward bias gets most of the samples, cosine-clustered towards the knee and Voc
+    forward = np.sin(np.pi / 2 * np.linspace(0, 1, diode_points))
+    reverse = np.linspace(1, 0, 16, endpoint=False)
+    vd = np.concatenate([vd_min[:, None] * reverse, vd_max[:, None] * forward], axis=1)
+
+    i, v, _ = pvlib.singlediode.bishop88(vd, IL[:, None], I0[:, None], Rs, Rsh[:, None], nNsVth[:, None])
+    # Current falls as diode voltage rises, so reverse for an ascending current axis
+    i, v = i[:, ::-1], v[:, ::-1]
+    clamp = -bypass_voltage if np.isfinite(bypass_voltage) else None
+    right = np.full(n, clamp) if clamp is not None else v[:, -1]
+    curves = _interp_rows(current_grid, i, v, left=v[:, 0], right=right)
+    if clamp is not None:
+        curves = np.maximum(curves, clamp)
+    return curves
+
+
+def simulate_array(params, irradiance, temperature=25, bypass_diodes=3, bypass_voltage=0.5,
+                   points=400, irradiance_step=1.0, temperature_step=0.1):
+    """
+    Solves the IV curve of mismatched strings wired in parallel.
+    :param params dict: CEC parameters of the module (stack_module_params([row]))
+    :param irradiance: effective irradiance, (modules,) for one string,
+        (strings, modules) or (strings, modules, bypass_diodes)
+    :param temperature: cell temperature, scalar or broadcastable to (strings, modules)
+    :param bypass_diodes int: bypass diodes (equal substrings) per module, 0 for none
+    :param bypass_voltage float: forward drop of a conducting bypass diode
+    :param points int: samples on the shared current and voltage grids
+    :param irradiance_step float: substring irradiance is rounded to this step
+        (and temperature to `temperature_step`) so near-identical substrings share
+        a curve; 1 W/m2 moves Isc by at most ~0.1 %
+    :rtype: dict with the array 'voltage', 'current', 'power' (points,),
+        'string_voltage' (strings, points) over 'string_current' (points,),
+        'key_points' and 'bypassed' (strings, modules, substrings) at the array MPP
+    """
+    import pvlib
+
+    irradiance = np.asarray(irradiance, dtype=float)
+    if irradiance.ndim == 1:
+        irradiance = irradiance[None, :]
+    substrings = max(bypass_diodes, 1)
+    if irradiance.ndim == 2:
+        irradiance = np.repeat(irradiance[:, :, None], substrings, axis=2)
+    if irradiance.ndim != 3 or irradiance.shape[2] != substrings:
+        raise ValueError('irradiance must be (modules,), (strings, modules) or (strings, modules, %d)' % substrings)
+    strings, modules, _ = irradiance.shape
+    temperature = np.broadcast_to(np.asarray(temperature, dtype=float)[..., None]
+                                  if np.ndim(temperature) else temperature, irradiance.shape)
+
+    sub = _substring_params(params, bypass_diodes)
+    clamp = bypass_voltage if bypass_diodes > 0 else np.inf
+
+    # Identical operating conditions share a curve, so uniform arrays stay cheap
+    conditions = np.column_stack([np.round(irradiance.ravel() / irradiance_step) * irradiance_step,
+                                  np.round(temperature.ravel() / temperature_step) * temperature_step])
+    unique, inverse = np.unique(conditions, axis=0, return_inverse=True)
+    IL_max = pvlib.pvsystem.calcparams_cec(
+        effective_irradiance=max(unique[:, 0].max(), 1.0), temp_cell=unique[:, 1].max(),
+        EgRef=EG_REF, dEgdT=DEGDT, **sub)[0]
+    current_grid = np.linspace(0, 1.05 * float(IL_max), points)
+
+    curves = substring_curves(pvlib, sub, unique[:, 0], unique[:, 1], current_grid, clamp)
+    # (strings, modules * substrings, points) summed along the series chain
+    chain = curves[inverse.ravel()].reshape(strings, modules * substrings, points)
+    string_voltage = chain.sum(axis=1)
+
+    # I(V) per string on a shared voltage grid; V(I) falls with I, so flip both axes
+    voltage = np.linspace(0, max(string_voltage[:, 0].max(), 0), points)
+    string_current = _interp_rows(voltage, string_voltage[:, ::-1], np.broadcast_to(current_grid[::-1], string_voltage.shape),
+                                  left=np.full(strings, current_grid[-1]), right=np.zeros(strings))
+    current = string_current.sum(axis=0)
+    power = voltage * current
+
+    mp = int(np.argmax(power))
+    i_sc, v_oc = float(current[0]), float(voltage[-1])
+    key_points = {
+        'i_sc': i_sc,
+        'v_oc': v_oc,
+        'i_mp': float(current[mp]),
+        'v_mp': float(voltage[mp]),
+        'p_mp': float(power[mp]),
+        'ff': float(power[mp] / (i_sc * v_oc)) if i_sc * v_oc > 0 else 0.0,
+        # Local maxima on the P-V curve; more than one means partial shading
+        'power_peaks': int(np.count_nonzero((power[1:-1] > power[:-2]) & (power[1:-1] >= power[2:]))),
+    }
+
+    # Bypass diodes conducting at each string's operating current at the array Vmp
+    index = np.clip(np.rint(string_current[:, mp] / current_grid[1]).astype(int), 0, points - 1)
+    bypassed = chain[np.arange(strings), :, index] <= -clamp + 1e-9
+
+    return {
+        'voltage': voltage,
+        'current': current,
+        'power': power,
+        'string_current': current_grid,
+        'string_voltage': string_voltage,
+        'key_points': key_points,
+        'bypassed': bypassed.reshape(strings, modules, substrings),
+    }
@@ -0,0 +1,111 @@
+import hashlib
+import os
+import threading
+from collections import namedtuple
+
+from django.conf import settings
+
+
+LoadedModel = namedtuple('LoadedModel', ['scaler', 'classifier', 'version', 'mtimes'])
+
+
+def file_digest(*paths):
+    digest = hashlib.sha1()
+    for path in paths:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+    return digest.hexdigest()[:12]
+
+
+class ModelRegistry:
+    """
+    Holds the fitted scaler and fault classifier for the lifetime of the worker.
+    Artifacts are loaded on first use and swapped in as a single reference when
+    either file changes on disk, so requests never see a half-updated pair.
+
+    When `compiled_path` exists, the NumPy-compiled forest (see
+    apps.api.compiled_forest) serves as both scaler and classifier instead, and
+    sklearn is never imported.
+    """
+
+    def __init__(self, scaler_path, classifier_path, compiled_path=None):
+        self.scaler_path = scaler_path
+        self.classifier_path = classifier_path
+        self.compiled_path = compiled_path
+        self._lock = threading.Lock()
+        self._current = None
+        self._failed_mtimes = None
+
+    def _mtimes(self):
+        if self.compiled_path and os.path.exists(self.compiled_path):
+            return (os.stat(self.compiled_path).st_mtime_ns,)
+        return (os.stat(self.scaler_path).st_mtime_ns,
+                os.stat(self.classifier_path).st_mtime_ns)
+
+    def _load(self, mtimes):
+        if len(mtimes) == 1:
+            from apps.api.compiled_forest import CompiledForest
+
+            forest = CompiledForest.load(self.compiled_path)
+            return LoadedModel(forest, forest, forest.source_version, mtimes)
+
+        import joblib
+
+        scaler = joblib.load(self.scaler_path)
+        # Each worker holds a private copy of the tree arrays (sklearn copies them
+        # on unpickling); the compiled forest is the lighter option
+        classifier = joblib.load(self.classifier_path)
+        if hasattr(classifier, 'n_jobs'):
+            # Thread pools cost more than they save on request-sized batches
+            classifier.n_jobs = None
+        version = file_digest(self.scaler_path, self.classifier_path)
+        return LoadedModel(scaler, classifier, version, mtimes)
+
+    def load(self):
+        """
+        Loads (or reloads) the artifacts unconditionally.
+        """
+        with self._lock:
+            self._current = self._load(self._mtimes())
+        return self._current
+
+    def get(self):
+        """
+        Returns the current LoadedModel, reloading it if an artifact changed.
+        """
+        current = self._current
+        mtimes = self._mtimes()
+        if current is not None and mtimes in (current.mtimes, self._failed_mtimes):
+            return current
+
+        with self._lock:
+            if self._current is not None and mtimes in (self._current.mtimes, self._failed_mtimes):
+                return self._current
+            try:
+                self._current = self._load(mtimes)
+            except Exception:
+                # Artifacts may be mid-write or broken; keep serving the previous
+                # model until the files change again
+                if self._current is None:
+                    raise
+                self._failed_mtimes = mtimes
+            return self._current
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    """
+    Returns the process-wide model registry configured from settings.
+    """
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ModelRegistry(settings.ANOMALY_SCALER_PATH,
+                                          settings.ANOMALY_CLASSIFIER_PATH,
+                                          compiled_path=settings.ANOMALY_COMPILED_PATH)
+    return _registry
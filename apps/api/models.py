@@ -0,0 +1,80 @@
+import numpy as np
+from django.db import models
+
+
+# Curves are stored as little-endian float32 [voltage..., current...]
+CURVE_DTYPE = np.dtype('<f4')
+
+
+def encode_curve(voltage, current):
+    """
+    Packs a measured curve into bytes: 8 bytes per (voltage, current) point.
+    """
+    return np.concatenate([np.asarray(voltage, dtype=CURVE_DTYPE),
+                           np.asarray(current, dtype=CURVE_DTYPE)]).tobytes()
+
+
+def decode_curve(blob):
+    """
+    Inverse of encode_curve.
+    :rtype: (voltage ndarray, current ndarray)
+    """
+    voltage, current = np.frombuffer(blob, dtype=CURVE_DTYPE).reshape(2, -1)
+    return voltage, current
+
+
+class Site(models.Model):
+    name      = models.CharField(max_length=100, unique=True)
+    latitude  = models.FloatField(blank=True, null=True)
+    longitude = models.FloatField(blank=True, null=True)
+    created   = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.name
+
+
+class PVString(models.Model):
+    site         = models.ForeignKey(Site, on_delete=models.CASCADE, related_name='strings')
+    name         = models.CharField(max_length=100)
+    manufacturer = models.CharField(max_length=255, blank=True, default='')
+    module       = models.CharField(max_length=255, blank=True, default='')
+    modules      = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['site', 'name'], name='pvstring_site_name'),
+        ]
+
+    def __str__(self):
+        return f'{self.site.name} / {self.name}'
+
+
+class Measurement(models.Model):
+    """
+    One classified IV curve. `site` duplicates string.site so history and
+    fleet queries filter and order on a single index.
+    """
+    site           = models.ForeignKey(Site, on_delete=models.CASCADE, related_name='measurements')
+    string         = models.ForeignKey(PVString, on_delete=models.CASCADE, related_name='measurements')
+    measured_at    = models.DateTimeField()
+    irradiance     = models.FloatField(blank=True, null=True)
+    temperature    = models.FloatField(blank=True, null=True)
+    points         = models.PositiveIntegerField()
+    curve          = models.BinaryField()  # see encode_curve
+    features       = models.JSONField(default=dict)
+    fault_class    = models.CharField(max_length=50)
+    probability    = models.FloatField(blank=True, null=True)
+    model_version  = models.CharField(max_length=64)
+    created        = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['site', 'string', 'measured_at'], name='measurement_history'),
+            models.Index(fields=['fault_class', 'measured_at'], name='measurement_fault'),
+        ]
+
+    def curve_arrays(self):
+        return decode_curve(self.curve)
+
+    def __str__(self):
+        return f'{self.string_id} @ {self.measured_at}: {self.fault_class}'
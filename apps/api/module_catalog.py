@@ -0,0 +1,108 @@
+import os
+import threading
+
+from django.conf import settings
+
+
+REQUIRED_COLUMNS = [
+    'Manufacturer', 'Model', 'alpha_sc', 'a_ref', 'I_L_ref',
+    'I_o_ref', 'R_sh_ref', 'R_s', 'Adjust',
+]
+
+
+def _key(manufacturer, model):
+    return (str(manufacturer).strip(), str(model).strip())
+
+
+class ModuleCatalog:
+    """
+    In-process catalog of CEC module parameters loaded from a local CSV file.
+    Rows are indexed by the stripped (manufacturer, model) pair, so lookups are
+    a dictionary access. The file is re-read when its mtime changes.
+
+    The frame, its index and the mtime are replaced together as one tuple, so
+    a reader never pairs row positions of one revision with another's frame.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._state = (None, {}, None)  # (frame, index, mtime)
+
+    def _load(self, mtime):
+        import pandas as pd
+
+        frame = pd.read_csv(self.path)
+        missing = [c for c in REQUIRED_COLUMNS if c not in frame.columns]
+        if missing:
+            raise ValueError('Module catalog is missing columns: ' + ', '.join(missing))
+
+        frame['Manufacturer'] = frame['Manufacturer'].astype(str).str.strip()
+        frame['Model'] = frame['Model'].astype(str).str.strip()
+
+        index = {}
+        for position, key in enumerate(zip(frame['Manufacturer'], frame['Model'])):
+            # Keep the first row for duplicated entries, like the old table scan did
+            index.setdefault(key, position)
+
+        self._state = (frame, index, mtime)
+
+    def _refresh(self):
+        """
+        :rtype: current (frame, index, mtime), reloaded first if the file changed
+        """
+        mtime = os.stat(self.path).st_mtime_ns
+        state = self._state
+        if mtime == state[2]:
+            return state
+        with self._lock:
+            if mtime != self._state[2]:
+                self._load(mtime)
+            return self._state
+
+    def reload(self):
+        """
+        Forces a re-read of the catalog file.
+        """
+        with self._lock:
+            self._load(os.stat(self.path).st_mtime_ns)
+
+    @property
+    def version(self):
+        """
+        Identifies the loaded file revision (its mtime in ns), usable in cache keys.
+        """
+        return self._refresh()[2]
+
+    @property
+    def frame(self):
+        return self._refresh()[0]
+
+    def __len__(self):
+        return len(self.frame)
+
+    def get(self, manufacturer, model):
+        """
+        Returns the module row as a dict, or None if there is no exact match.
+        """
+        frame, index, _ = self._refresh()
+        position = index.get(_key(manufacturer, model))
+        if position is None:
+            return None
+        return frame.iloc[position].to_dict()
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog():
+    """
+    Returns the process-wide catalog bound to settings.MODULE_DB_PATH.
+    """
+    global _catalog
+    if _catalog is None or _catalog.path != settings.MODULE_DB_PATH:
+        with _catalog_lock:
+            if _catalog is None or _catalog.path != settings.MODULE_DB_PATH:
+                _catalog = ModuleCatalog(settings.MODULE_DB_PATH)
+    return _catalog
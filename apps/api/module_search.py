@@ -0,0 +1,200 @@
+"""
+Typo-tolerant search over the module catalog.
+
+Each module is indexed by the trigrams of its normalized "manufacturer model"
+text, in an inverted index of trigram -> row positions. A query is scored
+against every module sharing a trigram with it in one np.bincount over the
+posting lists (Jaccard similarity of the trigram sets). Prefix matches on the
+manufacturer, the model or the full name rank first; they are found by
+bisecting sorted name lists. Filters (manufacturer, technology, STC power)
+are boolean masks precomputed per column.
+"""
+
+import bisect
+import re
+import threading
+from collections import defaultdict
+
+import numpy as np
+
+from apps.api.module_catalog import get_catalog
+
+
+# Catalog columns returned per result, when present
+RESULT_COLUMNS = ['Manufacturer', 'Model', 'Technology', 'STC', 'V_oc_ref', 'I_sc_ref', 'V_mp_ref', 'I_mp_ref']
+
+# Fuzzy matches below this trigram similarity are dropped
+MIN_SIMILARITY = 0.25
+
+_NON_ALNUM = re.compile(r'[^0-9a-z]+')
+
+
+def normalize(text):
+    """
+    Lower-cased text with punctuation folded into single spaces.
+    """
+    return _NON_ALNUM.sub(' ', str(text).lower()).strip()
+
+
+def trigrams(text):
+    """
+    Trigram set of normalized text, each word padded like pg_trgm ('  w ').
+    """
+    grams = set()
+    for word in text.split():
+        padded = '  ' + word + ' '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class _Prefixes:
+    """
+    Sorted (text, position) pairs answering "which rows start with this prefix".
+    """
+
+    def __init__(self, texts):
+        pairs = sorted((text, position) for position, text in enumerate(texts))
+        self.texts = [text for text, _ in pairs]
+        self.positions = np.array([position for _, position in pairs], dtype=np.int64)
+
+    def find(self, prefix):
+        start = bisect.bisect_left(self.texts, prefix)
+        end = bisect.bisect_left(self.texts, prefix + '\uffff')
+        return self.positions[start:end]
+
+
+class ModuleSearchIndex:
+    """
+    Search index over one catalog revision. Build it once per revision (see
+    get_search_index); queries never touch the DataFrame.
+    """
+
+    def __init__(self, frame, version=None):
+        import pandas as pd
+
+        self.version = version
+        self.size = len(frame)
+        columns = frame[[c for c in RESULT_COLUMNS if c in frame.columns]]
+        # Plain Python records (NaN as None), so results need no per-query pandas work
+        self._records = columns.astype(object).where(columns.notna(), None).to_dict(orient='records')
+
+        manufacturers = [normalize(m) for m in frame['Manufacturer']]
+        models = [normalize(m) for m in frame['Model']]
+        names = [f'{m} {n}' for m, n in zip(manufacturers, models)]
+        self._manufacturer_prefixes = _Prefixes(manufacturers)
+        self._model_prefixes = _Prefixes(models)
+        self._name_prefixes = _Prefixes(names)
+
+        postings = defaultdict(list)
+        self._gram_counts = np.zeros(self.size, dtype=np.int32)
+        for position, name in enumerate(names):
+            grams = trigrams(name)
+            self._gram_counts[position] = len(grams)
+            for gram in grams:
+                postings[gram].append(position)
+        self._postings = {gram: np.array(rows, dtype=np.int64) for gram, rows in postings.items()}
+
+        # Browsing order without a query: manufacturer, then model
+        self._order = self._name_prefixes.positions
+        self._rank = np.empty(self.size, dtype=np.int64)
+        self._rank[self._order] = np.arange(self.size)
+
+        by_manufacturer = defaultdict(list)
+        for position, manufacturer in enumerate(frame['Manufacturer']):
+            by_manufacturer[manufacturer].append(position)
+        self._by_manufacturer = {m: np.array(rows, dtype=np.int64) for m, rows in by_manufacturer.items()}
+        self.manufacturers = sorted(self._by_manufacturer, key=str.lower)
+
+        self._technology = (frame['Technology'].astype(str).str.lower().to_numpy()
+                            if 'Technology' in frame.columns else None)
+        self._stc = (pd.to_numeric(frame['STC'], errors='coerce').to_numpy(dtype=float)
+                     if 'STC' in frame.columns else None)
+        self.technologies = (sorted(set(frame['Technology'].dropna().astype(str)))
+                             if 'Technology' in frame.columns else [])
+
+    def _mask(self, manufacturer=None, technology=None, stc_min=None, stc_max=None):
+        mask = np.ones(self.size, dtype=bool)
+        if manufacturer:
+            mask[:] = False
+            rows = self._by_manufacturer.get(str(manufacturer).strip())
+            if rows is not None:
+                mask[rows] = True
+        if technology:
+            if self._technology is None:
+                raise ValueError('The catalog has no Technology column')
+            mask &= self._technology == str(technology).lower()
+        if stc_min is not None or stc_max is not None:
+            if self._stc is None:
+                raise ValueError('The catalog has no STC column')
+            if stc_min is not None:
+                mask &= self._stc >= stc_min
+            if stc_max is not None:
+                mask &= self._stc <= stc_max
+        return mask
+
+    def _score(self, query):
+        """
+        Score per row: 1 + similarity for prefix matches, similarity otherwise.
+        """
+        grams = trigrams(query)
+        scores = np.zeros(self.size)
+        lists = [self._postings[gram] for gram in grams if gram in self._postings]
+        if lists:
+            shared = np.bincount(np.concatenate(lists), minlength=self.size)
+            scores = shared / (len(grams) + self._gram_counts - shared)
+        prefix = np.zeros(self.size, dtype=bool)
+        for prefixes in (self._manufacturer_prefixes, self._model_prefixes, self._name_prefixes):
+            prefix[prefixes.find(query)] = True
+        return np.where(prefix, 1 + scores, np.where(scores >= MIN_SIMILARITY, scores, 0))
+
+    def search(self, query='', page=1, page_size=20, **filters):
+        """
+        One page of matching modules, best first (catalog order without a query).
+        :param filters: manufacturer (exact), technology, stc_min, stc_max
+        :rtype: dict with 'total', 'page', 'page_size' and 'results'
+        """
+        mask = self._mask(**filters)
+        query = normalize(query)
+        if query:
+            scores = np.where(mask, self._score(query), 0)
+            matches = np.flatnonzero(scores > 0)
+            # Highest score first, ties in browsing order
+            matches = matches[np.lexsort((self._rank[matches], -scores[matches]))]
+        else:
+            scores = None
+            matches = self._order[mask[self._order]]
+
+        start = (page - 1) * page_size
+        results = []
+        for position in matches[start:start + page_size].tolist():
+            record = dict(self._records[position])
+            if scores is not None:
+                record['score'] = round(float(scores[position]), 4)
+            results.append(record)
+        return {'total': int(len(matches)), 'page': page, 'page_size': page_size, 'results': results}
+
+    def closest(self, manufacturer, model='', limit=5):
+        """
+        Up to `limit` (Manufacturer, Model) records nearest to a failed lookup.
+        """
+        found = self.search(f'{manufacturer} {model}', page_size=limit)['results']
+        return [{'Manufacturer': r['Manufacturer'], 'Model': r['Model']} for r in found]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_search_index():
+    """
+    Returns the search index of the current catalog, rebuilt only when the
+    catalog file changes.
+    """
+    global _index
+    catalog = get_catalog()
+    version = (catalog.path, catalog.version)
+    if _index is None or _index.version != version:
+        with _index_lock:
+            if _index is None or _index.version != version:
+                _index = ModuleSearchIndex(catalog.frame, version=version)
+    return _index
@@ -0,0 +1,109 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+
+class Overloaded(Exception):
+    """
+    Raised when the compute pool already holds its maximum of pending jobs.
+    """
+
+
+class Offloader:
+    """
+    Bounded thread pool for CPU-bound solver and inference work called from
+    async views. numpy, pvlib and the forest's tree traversal release the GIL
+    for most of their run time, so threads scale across cores. They also
+    share the catalog, curve cache and model registry, which a process pool
+    would have to copy.
+
+    - Backpressure: at most `max_pending` jobs may be queued or running. Past
+      that, submit raises Overloaded so the view can answer 503 straight away
+      instead of growing an unbounded queue.
+    - Coalescing: jobs submitted with the same key while one is in flight
+      share its future, so a burst of identical requests costs one computation.
+    """
+
+    def __init__(self, workers, max_pending):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix='compute')
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._pending = 0
+        self.submitted = 0
+        self.coalesced = 0
+        self.rejected = 0
+
+    def _done(self, key, future):
+        with self._lock:
+            self._pending -= 1
+            if key is not None and self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    def submit(self, key, fn, *args):
+        """
+        Schedules fn(*args), or joins the in-flight job with the same key.
+        :rtype: concurrent.futures.Future
+        """
+        return self.adopt(key, lambda: self._executor.submit(fn, *args))
+
+    def adopt(self, key, start):
+        """
+        Like submit, for work that schedules itself elsewhere: start() returns
+        its Future (e.g. the inference micro-batcher's). It still counts
+        against max_pending and is coalesced by key.
+        """
+        with self._lock:
+            if key is not None and key in self._inflight:
+                self.coalesced += 1
+                return self._inflight[key]
+            if self._pending >= self.max_pending:
+                self.rejected += 1
+                raise Overloaded()
+            future = start()
+            self._pending += 1
+            self.submitted += 1
+            if key is not None:
+                self._inflight[key] = future
+        future.add_done_callback(lambda f: self._done(key, f))
+        return future
+
+    async def run(self, key, fn, *args):
+        """
+        Awaits fn(*args) on the pool. A client that disconnects cancels only
+        its own wait, never a job other requests are sharing.
+        """
+        return await self.wait(self.submit(key, fn, *args))
+
+    @staticmethod
+    async def wait(future):
+        return await asyncio.shield(asyncio.wrap_future(future))
+
+    def stats(self):
+        return {
+            'workers': self.workers,
+            'max_pending': self.max_pending,
+            'pending': self._pending,
+            'submitted': self.submitted,
+            'coalesced': self.coalesced,
+            'rejected': self.rejected,
+        }
+
+
+_offloader = None
+_offloader_lock = threading.Lock()
+
+
+def get_offloader():
+    """
+    Returns the process-wide compute pool configured from settings.
+    """
+    global _offloader
+    if _offloader is None:
+        with _offloader_lock:
+            if _offloader is None:
+                _offloader = Offloader(settings.COMPUTE_POOL_WORKERS, settings.COMPUTE_POOL_MAX_PENDING)
+    return _offloader
@@ -0,0 +1,177 @@
+import os
+
+from celery import chord, group
+from django.conf import settings
+
+from home.celery import app
+from apps.api.curve_surface import get_surface_store
+from apps.api.energy import energy_options, guess_profile_format, iter_profile, save_series, simulate_energy
+from apps.api.fleet import classify_chunk, merge_results, merge_summaries, remove_work_dir, split_traces
+from apps.api.inference import nameplate_from_key_points
+from apps.api.ingest import iter_traces
+from apps.api.iv_curves import compute_iv_curves, key_points_row, stack_module_params
+from apps.api.module_catalog import get_catalog
+
+
+@app.task(bind=True)
+def simulate_energy_task(self, data: dict):
+    """
+    Background variant of /api/energy/ for long profiles.
+    :param data dict: request fields (manufacturer, model, modules, strings,
+        degradation_rate, start_date, interval_minutes) plus `profile`, the path
+        of a file inside settings.WEATHER_DATA_DIR, and `remove_source` to delete
+        it once read (uploaded profiles)
+    :rtype: dict with the energy summary and the .npz series file
+    """
+    profile = data['profile']
+    try:
+        m = get_catalog().get(data.get('manufacturer', ''), data.get('model', ''))
+        if m is None:
+            raise ValueError('Module not found')
+
+        options = energy_options(data)
+        year = options['start_date'].year if options['start_date'] else None
+        chunks = iter_profile(profile, guess_profile_format(profile), settings.ENERGY_CHUNK_SIZE, year)
+
+        def progress(done):
+            self.update_state(state='PROGRESS', meta={'samples': done})
+
+        result = simulate_energy(stack_module_params([m]), chunks, progress=progress, **options)
+    finally:
+        if data.get('remove_source'):
+            os.unlink(profile)
+
+    series_file = os.path.join(settings.ENERGY_RESULTS_DIR, self.request.id + '.npz')
+    save_series(series_file, result)
+    return {'summary': result['summary'], 'series_file': series_file}
+
+
+@app.task
+def build_iv_surface_task(manufacturer: str, model: str):
+    """
+    Precomputes the IV-curve lookup surface of one module on the settings grid.
+    :rtype: dict with the surface file and its worst cell error
+    """
+    m = get_catalog().get(manufacturer, model)
+    if m is None:
+        raise ValueError('Module not found')
+
+    path, surface = get_surface_store().build(m, settings.IV_SURFACE_IRRADIANCE, settings.IV_SURFACE_TEMPERATURE)
+    return {'path': path, 'error_bound': surface.error_bound}
+
+
+@app.task(bind=True)
+def fleet_analysis_task(self, data: dict):
+    """
+    Classifies every trace of a large IV-tracer export (see apps.api.fleet).
+    Splits the file into chunks, then fans them out as a chord of
+    classify_chunk_task with merge_fleet_task as callback. Progress while
+    splitting is this task's PROGRESS state; afterwards its result holds the
+    group and merge task ids, which fleet_progress follows.
+    :param data dict: `source` (path on shared storage), `format`, manufacturer,
+        model, irradiance, temperature, modules, module_type_code, optional
+        site / measured_at to store the measurements and `remove_source`
+    :rtype: dict with chunks, curves, skipped, group_id and merge_id
+    """
+    m = get_catalog().get(data.get('manufacturer', ''), data.get('model', ''))
+    if m is None:
+        raise ValueError('Module not found')
+
+    irr = float(data.get('irradiance', 1000))
+    temp_cell = float(data.get('temperature', 25))
+    _, _, _, key_points = compute_iv_curves(stack_module_params([m]), irr, temp_cell, int(data.get('modules', 1)))
+    nameplate = nameplate_from_key_points(key_points_row(key_points))
+    target = {'site': str(data['site']), 'measured_at': data.get('measured_at'),
+              'irradiance': irr, 'temperature': temp_cell} if data.get('site') else None
+
+    def progress(chunks, curves):
+        self.update_state(state='PROGRESS', meta={'stage': 'splitting', 'chunks': chunks, 'curves': curves})
+
+    source = data['source']
+    work_dir = os.path.join(settings.FLEET_WORK_DIR, self.request.id)
+    try:
+        with open(source, 'rb') as f:
+            paths, curves, skipped = split_traces(iter_traces(f, data['format'], path=source), work_dir,
+                                                  settings.FLEET_CHUNK_CURVES, progress)
+    except BaseException:
+        remove_work_dir(work_dir)
+        raise
+    finally:
+        if data.get('remove_source'):
+            os.unlink(source)
+
+    if not paths:
+        # A chord of an empty group never runs its callback: merge right away
+        merge = merge_fleet_task.delay([], self.request.id, work_dir, paths, skipped)
+        return {'chunks': 0, 'curves': curves, 'skipped': skipped, 'group_id': None, 'merge_id': merge.id}
+
+    header = group(classify_chunk_task.s(path, nameplate, int(data.get('module_type_code', 0)), target)
+                   for path in paths)
+    # A failed chunk fails the chord without running the merge: the errback clears the chunks
+    callback = merge_fleet_task.s(self.request.id, work_dir, paths, skipped).on_error(
+        remove_fleet_work_dir_task.si(work_dir))
+    result = chord(header)(callback)
+    # Saved so the progress of the chunks can be looked up by group id
+    result.parent.save()
+    return {'chunks': len(paths), 'curves': curves, 'skipped': skipped,
+            'group_id': result.parent.id, 'merge_id': result.id}
+
+
+@app.task
+def classify_chunk_task(path: str, nameplate: dict, module_type_code: int, target: dict = None):
+    """
+    Classifies one chunk file of a fleet analysis.
+    :rtype: dict, see apps.api.fleet.classify_chunk
+    """
+    return classify_chunk(path, nameplate, module_type_code, target)
+
+
+@app.task
+def merge_fleet_task(summaries: list, job_id: str, work_dir: str, paths: list, skipped: int):
+    """
+    Chord callback of fleet_analysis_task: merges the chunk results into
+    settings.FLEET_RESULTS_DIR/<job id>.csv and the chunk summaries into one.
+    :rtype: dict with curves, skipped, counts per class, stored, model_versions and results_file
+    """
+    results_file = os.path.join(settings.FLEET_RESULTS_DIR, job_id + '.csv')
+    merge_results(paths, results_file)
+    remove_work_dir(work_dir)
+    return {**merge_summaries(summaries), 'skipped': skipped, 'results_file': results_file}
+
+
+@app.task
+def remove_fleet_work_dir_task(work_dir: str):
+    """
+    Error callback of the fleet chord: removes the chunk files of a failed analysis.
+    """
+    remove_work_dir(work_dir)
+
+
+def fleet_progress(task_id):
+    """
+    State of a fleet analysis across its coordinator, chunk and merge tasks.
+    :rtype: dict with state and, depending on it, progress, summary or error
+    """
+    from celery.result import AsyncResult, GroupResult
+
+    result = AsyncResult(task_id, app=app)
+    payload = {'task_id': task_id, 'state': result.state}
+    if result.state == 'PROGRESS':
+        payload['progress'] = result.info
+    elif result.failed():
+        payload['error'] = str(result.result)
+    elif result.successful():
+        job = result.result
+        merge = AsyncResult(job['merge_id'], app=app)
+        if merge.successful():
+            payload['summary'] = merge.result
+        elif merge.failed():
+            payload.update({'state': 'FAILURE', 'error': str(merge.result)})
+        else:
+            chunks = GroupResult.restore(job['group_id'], app=app) if job['group_id'] else None
+            done = chunks.completed_count() if chunks is not None else 0
+            payload.update({'state': 'PROGRESS', 'progress': {
+                'stage': 'classifying' if done < job['chunks'] else 'merging',
+                'chunks_done': done, 'chunks': job['chunks'], 'curves': job['curves'],
+            }})
+    return payload
@@ -0,0 +1,589 @@
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+from concurrent.futures import Future
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from apps.api import views
+from apps.api.compiled_forest import CompiledForest
+from apps.api.curve_surface import _relative_error, build_surface, compare
+from apps.api.encoding import DTYPES, decode_binary, encode_binary, encode_npy
+from apps.api.energy import MAX_GAP, iter_profile, simulate_energy
+from apps.api.features import FEATURE_NAMES, extract_iv_feature_matrix, extract_iv_features
+from apps.api.history import fault_strings, record_measurements, string_history
+from apps.api.iv_curves import adaptive_voltage_grid, compute_iv_curves, stack_module_params
+from apps.api.model_registry import LoadedModel
+from apps.api.models import PVString
+from apps.api.module_search import ModuleSearchIndex
+
+
+# CEC parameters of a 72-cell mono-c-Si module (A10Green Technology A10J-S72-175)
+MODULE = {
+    'alpha_sc': 0.002146, 'a_ref': 1.981696, 'I_L_ref': 5.175703, 'I_o_ref': 1.149158e-09,
+    'R_sh_ref': 287.102203, 'R_s': 0.316688, 'Adjust': 16.057121,
+}
+NAMEPLATE = {'I_sc_ref': 5.17, 'V_oc_ref': 43.99, 'I_mp_ref': 4.78, 'V_mp_ref': 36.63}
+
+
+class ImportTests(SimpleTestCase):
+    """
+    Web workers and manage.py commands import the API without pvlib, pandas or
+    sklearn, which are only loaded on first use.
+    """
+
+    HEAVY = ['pvlib', 'sklearn', 'pandas', 'scipy', 'joblib']
+    SCRIPT = '''
+import json, os, sys
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+import django
+django.setup()
+import apps.api.views, apps.api.urls, apps.api.tasks
+print(json.dumps([name for name in %r if name in sys.modules]))
+'''
+
+    def test_api_imports_are_light(self):
+        # A fresh interpreter: this test process has long imported everything
+        output = subprocess.run([sys.executable, '-c', self.SCRIPT % self.HEAVY], cwd=settings.BASE_DIR,
+                                capture_output=True, text=True, check=True).stdout
+        self.assertEqual(json.loads(output.splitlines()[-1]), [])
+
+
+class FeatureMatrixTests(SimpleTestCase):
+    """
+    extract_iv_feature_matrix must reproduce extract_iv_features row by row.
+    """
+
+    def assertParity(self, V, I, nameplate=NAMEPLATE, key_points=None):
+        with np.errstate(all='ignore'):
+            matrix = extract_iv_feature_matrix(V, I, nameplate, key_points)
+            for row, (voltage, current) in enumerate(zip(V, I)):
+                curve_key_points = None if key_points is None else {
+                    key: values[row] for key, values in key_points.items()}
+                features = extract_iv_features(voltage, current, nameplate, curve_key_points)
+                expected = [features[name] for name in FEATURE_NAMES]
+                np.testing.assert_allclose(matrix[row], expected, rtol=1e-9, atol=1e-12,
+                                           err_msg=f'curve {row}')
+
+    def random_curves(self, n=200, points=100, seed=0):
+        rng = np.random.default_rng(seed)
+        V, I, _, key_points = compute_iv_curves(stack_module_params([MODULE] * n), rng.uniform(100, 1200, n),
+                                                rng.uniform(-10, 70, n), points=points)
+        # Bypass-diode steps on a third of the curves, then measurement noise
+        shaded = (rng.random(n) < 0.3)[:, None] & (V < rng.uniform(0.2, 0.8, (n, 1)) * V[:, -1:])
+        I = np.where(shaded, I * 0.5, I) + rng.normal(0, 0.002, I.shape) * I[:, :1]
+        return V, I, key_points
+
+    def test_random_curves(self):
+        V, I, _ = self.random_curves()
+        self.assertParity(V, I)
+
+    def test_random_curves_with_key_points(self):
+        V, I, key_points = self.random_curves(seed=1)
+        self.assertParity(V, I, key_points={key: key_points[key] for key in ('i_sc', 'v_oc', 'i_mp', 'v_mp')})
+
+    def test_adaptive_grid(self):
+        rng = np.random.default_rng(2)
+        V, I, _, _ = compute_iv_curves(stack_module_params([MODULE] * 50), rng.uniform(100, 1200, 50), 25,
+                                       points=64, sampling='adaptive')
+        self.assertParity(V, I)
+
+    def test_degenerate_curves(self):
+        v = np.linspace(0, 40, 50)
+        nan_curve = 5 * (1 - (v / 40) ** 8)
+        nan_curve[[3, 20]] = np.nan
+        V = np.vstack([v] * 6)
+        I = np.vstack([
+            np.full_like(v, 5.0),   # flat: no knee, no Voc
+            5 * (1 - v / 40),       # straight line: no knee
+            np.zeros_like(v),       # dark
+            nan_curve,              # dropped samples
+            np.r_[np.full(25, 5.0), np.full(25, 2.0)],  # single step
+            -5 * (1 - v / 40),      # reversed polarity
+        ])
+        self.assertParity(V, I)
+
+    def test_constant_voltage(self):
+        V = np.vstack([np.full(20, 30.0), np.r_[np.zeros(10), np.full(10, 30.0)]])
+        I = np.vstack([np.linspace(5, 0, 20)] * 2)
+        self.assertParity(V, I)
+
+    def test_zero_nameplate(self):
+        V, I, _ = self.random_curves(n=20, seed=3)
+        self.assertParity(V, I, nameplate=dict.fromkeys(NAMEPLATE, 0.0))
+
+
+class AsyncViewTests(SimpleTestCase):
+    """
+    Async views keep parsing, catalog and solver work off the event loop.
+    """
+
+    def record_thread(self, target):
+        threads = []
+
+        def wrapper(*args, **kwargs):
+            threads.append(threading.current_thread().name)
+            return target(*args, **kwargs)
+        return threads, wrapper
+
+    async def test_detect_anomaly_features_run_on_the_pool(self):
+        v = np.linspace(0, 40, 50)
+        body = {'measured_voltage': v.tolist(), 'measured_current': (5 * (1 - (v / 40) ** 8)).tolist(),
+                'modeled_voltage': v.tolist(), 'modeled_current': (5.1 * (1 - (v / 40) ** 8)).tolist()}
+        result = Future()
+        result.set_result((np.array(['Normal']), np.array([[1.0]]), LoadedModel(None, None, 'test', None)))
+
+        threads, parse = self.record_thread(views._anomaly_request)
+        with mock.patch.object(views, '_anomaly_request', parse), \
+                mock.patch.object(views, '_submit_classify', return_value=result):
+            response = await self.async_client.post('/api/detect-anomaly/async/', json.dumps(body),
+                                                    content_type='application/json')
+        self.assertEqual(json.loads(response.content), {'anomaly': 'Normal', 'model_version': 'test'})
+        self.assertEqual(len(threads), 1)
+        self.assertTrue(threads[0].startswith('compute'), threads[0])
+
+    async def test_iv_curve_job_runs_on_the_pool(self):
+        threads, job = self.record_thread(lambda request: views.JsonResponse({'error': 'stub'}, status=404))
+        with mock.patch.object(views, '_iv_curve_job', job):
+            response = await self.async_client.get('/api/iv-curve/async/', {'manufacturer': 'x', 'model': 'y'})
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(len(threads), 1)
+        self.assertTrue(threads[0].startswith('compute'), threads[0])
+
+
+class CompiledForestTests(SimpleTestCase):
+    """
+    The exported NumPy forest must give sklearn's probabilities exactly.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        import joblib
+        from sklearn.ensemble import RandomForestClassifier
+        from sklearn.preprocessing import StandardScaler
+
+        from apps.api.training import export_compiled
+
+        rng = np.random.default_rng(0)
+        X = pd.DataFrame(rng.normal(0, 1, (600, 5)) * [1, 10, 0.1, 1e3, 1e-3], columns=list('abcde'))
+        y = np.array(['Normal', 'Shading', 'Soiling'])[(X['a'] + X['b'] / 10 > 0).astype(int) + (X['c'] > 0.05)]
+        cls.scaler = StandardScaler().fit(X)
+        cls.classifier = RandomForestClassifier(n_estimators=15, max_depth=8, random_state=0)
+        cls.classifier.fit(cls.scaler.transform(X), y)
+        cls.X = X
+
+        with tempfile.TemporaryDirectory() as directory:
+            paths = [os.path.join(directory, name) for name in ('scaler.pkl', 'forest.pkl', 'forest.npz')]
+            joblib.dump(cls.scaler, paths[0])
+            joblib.dump(cls.classifier, paths[1])
+            export_compiled(*paths)
+            cls.forest = CompiledForest.load(paths[2])
+
+    def assertSameProbabilities(self, X_scaled):
+        np.testing.assert_array_equal(self.forest.predict_proba(X_scaled),
+                                      self.classifier.predict_proba(X_scaled))
+
+    def test_metadata(self):
+        self.assertEqual(list(self.forest.feature_names_in_), list('abcde'))
+        self.assertEqual(list(self.forest.classes_), list(self.classifier.classes_))
+
+    def test_training_and_random_rows(self):
+        rng = np.random.default_rng(1)
+        X = pd.DataFrame(self.scaler.mean_ + self.scaler.scale_ * rng.normal(0, 2, (5000, 5)),
+                         columns=self.X.columns)
+        np.testing.assert_array_equal(self.forest.transform(X), self.scaler.transform(X))
+        self.assertSameProbabilities(self.scaler.transform(self.X))
+        self.assertSameProbabilities(self.scaler.transform(X))
+
+    def test_rows_on_float32_thresholds(self):
+        # Values at, and one float64 ulp around, every split threshold: sklearn
+        # casts them to float32 first, so they may fall on either side
+        features, thresholds = [], []
+        for estimator in self.classifier.estimators_:
+            split = estimator.tree_.children_left != -1
+            features.append(estimator.tree_.feature[split])
+            thresholds.append(estimator.tree_.threshold[split])
+        features, thresholds = np.concatenate(features), np.concatenate(thresholds)
+        values = np.concatenate([thresholds, np.nextafter(thresholds, np.inf), np.nextafter(thresholds, -np.inf),
+                                 thresholds.astype(np.float32).astype(float)])
+        X = np.zeros((len(values), 5))
+        X[np.arange(len(values)), np.tile(features, 4)] = values
+        self.assertSameProbabilities(X)
+
+    def test_predict(self):
+        X = self.scaler.transform(self.X)
+        np.testing.assert_array_equal(self.forest.predict(X), self.classifier.predict(X))
+
+
+class AdaptiveGridTests(SimpleTestCase):
+
+    def test_grid_spans_zero_to_voc_through_vmp(self):
+        for points in (3, 4, 5, 100, 101):
+            grid = adaptive_voltage_grid([30.0, 35.0], [40.0, 44.0], points)
+            self.assertEqual(grid.shape, (2, points))
+            np.testing.assert_array_equal(grid[:, 0], [0, 0])
+            np.testing.assert_array_equal(grid[:, -1], [40, 44])
+            self.assertTrue(np.isin([30, 35], grid).all())
+            self.assertTrue((np.diff(grid, axis=1) > 0).all())
+
+    def test_too_few_points(self):
+        with self.assertRaises(ValueError):
+            adaptive_voltage_grid([30.0], [40.0], 2)
+        with self.assertRaises(ValueError):
+            views.sampling_options({'points': '2', 'sampling': 'adaptive'})
+        self.assertEqual(views.sampling_options({'points': '2'}), (2, 'uniform', None))
+
+
+class EagerTaskTestCase(TestCase):
+    """
+    Celery tasks run in-process and keep their results in the test database.
+    """
+
+    def setUp(self):
+        from home.celery import app
+
+        eager = {'task_always_eager': True, 'task_store_eager_result': True}
+        previous = {name: app.conf[name] for name in eager}
+        app.conf.update(eager)
+        self.addCleanup(app.conf.update, previous)
+
+
+class FleetAnalysisTests(EagerTaskTestCase):
+
+    def test_export_without_curves(self):
+        from apps.api.tasks import fleet_analysis_task, fleet_progress
+
+        catalog = mock.Mock()
+        catalog.get.return_value = MODULE
+        with tempfile.TemporaryDirectory() as directory, \
+                override_settings(FLEET_WORK_DIR=directory, FLEET_RESULTS_DIR=directory), \
+                mock.patch('apps.api.tasks.get_catalog', return_value=catalog):
+            source = os.path.join(directory, 'empty.csv')
+            with open(source, 'w') as f:
+                f.write('trace,voltage,current\n')
+            job = fleet_analysis_task.apply(args=[{'source': source, 'format': 'csv',
+                                                   'manufacturer': 'x', 'model': 'y'}])
+            self.assertEqual(job.result['chunks'], 0)
+            self.assertIsNone(job.result['group_id'])
+
+            state = fleet_progress(job.id)
+            self.assertEqual(state['state'], 'SUCCESS')
+            self.assertEqual(state['summary']['curves'], 0)
+            self.assertTrue(os.path.exists(state['summary']['results_file']))
+
+    def analyse(self, directory, body, **patches):
+        from apps.api.tasks import fleet_analysis_task
+
+        catalog = mock.Mock()
+        catalog.get.return_value = MODULE
+        source = os.path.join(directory, 'traces.csv')
+        with open(source, 'w') as f:
+            f.write(body)
+        with override_settings(FLEET_WORK_DIR=directory, FLEET_RESULTS_DIR=directory), \
+                mock.patch('apps.api.tasks.get_catalog', return_value=catalog), \
+                mock.patch.multiple('apps.api.tasks', **patches):
+            return fleet_analysis_task.apply(args=[{'source': source, 'format': 'csv', 'remove_source': True,
+                                                    'manufacturer': 'x', 'model': 'y'}])
+
+    def test_failed_split_removes_the_source_and_chunks(self):
+        def split_traces(traces, work_dir, chunk_curves, progress):
+            os.makedirs(work_dir)
+            raise ValueError('Corrupt export')
+
+        with tempfile.TemporaryDirectory() as directory:
+            job = self.analyse(directory, 'trace,voltage,current\n', split_traces=split_traces)
+            self.assertTrue(job.failed())
+            self.assertEqual(os.listdir(directory), [])
+
+    def test_failed_chunks_remove_the_work_dir(self):
+        chord = mock.MagicMock()
+        chord.return_value.return_value.configure_mock(id='merge-id', **{'parent.id': 'group-id'})
+        with tempfile.TemporaryDirectory() as directory:
+            job = self.analyse(directory, 'trace,voltage,current\n1,0,5\n1,30,4\n1,40,0\n', chord=chord)
+            self.assertEqual(job.result['chunks'], 1)
+            work_dir = os.path.join(directory, job.id)
+            self.assertTrue(os.path.isdir(work_dir))
+
+            callback = chord.return_value.call_args.args[0]
+            errbacks = callback.options['link_error']
+            self.assertEqual(len(errbacks), 1)
+            errbacks[0].apply()
+            self.assertFalse(os.path.exists(work_dir))
+
+
+class CurveSurfaceTests(SimpleTestCase):
+
+    def setUp(self):
+        self.params = stack_module_params([MODULE])
+        self.irradiance = [100, 200, 400, 700, 1000, 1200]
+        self.temperature = [-10, 10, 30, 50, 70]
+        self.surface = build_surface(self.params, self.irradiance, self.temperature)
+
+    def assertWithinBound(self, irradiance, temperature):
+        error = _relative_error(*compare(self.surface, self.params, irradiance, temperature))
+        bound = self.surface.error_at(irradiance, temperature)
+        worst = np.argmax(error / bound)
+        self.assertTrue(np.all(error <= bound),
+                        f'error {error[worst]:.5f} above the cell bound {bound[worst]:.5f} '
+                        f'at {irradiance[worst]:.1f} W/m2, {temperature[worst]:.1f} C')
+
+    def test_bound_holds_at_cell_centres(self):
+        G, T = np.meshgrid(np.diff(self.irradiance) / 2 + self.irradiance[:-1],
+                           np.diff(self.temperature) / 2 + self.temperature[:-1], indexing='ij')
+        self.assertWithinBound(G.ravel(), T.ravel())
+
+    def test_bound_holds_on_cell_edges(self):
+        G, T = np.meshgrid(np.linspace(self.irradiance[0], self.irradiance[-1], 97), self.temperature,
+                           indexing='ij')
+        self.assertWithinBound(G.ravel(), T.ravel())
+        G, T = np.meshgrid(self.irradiance, np.linspace(self.temperature[0], self.temperature[-1], 97),
+                           indexing='ij')
+        self.assertWithinBound(G.ravel(), T.ravel())
+
+    def test_bound_holds_between_grid_nodes(self):
+        rng = np.random.default_rng(0)
+        G = rng.uniform(self.irradiance[0], self.irradiance[-1], 5000)
+        T = rng.uniform(self.temperature[0], self.temperature[-1], 5000)
+        self.assertWithinBound(G, T)
+
+    def test_outside_the_grid_is_unbounded(self):
+        self.assertTrue(np.all(np.isinf(self.surface.error_at([50, 1300, 500], [25, 25, 90]))))
+
+
+class EnergyProfileTests(SimpleTestCase):
+
+    def simulate(self, body):
+        return simulate_energy(stack_module_params([MODULE]), iter_profile(io.BytesIO(body.encode())))
+
+    def test_short_temperature_gaps_are_interpolated(self):
+        result = self.simulate('time,ghi,temp_air,wind_speed\n'
+                               '2020-06-01 10:00,800,20,1\n'
+                               '2020-06-01 11:00,800,,N/A\n'
+                               '2020-06-01 12:00,800,22,1\n')
+        self.assertTrue(np.all(result['p_mp'] > 0))
+        self.assertEqual(result['summary']['missing_samples'], 1)
+        self.assertEqual(result['summary']['operating_hours'], 3.0)
+
+    def test_non_numeric_values_count_as_missing(self):
+        result = self.simulate('ghi,temp_cell\n800,25\nN/A,26\n800,N/A\n800,25\n')
+        self.assertEqual(result['p_mp'][1], 0.0)
+        self.assertGreater(result['p_mp'][2], 0.0)
+        self.assertEqual(result['summary']['missing_samples'], 2)
+
+    def test_long_temperature_gaps_are_rejected(self):
+        body = 'ghi,temp_cell\n800,25\n' + '800,\n' * (MAX_GAP + 1) + '800,25\n'
+        with self.assertRaisesRegex(ValueError, 'temp_cell is missing'):
+            self.simulate(body)
+
+
+class EnergyTaskTests(EagerTaskTestCase):
+
+    def test_uploaded_profile_is_removed(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        catalog = mock.Mock()
+        catalog.get.return_value = MODULE
+        with tempfile.TemporaryDirectory() as directory, \
+                override_settings(WEATHER_DATA_DIR=directory, ENERGY_RESULTS_DIR=directory), \
+                mock.patch('apps.api.views.get_catalog', return_value=catalog), \
+                mock.patch('apps.api.tasks.get_catalog', return_value=catalog):
+            upload = SimpleUploadedFile('profile.csv', b'ghi,temp_cell\n800,25\n')
+            response = self.client.post('/api/energy/', {'file': upload, 'async': '1',
+                                                         'manufacturer': 'x', 'model': 'y'})
+            self.assertEqual(response.status_code, 202)
+            self.assertEqual(os.listdir(os.path.join(directory, 'uploads')), [])
+            self.assertTrue(os.path.exists(os.path.join(directory, response.json()['task_id'] + '.npz')))
+
+
+class EncodingTests(SimpleTestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.arrays = [rng.uniform(0, 50, (4, 7)) for _ in range(3)]
+
+    def test_binary_round_trip(self):
+        for dtype, code in DTYPES.items():
+            payload = encode_binary(self.arrays, dtype)
+            self.assertEqual(len(payload), 16 + 3 * 4 * 7 * np.dtype(code).itemsize)
+            decoded = decode_binary(payload)
+            self.assertEqual(len(decoded), 3)
+            for array, result in zip(self.arrays, decoded):
+                self.assertEqual(result.dtype, np.dtype(code))
+                np.testing.assert_array_equal(result, array.astype(code))
+
+    def test_npy_round_trip(self):
+        for dtype, code in DTYPES.items():
+            result = np.load(io.BytesIO(encode_npy(self.arrays, dtype)))
+            self.assertEqual(result.shape, (3, 4, 7))
+            np.testing.assert_array_equal(result, np.stack(self.arrays).astype(code))
+
+    def test_foreign_payload(self):
+        with self.assertRaises(ValueError):
+            decode_binary(b'\x93NUMPY' + bytes(16))
+
+
+class IVCurveRequestTests(SimpleTestCase):
+
+    def setUp(self):
+        catalog = mock.Mock()
+        catalog.get.return_value = {**MODULE, **NAMEPLATE, 'Manufacturer': 'A10Green Technology',
+                                    'Model': 'A10J-S72-175'}
+        catalog.path, catalog.version = 'module_db.csv', 'test'
+        patcher = mock.patch('apps.api.views.get_catalog', return_value=catalog)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def post(self, url, payload, **headers):
+        return self.client.post(url, json.dumps(payload), content_type='application/json', **headers)
+
+    def test_batch_rejects_invalid_operating_points(self):
+        response = self.post('/api/iv-curve/batch/', {'curves': [
+            {'irradiance': 1000}, {'irradiance': -5}, {'irradiance': 0}, {'modules': 0}, {'temperature': 30}]})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['invalid'], [1, 2, 3])
+
+    def test_array_rejects_invalid_irradiance(self):
+        response = self.post('/api/iv-curve/array/', {'irradiance': [[1000, -1, 1000], [1000, 1000, 1000]]})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['invalid'], [[0, 1]])
+        self.assertEqual(self.post('/api/iv-curve/array/', {'strings': 0}).status_code, 400)
+
+    def test_array_with_a_dark_module(self):
+        response = self.post('/api/iv-curve/array/', {'irradiance': [[1000, 0, 1000]], 'points': 50})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(np.all(np.isfinite(response.json()['power'])))
+
+    def test_binary_matches_json(self):
+        payload = {'points': 20, 'curves': [{'irradiance': 1000}, {'irradiance': 350, 'temperature': 48.5},
+                                            {'irradiance': 800, 'modules': 3}]}
+        curves = json.loads(b''.join(self.post('/api/iv-curve/batch/', payload).streaming_content))['curves']
+        for dtype, code in DTYPES.items():
+            response = self.post(f'/api/iv-curve/batch/?format=binary&dtype={dtype}', payload)
+            self.assertEqual(response['Content-Type'], 'application/x-iv-curves')
+            for name, array in zip(('voltage', 'current', 'power'), decode_binary(response.content)):
+                np.testing.assert_array_equal(array, np.array([curve[name] for curve in curves], dtype=code))
+
+    def test_batch_matches_single_requests(self):
+        requested = [{'irradiance': 1000, 'temperature': 25}, {'irradiance': 350, 'temperature': 48.5},
+                     {'irradiance': 800, 'temperature': -5, 'modules': 3}]
+        curves = [{'manufacturer': 'A10Green Technology', 'model': 'A10J-S72-175', **item} for item in requested]
+        response = self.post('/api/iv-curve/batch/', {'points': 30, 'curves': curves})
+        batch = json.loads(b''.join(response.streaming_content))['curves']
+        self.assertEqual(len(batch), len(curves))
+
+        for curve, result in zip(curves, batch):
+            single = self.client.get('/api/iv-curve/', {**curve, 'points': 30, 'method': 'exact'}).json()
+            for name in ('voltage', 'current', 'power'):
+                np.testing.assert_allclose(result[name], single[name], rtol=1e-12, atol=1e-12)
+            self.assertEqual(result['key_points'].keys(), single['key_points'].keys())
+            for name, value in single['key_points'].items():
+                self.assertAlmostEqual(result['key_points'][name], value, places=9)
+
+
+class AnomalyRequestTests(SimpleTestCase):
+
+    BODIES = ['not json', '[1, 2]', json.dumps({'measured_voltage': ['a', 'b', 'c'], 'measured_current': [1, 2, 3]}),
+              json.dumps({'measured_voltage': [[0, 1], [2]], 'measured_current': [1, 2]})]
+
+    def test_malformed_bodies(self):
+        for body in self.BODIES:
+            response = self.client.post('/api/detect-anomaly/', body, content_type='application/json')
+            self.assertEqual(response.status_code, 400, body)
+            self.assertIn('Invalid payload', response.json()['error'])
+
+    async def test_malformed_bodies_async(self):
+        for body in self.BODIES:
+            response = await self.async_client.post('/api/detect-anomaly/async/', body,
+                                                    content_type='application/json')
+            self.assertEqual(response.status_code, 400, body)
+
+
+class ModuleSearchTests(SimpleTestCase):
+
+    def setUp(self):
+        self.index = ModuleSearchIndex(pd.DataFrame({
+            'Manufacturer': ['A10Green Technology', 'A10Green Technology', 'Canadian Solar Inc.',
+                             'Canadian Solar Inc.', 'Trina Solar'],
+            'Model': ['A10J-S72-175', 'A10J-M60-225', 'CS6P-250P', 'CS6K-280M', 'TSM-250PA05'],
+            'Technology': ['Mono-c-Si', 'Mono-c-Si', 'Multi-c-Si', 'Mono-c-Si', 'Multi-c-Si'],
+            'STC': [175.0, 225.0, 250.0, 280.0, 250.0],
+        }))
+
+    def models(self, query, **filters):
+        return [r['Model'] for r in self.index.search(query, **filters)['results']]
+
+    def test_typo_finds_the_module(self):
+        self.assertEqual(self.models('A10J-S27-175')[0], 'A10J-S72-175')
+        self.assertEqual(self.models('canadain solar cs6p 250')[0], 'CS6P-250P')
+
+    def test_prefix_matches_rank_first(self):
+        result = self.index.search('cs6')
+        self.assertEqual([r['Model'] for r in result['results']][:2], ['CS6K-280M', 'CS6P-250P'])
+        self.assertTrue(all(r['score'] > 1 for r in result['results'][:2]))
+
+    def test_unrelated_query(self):
+        self.assertEqual(self.index.search('zzzz qqqq')['total'], 0)
+
+    def test_filters_and_pages(self):
+        self.assertEqual(self.models('', technology='multi-c-si'), ['CS6P-250P', 'TSM-250PA05'])
+        self.assertEqual(self.models('', stc_min=250, stc_max=260), ['CS6P-250P', 'TSM-250PA05'])
+        self.assertEqual(self.models('', manufacturer='Trina Solar'), ['TSM-250PA05'])
+        page = self.index.search('', page=2, page_size=2)
+        self.assertEqual(page['total'], 5)
+        self.assertEqual([r['Model'] for r in page['results']], ['CS6K-280M', 'CS6P-250P'])
+
+    def test_closest(self):
+        closest = self.index.closest('A10 Green', 'A10J-S72-17')
+        self.assertEqual(closest[0], {'Manufacturer': 'A10Green Technology', 'Model': 'A10J-S72-175'})
+        self.assertEqual(len(self.index.closest('A10Green Technology', 'A10J')), 2)
+        self.assertEqual(len(self.index.closest('A10Green Technology', 'A10J', limit=1)), 1)
+
+
+class MeasurementHistoryTests(TestCase):
+
+    def record(self, string, measured_at, fault_class, site='Plant A'):
+        v = np.linspace(0, 40, 5)
+        return {'site': site, 'string': string, 'measured_at': measured_at, 'irradiance': 950.0,
+                'temperature': 41.5, 'voltage': v.tolist(), 'current': (5 - v / 10).tolist(),
+                'features': {'ff': 0.75}, 'fault_class': fault_class, 'probability': 0.9, 'model_version': 'v1'}
+
+    def setUp(self):
+        # A batch size of 2 splits the records over two inserts, reusing the strings created by the first
+        self.stored = record_measurements([
+            self.record('S1', '2024-03-01T10:00:00', 'Normal'),
+            self.record('S2', '2024-03-01T10:00:00', 'PID'),
+            self.record('S1', '2024-04-01T10:00:00', 'PID'),
+            self.record('S1', '2024-04-01T10:00:00', 'Normal', site='Plant B'),
+        ], batch_size=2)
+
+    def test_round_trip(self):
+        self.assertEqual(self.stored, 4)
+        self.assertEqual(PVString.objects.count(), 3)
+        history = list(string_history('Plant A', 'S1'))
+        self.assertEqual([m.fault_class for m in history], ['PID', 'Normal'])
+        latest = history[0]
+        self.assertEqual(latest.string.name, 'S1')
+        self.assertEqual(latest.measured_at.isoformat(), '2024-04-01T10:00:00+00:00')
+        self.assertEqual((latest.points, latest.irradiance, latest.features), (5, 950.0, {'ff': 0.75}))
+        voltage, current = latest.curve_arrays()
+        np.testing.assert_allclose(voltage, np.linspace(0, 40, 5))
+        np.testing.assert_allclose(current, 5 - np.linspace(0, 40, 5) / 10)
+
+    def test_site_history_and_period(self):
+        self.assertEqual(string_history('Plant A').count(), 3)
+        since = pd.Timestamp('2024-03-15', tz='UTC').to_pydatetime()
+        self.assertEqual([m.string.name for m in string_history('Plant A', since=since)], ['S1'])
+
+    def test_fault_strings(self):
+        strings = list(fault_strings('PID'))
+        self.assertEqual([(s['site_name'], s['string_name'], s['count']) for s in strings],
+                         [('Plant A', 'S1', 1), ('Plant A', 'S2', 1)])
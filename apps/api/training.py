@@ -0,0 +1,262 @@
+"""
+Training pipeline for the IV-curve fault classifier.
+
+Builds a synthetic fault-signature library from the module catalog, fits the
+scaler and RandomForest, and writes versioned artifacts with a training report.
+Run it through `manage.py train_anomaly_classifier`.
+"""
+
+import datetime
+import json
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import classification_report
+from sklearn.model_selection import GroupKFold, cross_val_score
+from sklearn.preprocessing import StandardScaler
+
+from apps.api.anomaly_classifier import module_type_map, simulate_iv_curves
+from apps.api.compiled_forest import compile_forest, save_compiled
+from apps.api.features import FEATURE_NAMES, extract_iv_feature_matrix
+from apps.api.model_registry import file_digest
+
+
+MODULE_PARAMS = [
+    'I_sc_ref', 'V_oc_ref', 'I_mp_ref', 'V_mp_ref', 'alpha_sc', 'a_ref',
+    'I_L_ref', 'I_o_ref', 'R_s', 'R_sh_ref', 'N_s',
+]
+
+SHAPE_FEATURES = [
+    'FF', 'slope_at_Isc', 'slope_at_Voc', 'max_curvature', 'diode_ideality_fit',
+    'num_steps', 'Pmp_ratio', 'area_ratio', 'knee_curvature',
+    'Isc_norm', 'Voc_norm', 'module_type_code'
+]
+
+# Parameter multipliers per fault mode, swept linearly from the first to the
+# second value across the severity range
+FAULT_SWEEPS = {
+    'Healthy': {
+        'R_sh_ref': (1.1, 0.9),
+        'V_oc_ref': (1.1, 0.95),
+        'I_L_ref': (1.1, 0.95),
+        'V_mp_ref': (1.1, 0.95),
+        'I_mp_ref': (1.1, 0.95),
+        'R_s': (1.05, 1),
+    },
+    # PID typically causes very low Rsh (order of magnitude drop) and mild Voc loss
+    'PID': {'R_sh_ref': (0.9, 0.2), 'V_oc_ref': (1.0, 0.9)},
+    # Soiling: up to 30% current loss max
+    'Soiling': {'I_L_ref': (0.95, 0.7)},
+    # Shading: can go down to 20% current
+    'Shading': {'I_L_ref': (0.9, 0.2)},
+    # Rs can double or triple in severe cases
+    'Rs_increase': {'R_s': (1.5, 3.0)},
+    'Bypass_Diode_Short': {},
+}
+
+# Bypass diode shorts only apply to crystalline modules with substrings
+CRYSTALLINE = ['Mono-c-Si', 'Multi-c-Si']
+
+
+def fault_modes(tech):
+    modes = ['Healthy', 'PID', 'Soiling', 'Shading', 'Rs_increase']
+    if tech in CRYSTALLINE:
+        modes.append('Bypass_Diode_Short')
+    return modes
+
+
+def build_parameter_table(module_db, samples_per_fault=20, seed=42):
+    """
+    Draws `samples_per_fault` modules per (technology, fault) and applies the
+    fault's parameter sweep. All randomness comes from `seed`, so the table is
+    identical whatever the number of simulation workers.
+    :rtype: DataFrame of module parameters plus 'Fault' and 'module_type_code'
+    """
+    rng = np.random.default_rng(seed)
+    frames = []
+
+    for tech, tech_code in module_type_map.items():
+        tech_modules = module_db[module_db['Technology'] == tech]
+        if tech_modules.empty:
+            continue
+
+        for fault in fault_modes(tech):
+            picks = rng.integers(len(tech_modules), size=samples_per_fault)
+            p_mod = tech_modules.iloc[picks][MODULE_PARAMS].astype(float).reset_index(drop=True)
+
+            for column, (start, stop) in FAULT_SWEEPS[fault].items():
+                p_mod[column] *= np.linspace(start, stop, samples_per_fault)
+
+            if fault == 'Bypass_Diode_Short':
+                reduction_factor = rng.choice([1/3, 2/3], size=samples_per_fault)
+                p_mod['V_oc_ref'] *= (1 - reduction_factor)
+                p_mod['V_mp_ref'] *= (1 - reduction_factor)
+
+            p_mod['module_type_code'] = tech_code
+            p_mod['Fault'] = fault
+            frames.append(p_mod)
+
+    if not frames:
+        raise ValueError('Module catalog has no rows for technologies: ' + ', '.join(module_type_map))
+    return pd.concat(frames, ignore_index=True)
+
+
+def _simulate_chunk(chunk):
+    """
+    Simulates one chunk of the parameter table and returns its feature matrix.
+    Runs in a worker process.
+    """
+    voltage, current, key_points = simulate_iv_curves(chunk)
+    return extract_iv_feature_matrix(voltage, current, chunk, key_points)
+
+
+def generate_signature_library(params, workers=None, chunk_size=5000):
+    """
+    Simulates every row of `params` and extracts its features, fanning chunks out
+    to a process pool when `workers` > 1.
+    :rtype: DataFrame with FEATURE_NAMES, 'module_type_code' and 'Fault'
+    """
+    chunks = [
+        {column: params[column].to_numpy()[start:start + chunk_size] for column in MODULE_PARAMS}
+        for start in range(0, len(params), chunk_size)
+    ]
+
+    if workers and workers > 1 and len(chunks) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_simulate_chunk, chunks))
+    else:
+        results = [_simulate_chunk(chunk) for chunk in chunks]
+
+    df = pd.DataFrame(np.vstack(results), columns=FEATURE_NAMES)
+    df['module_type_code'] = params['module_type_code'].to_numpy()
+    df['Fault'] = params['Fault'].to_numpy()
+    return df
+
+
+def train_classifier(df, seed=42, n_estimators=100, n_jobs=-1):
+    """
+    Fits the scaler and RandomForest on the signature library and evaluates
+    them with GroupKFold over module types.
+    :rtype: (scaler, classifier, metrics dict)
+    """
+    X = df[SHAPE_FEATURES]
+    y = df['Fault']
+    groups = df['module_type_code']
+
+    scaler = StandardScaler()
+    X_scaled = scaler.fit_transform(X)
+
+    rf = RandomForestClassifier(n_estimators=n_estimators, random_state=seed,
+                                class_weight='balanced', n_jobs=n_jobs)
+    rf.fit(X_scaled, y)
+
+    metrics = {}
+    n_groups = groups.nunique()
+    if n_groups >= 2:
+        # --- Evaluation with GroupKFold to avoid module type bias ---
+        cv = GroupKFold(n_splits=min(3, n_groups))
+        cv_scores = cross_val_score(rf, X_scaled, y, cv=cv, groups=groups)
+        metrics['cv_scores'] = cv_scores.tolist()
+        metrics['cv_mean'] = float(np.mean(cv_scores))
+    metrics['training_report'] = classification_report(y, rf.predict(X_scaled), output_dict=True, zero_division=0)
+    return scaler, rf, metrics
+
+
+def _atomic_copy(source, target):
+    target_dir = os.path.dirname(os.path.abspath(target))
+    os.makedirs(target_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=target_dir)
+    os.close(fd)
+    try:
+        shutil.copyfile(source, tmp_path)
+        os.replace(tmp_path, target)
+    except Exception:
+        os.unlink(tmp_path)
+        raise
+
+
+def export_compiled(scaler_path, classifier_path, compiled_path):
+    """
+    Compiles a pickled scaler / forest pair into the NumPy predictor file
+    (see apps.api.compiled_forest), tagged with the pickles' model version.
+    """
+    scaler = joblib.load(scaler_path)
+    classifier = joblib.load(classifier_path)
+    save_compiled(compiled_path, compile_forest(scaler, classifier,
+                                                file_digest(scaler_path, classifier_path)))
+
+
+def write_artifacts(output_dir, scaler, classifier, report):
+    """
+    Writes scaler.pkl, random_forest_classifier.pkl, the compiled
+    random_forest_compiled.npz and report.json into a new
+    `<output_dir>/<version>/` directory and returns its path.
+    """
+    version_dir = os.path.join(output_dir, report['version'])
+    os.makedirs(version_dir, exist_ok=False)
+    scaler_path = os.path.join(version_dir, 'scaler.pkl')
+    classifier_path = os.path.join(version_dir, 'random_forest_classifier.pkl')
+    joblib.dump(scaler, scaler_path)
+    joblib.dump(classifier, classifier_path)
+    save_compiled(os.path.join(version_dir, 'random_forest_compiled.npz'),
+                  compile_forest(scaler, classifier, file_digest(scaler_path, classifier_path)))
+    with open(os.path.join(version_dir, 'report.json'), 'w') as f:
+        json.dump(report, f, indent=2)
+    return version_dir
+
+
+def install_artifacts(version_dir, scaler_path, classifier_path, compiled_path=None):
+    """
+    Atomically replaces the served artifacts, which the model registry picks up
+    on its next request. The compiled forest is installed last, since the
+    registry prefers it as soon as it exists.
+    """
+    _atomic_copy(os.path.join(version_dir, 'scaler.pkl'), scaler_path)
+    _atomic_copy(os.path.join(version_dir, 'random_forest_classifier.pkl'), classifier_path)
+    compiled = os.path.join(version_dir, 'random_forest_compiled.npz')
+    if compiled_path and os.path.exists(compiled):
+        _atomic_copy(compiled, compiled_path)
+    elif compiled_path and os.path.exists(compiled_path):
+        # Artifacts from before compilation existed: keep serving the new pickles
+        os.unlink(compiled_path)
+
+
+def run_training(module_db, output_dir, samples_per_fault=20, seed=42, workers=None,
+                 n_estimators=100, chunk_size=5000):
+    """
+    Runs the whole pipeline and returns (version_dir, report).
+    """
+    started = time.perf_counter()
+    params = build_parameter_table(module_db, samples_per_fault, seed)
+    df = generate_signature_library(params, workers=workers, chunk_size=chunk_size)
+    simulated = time.perf_counter()
+
+    scaler, rf, metrics = train_classifier(df, seed=seed, n_estimators=n_estimators)
+    trained = time.perf_counter()
+
+    now = datetime.datetime.now(datetime.timezone.utc)
+    report = {
+        'version': now.strftime('%Y%m%d-%H%M%S') + f'-s{seed}',
+        'created': now.isoformat(),
+        'seed': seed,
+        'samples_per_fault': samples_per_fault,
+        'n_estimators': n_estimators,
+        'workers': workers or 1,
+        'n_curves': len(df),
+        'class_counts': df['Fault'].value_counts().to_dict(),
+        'features': SHAPE_FEATURES,
+        'timings': {
+            'simulation_s': round(simulated - started, 3),
+            'training_s': round(trained - simulated, 3),
+        },
+        **metrics,
+    }
+    version_dir = write_artifacts(output_dir, scaler, rf, report)
+    return version_dir, report
@@ -1,12 +1,31 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from apps.api.views import ProductViewSet, iv_curve_api, detect_anomaly_api
+from apps.api.views import ProductViewSet, module_search_api, module_manufacturers_api, iv_curve_api, iv_curve_async_api, compute_pool_stats_api, iv_curve_batch_api, iv_curve_cache_stats_api, iv_curve_surface_api, iv_curve_array_api, detect_anomaly_api, detect_anomaly_async_api, detect_anomaly_batch_api, detect_anomaly_upload_api, measurement_history_api, measurement_faults_api, fleet_api, fleet_task_api, fleet_results_api, energy_api, energy_task_api, energy_series_api
 
 router = DefaultRouter()
 router.register(r'product', ProductViewSet, basename='product')
 
 urlpatterns = [
+    path('modules/', module_search_api, name='module_search_api'),
+    path('modules/manufacturers/', module_manufacturers_api, name='module_manufacturers_api'),
     path('iv-curve/', iv_curve_api, name='iv_curve_api'), 
+    path('iv-curve/async/', iv_curve_async_api, name='iv_curve_async_api'),
+    path('iv-curve/batch/', iv_curve_batch_api, name='iv_curve_batch_api'),
+    path('iv-curve/array/', iv_curve_array_api, name='iv_curve_array_api'),
+    path('iv-curve/cache/', iv_curve_cache_stats_api, name='iv_curve_cache_stats_api'),
+    path('iv-curve/surface/', iv_curve_surface_api, name='iv_curve_surface_api'),
     path('detect-anomaly/', detect_anomaly_api, name='detect_anomaly_api'),
+    path('detect-anomaly/async/', detect_anomaly_async_api, name='detect_anomaly_async_api'),
+    path('detect-anomaly/batch/', detect_anomaly_batch_api, name='detect_anomaly_batch_api'),
+    path('detect-anomaly/upload/', detect_anomaly_upload_api, name='detect_anomaly_upload_api'),
+    path('measurements/', measurement_history_api, name='measurement_history_api'),
+    path('measurements/faults/', measurement_faults_api, name='measurement_faults_api'),
+    path('fleet/', fleet_api, name='fleet_api'),
+    path('fleet/<str:task_id>/', fleet_task_api, name='fleet_task_api'),
+    path('fleet/<str:task_id>/results/', fleet_results_api, name='fleet_results_api'),
+    path('compute/', compute_pool_stats_api, name='compute_pool_stats_api'),
+    path('energy/', energy_api, name='energy_api'),
+    path('energy/<str:task_id>/', energy_task_api, name='energy_task_api'),
+    path('energy/<str:task_id>/series/', energy_series_api, name='energy_series_api'),
     path('', include(router.urls)),
 ]
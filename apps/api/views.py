@@ -3,13 +3,32 @@ from apps.common.models import Product
 from rest_framework import viewsets
 from rest_framework import permissions
 
-from django.http import JsonResponse
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified, JsonResponse, StreamingHttpResponse
+from django.utils.cache import patch_cache_control, patch_vary_headers
 from django.views.decorators.csrf import csrf_exempt
-from apps.api.anomaly_classifier import extract_iv_features
-import pandas as pd
+from apps.api.curve_cache import curve_key, get_curve_cache, quantize
+from apps.api.curve_surface import compare as compare_surface, get_surface_store
+from apps.api.encoding import CONTENT_TYPES, accepts_gzip, compress, encode_curves, negotiate
+from apps.api.inference import classify, feature_frame, nameplate_from_key_points, nameplate_from_modeled
+from apps.api.ingest import FORMATS, guess_format, iter_traces
+from apps.api.micro_batch import get_batcher
+from apps.api.history import fault_strings, parse_timestamp, record_measurements, string_history
+from apps.api.energy import (PROFILE_FORMATS, energy_options, guess_profile_format, iter_profile,
+                             resolve_weather_file, simulate_energy)
+from apps.api.iv_curves import (KEY_POINTS, SAMPLING_MODES, compute_iv_curves, degradation_fraction,
+                                key_points_row, stack_module_params, years_between)
+from apps.api.mismatch import simulate_array
+from apps.api.model_registry import get_registry
+from apps.api.module_catalog import get_catalog
+from apps.api.module_search import get_search_index
+from apps.api.offload import Overloaded, get_offloader
+import datetime
+import hashlib
+import json
+import os
+import uuid
 import numpy as np
-import pvlib
-import joblib
 
 
 class ProductPermission(permissions.BasePermission):
@@ -25,104 +44,909 @@ class ProductViewSet(viewsets.ModelViewSet):
     permission_classes = (ProductPermission, )
     lookup_field = 'id'
 
-MODULE_CSV_URL = 'https://raw.githubusercontent.com/streetplantsolar/pv_ivy_web/refs/heads/main/module_db.csv'
+# 'auto' interpolates from a precomputed surface when accurate enough
+CURVE_METHODS = ['auto', 'exact', 'interpolated']
 
-def iv_curve_api(request):
+def sampling_options(source, default_points=100):
+    """
+    Reads `points`, `sampling` and `tolerance` from a dict-like source
+    :rtype: (points, sampling, tolerance), raises ValueError when invalid
+    """
+    points = int(source.get('points', default_points))
+    sampling = source.get('sampling', 'uniform')
+    tolerance = source.get('tolerance')
+    tolerance = float(tolerance) if tolerance not in (None, '') else None
+
+    if not 2 <= points <= settings.IV_CURVE_MAX_POINTS:
+        raise ValueError(f'points must be between 2 and {settings.IV_CURVE_MAX_POINTS}')
+    if sampling not in SAMPLING_MODES:
+        raise ValueError('sampling must be one of: ' + ', '.join(SAMPLING_MODES))
+    if sampling == 'adaptive' and points < 3:
+        raise ValueError('adaptive sampling needs at least 3 points (0, Vmp and Voc)')
+    if tolerance is not None and not tolerance > 0:
+        raise ValueError('tolerance must be positive')
+    if tolerance is not None and 'points' not in source:
+        # Let the tolerance, not the default count, decide the resolution
+        points = settings.IV_CURVE_MAX_POINTS
+    return points, sampling, tolerance
+
+def degradation_option(source):
+    """
+    Total power lost between `start_date` and `end_date` (ISO dates) at
+    `degradation_rate` %/year, rounded so nearby requests share a cache entry.
+    """
+    rate = float(source.get('degradation_rate', 0)) / 100
+    if rate < 0:
+        raise ValueError('degradation_rate must not be negative')
+    start, end = source.get('start_date'), source.get('end_date')
+    years = years_between(datetime.date.fromisoformat(start) if start else None,
+                          datetime.date.fromisoformat(end) if end else None)
+    return round(float(degradation_fraction(rate, max(years, 0))), 6)
+
+def _iv_curve_job(request):
+    """
+    Validates an /api/iv-curve/ request and resolves its module and method.
+    :rtype: an error JsonResponse, or a dict with the cache `key`, `etag`,
+        `compute` callable and the response metadata
+    """
     model = request.GET.get('model')
     manufacturer = request.GET.get('manufacturer')
-    temp_cell = float(request.GET.get('temperature',25))
-    irr = int(request.GET.get('irradiance',1000))
-    mods_per_string = int(request.GET.get('modules',1))
+    try:
+        temp_cell = quantize(request.GET.get('temperature', 25), settings.IV_CURVE_TEMPERATURE_STEP)
+        irr = quantize(request.GET.get('irradiance', 1000), settings.IV_CURVE_IRRADIANCE_STEP)
+        mods_per_string = int(request.GET.get('modules', 1))
+        points, sampling, tolerance = sampling_options(request.GET)
+        degradation = degradation_option(request.GET)
+        fmt, dtype = negotiate(request)
+        method = request.GET.get('method', 'auto')
+        if method not in CURVE_METHODS:
+            raise ValueError('method must be one of: ' + ', '.join(CURVE_METHODS))
+    except ValueError as e:
+        return JsonResponse({'error': 'Invalid parameter: ' + str(e)}, status=400)
+
+    if not model or not manufacturer:
+        return JsonResponse({'error': 'Both manufacturer and model are required'}, status=400)
 
-    df = pd.read_csv(MODULE_CSV_URL)
-    match = df[
-    (df['Manufacturer'].str.strip() == manufacturer.strip()) & (df['Model'].str.strip() == model.strip())
-    ]
+    catalog = get_catalog()
+    try:
+        m = catalog.get(manufacturer, model)
+    except (OSError, ValueError) as e:
+        return JsonResponse({'error': 'Module catalog unavailable: ' + str(e)}, status=503)
 
-    if match.empty:
-        possible = df[df['Manufacturer'].str.contains(manufacturer.split()[0], case=False, na=False)]
+    if m is None:
         return JsonResponse({
             'error': 'Module not found',
             'manufacturer_query': manufacturer,
             'model_query': model,
-            'closest_matches': possible[['Manufacturer', 'Model']].head(5).to_dict(orient='records')
+            'closest_matches': get_search_index().closest(manufacturer, model)
         }, status=404)
 
-    m = match.iloc[0]
-
-    cec = {
-        'effective_irradiance': irr,
-        'temp_cell': temp_cell,
-        'alpha_sc': m.alpha_sc,
-        'a_ref': m.a_ref,
-        'I_L_ref': m.I_L_ref,
-        'I_o_ref': m.I_o_ref,
-        'R_sh_ref': m.R_sh_ref,
-        'R_s': m.R_s,
-        'Adjust': m.Adjust,
-        'EgRef': 1.121,
-        'dEgdT': -0.0002677,
+    # Interpolate from a precomputed surface when its cell is accurate enough
+    # (always with method=interpolated); tolerance-driven sampling stays exact
+    surface, error_bound = None, None
+    if method != 'exact' and tolerance is None:
+        surface = get_surface_store().get(m)
+        if surface is not None:
+            error_bound = float(surface.error_at(irr, temp_cell)[0])
+            if not np.isfinite(error_bound) or (method == 'auto' and error_bound > settings.IV_SURFACE_MAX_ERROR):
+                surface = None
+    if method == 'interpolated' and surface is None:
+        return JsonResponse({'error': 'No precomputed surface covers these inputs'}, status=409)
+
+    # The curve is a pure function of these inputs, so the key doubles as the ETag
+    key = curve_key(catalog.path, catalog.version, m['Manufacturer'], m['Model'],
+                    irr, temp_cell, mods_per_string, points, sampling, tolerance, degradation, fmt, dtype,
+                    surface.version if surface is not None else None)
+    gzip = fmt != 'json' and accepts_gzip(request)
+
+    def compute():
+        if surface is not None:
+            V, I, P, key_points = surface.evaluate(irr, temp_cell, mods_per_string, points, sampling,
+                                                   degradation)
+        else:
+            V, I, P, key_points = compute_iv_curves(stack_module_params([m]), irr, temp_cell,
+                                                    mods_per_string, points, sampling, tolerance,
+                                                    degradation)
+        return encode_curves(fmt, V, I, P, dtype, key_points)
+
+    return {
+        'key': key,
+        'etag': '"%s%s"' % (key, '-gz' if gzip else ''),
+        'gzip': gzip,
+        'fmt': fmt,
+        'method': 'interpolated' if surface is not None else 'exact',
+        'error_bound': error_bound if surface is not None else None,
+        'compute': compute,
     }
 
-    IL, I0, Rs, Rsh, nNsVth = pvlib.pvsystem.calcparams_cec(**cec)
-    curve = pvlib.pvsystem.singlediode(IL, I0, Rs, Rsh, nNsVth, method='lambertw')
+def _iv_curve_response(request, job, body=None, tier=None):
+    """
+    Wraps a computed curve payload, or a 304 when `body` is None.
+    """
+    if body is None:
+        response = HttpResponseNotModified()
+    else:
+        content_encoding = None
+        if job['gzip']:
+            body, content_encoding = compress(body, request)
+        response = HttpResponse(body, content_type=CONTENT_TYPES[job['fmt']])
+        if content_encoding:
+            response['Content-Encoding'] = content_encoding
+        response['X-Cache'] = tier.upper()
+        response['X-IV-Method'] = job['method']
+        if job['error_bound'] is not None:
+            response['X-IV-Error-Bound'] = '%.2e' % job['error_bound']
 
-    V = np.linspace(0, curve['v_oc'], 100)
-    I = pvlib.pvsystem.i_from_v(voltage=V, method='lambertw',
-                                 photocurrent=IL, saturation_current=I0,
-                                 resistance_series=Rs, resistance_shunt=Rsh,
-                                 nNsVth=nNsVth)
-    V = V * mods_per_string
-    P = I * V
+    response['ETag'] = job['etag']
+    patch_cache_control(response, public=True, max_age=settings.IV_CURVE_CACHE_MAX_AGE)
+    patch_vary_headers(response, ('Accept', 'Accept-Encoding'))
+    return response
 
-    return JsonResponse({
-        'voltage': V.tolist(),
-        'current': I.tolist(),
-        'power': P.tolist()
+def _overloaded():
+    response = JsonResponse({'error': 'Server busy, retry shortly'}, status=503)
+    response['Retry-After'] = '1'
+    return response
+
+def iv_curve_api(request):
+    job = _iv_curve_job(request)
+    if isinstance(job, HttpResponse):
+        return job
+    if job['etag'] in request.META.get('HTTP_IF_NONE_MATCH', ''):
+        return _iv_curve_response(request, job)
+
+    body, tier = get_curve_cache().get_or_compute(job['key'], job['compute'])
+    return _iv_curve_response(request, job, body, tier)
+
+async def iv_curve_async_api(request):
+    """
+    Async variant of iv_curve_api (serve with an ASGI server). Resolving the
+    module (catalog reload, surface load, closest-match search), the cache lookup
+    and the solver all run on the bounded compute pool (see apps.api.offload).
+    Concurrent requests for the same curve share one computation.
+    """
+    offloader = get_offloader()
+    try:
+        job = await offloader.run(None, _iv_curve_job, request)
+        if isinstance(job, HttpResponse):
+            return job
+        if job['etag'] in request.META.get('HTTP_IF_NONE_MATCH', ''):
+            return _iv_curve_response(request, job)
+
+        body, tier = await offloader.run(job['key'], get_curve_cache().get_or_compute, job['key'], job['compute'])
+    except Overloaded:
+        return _overloaded()
+    return _iv_curve_response(request, job, body, tier)
+
+def compute_pool_stats_api(request):
+    batcher = get_batcher()
+    return JsonResponse({**get_offloader().stats(),
+                         'micro_batcher': batcher.stats() if batcher is not None else None})
+
+def module_search_api(request):
+    """
+    Paginated module search. `q` matches manufacturer / model prefixes and,
+    typo-tolerantly, trigrams of the full name; without `q` modules are listed
+    by manufacturer and model. Filters: manufacturer (exact), technology,
+    stc_min, stc_max (W). Paging: page, page_size.
+    """
+    try:
+        page = int(request.GET.get('page', 1))
+        page_size = int(request.GET.get('page_size', 20))
+        stc_min, stc_max = (request.GET.get(name) for name in ('stc_min', 'stc_max'))
+        filters = {
+            'manufacturer': request.GET.get('manufacturer'),
+            'technology': request.GET.get('technology'),
+            'stc_min': float(stc_min) if stc_min else None,
+            'stc_max': float(stc_max) if stc_max else None,
+        }
+        if page < 1 or not 1 <= page_size <= settings.MODULE_SEARCH_MAX_PAGE_SIZE:
+            raise ValueError(f'page must be positive and page_size between 1 and {settings.MODULE_SEARCH_MAX_PAGE_SIZE}')
+        index = get_search_index()
+        result = index.search(request.GET.get('q', ''), page, page_size, **filters)
+    except ValueError as e:
+        return JsonResponse({'error': 'Invalid parameter: ' + str(e)}, status=400)
+    except OSError as e:
+        return JsonResponse({'error': 'Module catalog unavailable: ' + str(e)}, status=503)
+    return JsonResponse(result)
+
+def module_manufacturers_api(request):
+    """
+    Distinct manufacturers and technologies, for filling the search filters.
+    """
+    try:
+        index = get_search_index()
+    except (OSError, ValueError) as e:
+        return JsonResponse({'error': 'Module catalog unavailable: ' + str(e)}, status=503)
+    response = JsonResponse({'manufacturers': index.manufacturers, 'technologies': index.technologies})
+    patch_cache_control(response, public=True, max_age=settings.IV_CURVE_CACHE_MAX_AGE)
+    return response
+
+def iv_curve_cache_stats_api(request):
+    return JsonResponse(get_curve_cache().stats())
+
+def iv_curve_surface_api(request):
+    """
+    Compares the precomputed surface of a module with the exact solver at one
+    operating point (`manufacturer`, `model`, `irradiance`, `temperature`).
+    Errors are relative: to Isc for the current, to each exact key point otherwise.
+    """
+    try:
+        irr = float(request.GET.get('irradiance', 1000))
+        temp_cell = float(request.GET.get('temperature', 25))
+    except ValueError as e:
+        return JsonResponse({'error': 'Invalid parameter: ' + str(e)}, status=400)
+
+    try:
+        m = get_catalog().get(request.GET.get('manufacturer', ''), request.GET.get('model', ''))
+    except (OSError, ValueError) as e:
+        return JsonResponse({'error': 'Module catalog unavailable: ' + str(e)}, status=503)
+    if m is None:
+        return JsonResponse({'error': 'Module not found'}, status=404)
+
+    surface = get_surface_store().get(m)
+    if surface is None:
+        return JsonResponse({'available': False})
+
+    cell_error = float(surface.error_at(irr, temp_cell)[0])
+    payload = {
+        'available': True,
+        'irradiance_range': [float(surface.irradiance[0]), float(surface.irradiance[-1])],
+        'temperature_range': [float(surface.temperature[0]), float(surface.temperature[-1])],
+        'error_bound': surface.error_bound,
+        'max_error': settings.IV_SURFACE_MAX_ERROR,
+        'within_grid': bool(np.isfinite(cell_error)),
+    }
+    if not payload['within_grid']:
+        return JsonResponse(payload)
+
+    exact, interpolated, current_error = compare_surface(surface, stack_module_params([m]), irr, temp_cell)
+    payload.update({
+        'cell_error': cell_error,
+        'served': cell_error <= settings.IV_SURFACE_MAX_ERROR,
+        'exact': key_points_row(exact),
+        'interpolated': key_points_row(interpolated),
+        'current_error': float(current_error[0]),
+        'key_point_error': {name: abs(float(interpolated[name][0]) / float(exact[name][0]) - 1)
+                            if exact[name][0] else 0.0 for name in KEY_POINTS},
     })
+    return JsonResponse(payload)
+
+@csrf_exempt  # Only for dev; use proper CSRF token in prod
+def iv_curve_array_api(request):
+    """
+    IV curve of mismatched strings in parallel, with bypass diodes (see
+    apps.api.mismatch). Expects JSON like
+    `{"manufacturer", "model", "irradiance", "temperature", "bypass_diodes": 3, "bypass_voltage": 0.5, "points": 400}`
+    where irradiance is a number (with `strings` and `modules`), a list per module,
+    a (strings x modules) or a (strings x modules x bypass_diodes) nested list.
+    Set `include_strings` to also get each string's V(I) curve.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Invalid request method'}, status=405)
+
+    try:
+        data = json.loads(request.body)
+        bypass_diodes = int(data.get('bypass_diodes', 3))
+        bypass_voltage = float(data.get('bypass_voltage', 0.5))
+        points = int(data.get('points', 400))
+        irradiance = np.asarray(data.get('irradiance', 1000), dtype=float)
+        if irradiance.ndim == 0:
+            irradiance = np.full((int(data.get('strings', 1)), int(data.get('modules', 1))), float(irradiance))
+        temperature = np.asarray(data.get('temperature', 25), dtype=float)
+        if irradiance.size == 0:
+            raise ValueError('strings and modules must be at least 1')
+        if not 2 <= points <= settings.IV_CURVE_MAX_POINTS:
+            raise ValueError(f'points must be between 2 and {settings.IV_CURVE_MAX_POINTS}')
+        if bypass_diodes < 0 or bypass_voltage < 0:
+            raise ValueError('bypass_diodes and bypass_voltage must not be negative')
+    except (ValueError, TypeError, AttributeError) as e:
+        return JsonResponse({'error': 'Invalid payload: ' + str(e)}, status=400)
+
+    if irradiance.size * max(bypass_diodes, 1) > settings.IV_ARRAY_MAX_SUBSTRINGS:
+        return JsonResponse({'error': f'At most {settings.IV_ARRAY_MAX_SUBSTRINGS} substrings per array'}, status=400)
+    invalid = np.argwhere(~(np.isfinite(irradiance) & (irradiance >= 0)))
+    if invalid.size:
+        return JsonResponse({'error': 'irradiance must be a finite, non-negative number',
+                             'invalid': invalid.tolist()}, status=400)
+    if not np.all(np.isfinite(temperature)):
+        return JsonResponse({'error': 'temperature must be finite'}, status=400)
+
+    try:
+        m = get_catalog().get(data.get('manufacturer', ''), data.get('model', ''))
+    except (OSError, ValueError) as e:
+        return JsonResponse({'error': 'Module catalog unavailable: ' + str(e)}, status=503)
+    if m is None:
+        return JsonResponse({'error': 'Module not found'}, status=404)
+
+    try:
+        result = simulate_array(stack_module_params([m]), irradiance, temperature, bypass_diodes,
+                                bypass_voltage, points, irradiance_step=settings.IV_CURVE_IRRADIANCE_STEP,
+                                temperature_step=settings.IV_CURVE_TEMPERATURE_STEP)
+    except ValueError as e:
+        return JsonResponse({'error': 'Invalid payload: ' + str(e)}, status=400)
+
+    payload = {
+        'voltage': result['voltage'].tolist(),
+        'current': result['current'].tolist(),
+        'power': result['power'].tolist(),
+        'key_points': result['key_points'],
+        # Conducting bypass diodes per module at the array MPP
+        'bypassed': result['bypassed'].sum(axis=2).tolist(),
+    }
+    if data.get('include_strings'):
+        payload['strings'] = {'current': result['string_current'].tolist(),
+                              'voltage': result['string_voltage'].tolist()}
+    return JsonResponse(payload)
+
+@csrf_exempt  # Only for dev; use proper CSRF token in prod
+def iv_curve_batch_api(request):
+    """
+    Evaluates many IV curves in one request. Expects a JSON body like
+    `{"points": 100, "sampling": "uniform", "tolerance": null, "curves": [{"manufacturer", "model", "irradiance", "temperature", "modules"}, ...]}`
+    and streams back `{"curves": [{"voltage", "current", "power", "key_points"}, ...]}` in request order,
+    or (N, points) arrays in a binary encoding (see apps.api.encoding).
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Invalid request method'}, status=405)
+
+    try:
+        data = json.loads(request.body)
+        items = data['curves']
+        points, sampling, tolerance = sampling_options(data)
+        fmt, dtype = negotiate(request)
+        irradiance = [float(item.get('irradiance', 1000)) for item in items]
+        temperature = [float(item.get('temperature', 25)) for item in items]
+        modules = [int(item.get('modules', 1)) for item in items]
+    except (ValueError, TypeError, KeyError, AttributeError) as e:
+        return JsonResponse({'error': 'Invalid payload: ' + str(e)}, status=400)
+
+    if not items:
+        return JsonResponse({'error': 'No curves requested'}, status=400)
+    if len(items) > settings.IV_CURVE_BATCH_MAX:
+        return JsonResponse({'error': f'At most {settings.IV_CURVE_BATCH_MAX} curves per batch'}, status=400)
+    # Negative irradiance has no solution and zero an infinite shunt resistance: neither is valid JSON
+    invalid = [index for index, (g, t, n) in enumerate(zip(irradiance, temperature, modules))
+               if not (np.isfinite(g) and g > 0 and np.isfinite(t) and n >= 1)]
+    if invalid:
+        return JsonResponse({'error': 'irradiance must be positive, temperature finite and modules at least 1',
+                             'invalid': invalid}, status=400)
+
+    catalog = get_catalog()
+    rows, missing = [], []
+    try:
+        for index, item in enumerate(items):
+            row = catalog.get(item.get('manufacturer', ''), item.get('model', ''))
+            if row is None:
+                missing.append(index)
+            rows.append(row)
+    except (OSError, ValueError) as e:
+        return JsonResponse({'error': 'Module catalog unavailable: ' + str(e)}, status=503)
+
+    if missing:
+        return JsonResponse({'error': 'Module not found', 'missing': missing}, status=404)
+
+    V, I, P, key_points = compute_iv_curves(stack_module_params(rows), irradiance, temperature,
+                                            modules, points, sampling, tolerance)
+
+    if fmt != 'json':
+        body, content_encoding = compress(encode_curves(fmt, V, I, P, dtype), request)
+        response = HttpResponse(body, content_type=CONTENT_TYPES[fmt])
+        if content_encoding:
+            response['Content-Encoding'] = content_encoding
+        patch_vary_headers(response, ('Accept', 'Accept-Encoding'))
+        return response
+
+    def stream():
+        yield '{"curves": ['
+        for i in range(len(rows)):
+            prefix = ', ' if i else ''
+            yield prefix + json.dumps({
+                'voltage': V[i].tolist(),
+                'current': I[i].tolist(),
+                'power': P[i].tolist(),
+                'key_points': key_points_row(key_points, i)
+            })
+        yield ']}'
+
+    return StreamingHttpResponse(stream(), content_type='application/json')
+
+def _anomaly_request(body):
+    """
+    Payload and feature row of one measured curve from a /api/detect-anomaly/ body.
+    :rtype: (payload dict, features DataFrame, None), or (payload or None, None, (error payload, HTTP status))
+    """
+    try:
+        data = json.loads(body)
+        measured_voltage = np.array(data.get('measured_voltage', []), dtype=float)
+        measured_current = np.array(data.get('measured_current', []), dtype=float)
+        modeled_voltage = np.array(data.get('modeled_voltage', []), dtype=float)
+        modeled_current = np.array(data.get('modeled_current', []), dtype=float)
+    except (ValueError, TypeError, AttributeError) as e:
+        return None, None, ({'error': 'Invalid payload: ' + str(e)}, 400)
+    modeled_key_points = data.get('modeled_key_points')
+    module_type_code = data.get('module_type_code', 0)  # Example default
+
+    # Check measured data presence
+    if measured_voltage.size == 0 or measured_current.size == 0:
+        return data, None, ({'error': 'Please upload measured data.'}, 200)
+    if measured_voltage.ndim != 1 or measured_voltage.size < 3 or measured_voltage.shape != measured_current.shape:
+        return data, None, ({'error': 'Measured data needs at least 3 (voltage, current) pairs.'}, 200)
+
+    # Exact key points from /api/iv-curve/ beat argmax over the sampled modeled curve
+    if modeled_key_points:
+        try:
+            nameplate = nameplate_from_key_points(modeled_key_points)
+        except (KeyError, TypeError, ValueError) as e:
+            return data, None, ({'error': 'Invalid modeled_key_points: ' + str(e)}, 400)
+    elif (modeled_voltage.ndim != 1 or modeled_voltage.size == 0
+          or modeled_voltage.shape != modeled_current.shape):
+        return data, None, ({'error': 'Modeled data is not available for anomaly detection.'}, 200)
+    else:
+        nameplate = nameplate_from_modeled(modeled_voltage, modeled_current)
+    return data, feature_frame([(measured_voltage, measured_current)], [nameplate], [module_type_code]), None
+
+def _measurement_target(source, defaults=None):
+    """
+    Where a classified curve is stored: `site` and `string` names plus the
+    optional `measured_at`, `irradiance` and `temperature` of the payload,
+    falling back to `defaults`. None when the payload names no string.
+    :rtype: dict or None, raises ValueError when a field is invalid
+    """
+    defaults = defaults or {}
+    site = source.get('site', defaults.get('site'))
+    string = source.get('string', defaults.get('string'))
+    if not site or not string:
+        return None
+    target = {'site': str(site), 'string': str(string),
+              'measured_at': parse_timestamp(source.get('measured_at', defaults.get('measured_at')))}
+    for name in ('irradiance', 'temperature'):
+        value = source.get(name, defaults.get(name))
+        target[name] = float(value) if value not in (None, '') else None
+    return target
+
+def _measurement(target, voltage, current, features, label, probabilities, model):
+    return {**target, 'voltage': voltage, 'current': current, 'features': features,
+            'fault_class': label, 'probability': float(max(probabilities)), 'model_version': model.version}
+
+def _submit_classify(features):
+    """
+    Starts classifying a single request's features: on the micro-batcher when
+    enabled, on the compute pool otherwise.
+    :rtype: Future of (labels, probabilities, LoadedModel)
+    """
+    batcher = get_batcher()
+    if batcher is not None:
+        return batcher.submit(features)
+    return get_offloader().submit(None, classify, features)
 
 @csrf_exempt  # Only for dev; use proper CSRF token in prod
 def detect_anomaly_api(request):
     if request.method == 'POST':
         # Read JSON payload
-        import json
+        data, features, error = _anomaly_request(request.body)
+        if error:
+            return JsonResponse(error[0], status=error[1])
+        try:
+            target = _measurement_target(data)
+        except (TypeError, ValueError) as e:
+            return JsonResponse({'error': 'Invalid parameter: ' + str(e)}, status=400)
+
+        # Concurrent requests (threaded workers) share batched predict calls
+        batcher = get_batcher()
+        try:
+            labels, probabilities, model = batcher(features) if batcher is not None else classify(features)
+        except Overloaded:
+            return _overloaded()
+
+        payload = {'anomaly': labels[0], 'model_version': model.version}
+        if target is not None:
+            record_measurements([_measurement(
+                target, data['measured_voltage'], data['measured_current'],
+                features.to_dict('records')[0], labels[0], probabilities[0], model)])
+            payload['stored'] = 1
+        return JsonResponse(payload)
+
+    return JsonResponse({'error': 'Invalid request method'})
+
+async def detect_anomaly_async_api(request):
+    """
+    Async variant of detect_anomaly_api. The payload is parsed and its features
+    extracted on the compute pool, off the event loop. Inference goes through
+    the micro-batcher (or the compute pool), bounded by the pool's pending
+    limit. Identical concurrent bodies share one prediction.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Invalid request method'})
+
+    body = request.body
+    offloader = get_offloader()
+    try:
+        _, features, error = await offloader.run(None, _anomaly_request, body)
+        if error:
+            return JsonResponse(error[0], status=error[1])
+
+        key = 'detect-anomaly:' + hashlib.sha1(body).hexdigest()
+        labels, _, model = await offloader.wait(offloader.adopt(key, lambda: _submit_classify(features)))
+    except Overloaded:
+        return _overloaded()
+    return JsonResponse({'anomaly': labels[0], 'model_version': model.version})
+
+# csrf_exempt wraps views in a sync function on Django 4.2, so mark async ones directly
+detect_anomaly_async_api.csrf_exempt = True
+
+@csrf_exempt  # Only for dev; use proper CSRF token in prod
+def detect_anomaly_batch_api(request):
+    """
+    Classifies many measured curves in one request. Expects
+    `{"curves": [{"measured_voltage", "measured_current", "modeled_voltage", "modeled_current", "module_type_code"}, ...]}`;
+    `modeled_key_points` (as returned by /api/iv-curve/) may replace the modeled curve.
+    Top-level `modeled_*` and `module_type_code` fields act as defaults for every curve.
+    Curves with `site` and `string` (per curve or top-level, plus optional
+    `measured_at`, `irradiance`, `temperature`) are stored as measurements.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Invalid request method'}, status=405)
+
+    try:
         data = json.loads(request.body)
+        items = data['curves']
+        if len(items) > settings.ANOMALY_BATCH_MAX:
+            return JsonResponse({'error': f'At most {settings.ANOMALY_BATCH_MAX} curves per batch'}, status=400)
+
+        default_voltage = data.get('modeled_voltage', [])
+        default_current = data.get('modeled_current', [])
+        default_key_points = data.get('modeled_key_points')
+        default_nameplate = None
+        curves, nameplates, type_codes, targets, invalid = [], [], [], [], []
+        for index, item in enumerate(items):
+            measured_voltage = np.asarray(item.get('measured_voltage', []), dtype=float)
+            measured_current = np.asarray(item.get('measured_current', []), dtype=float)
+            shared_model = not {'modeled_voltage', 'modeled_current', 'modeled_key_points'} & item.keys()
+            modeled_key_points = item.get('modeled_key_points', default_key_points)
+            modeled_voltage = np.asarray(item.get('modeled_voltage', default_voltage), dtype=float)
+            modeled_current = np.asarray(item.get('modeled_current', default_current), dtype=float)
+
+            if (measured_voltage.size < 3 or measured_voltage.size != measured_current.size
+                    or (not modeled_key_points and (modeled_voltage.size == 0
+                                                    or modeled_voltage.size != modeled_current.size))):
+                invalid.append(index)
+                continue
+
+            if shared_model and default_nameplate is not None:
+                nameplate = default_nameplate
+            elif modeled_key_points:
+                nameplate = nameplate_from_key_points(modeled_key_points)
+            else:
+                nameplate = nameplate_from_modeled(modeled_voltage, modeled_current)
+            if shared_model:
+                default_nameplate = nameplate
+
+            curves.append((measured_voltage, measured_current))
+            nameplates.append(nameplate)
+            type_codes.append(item.get('module_type_code', data.get('module_type_code', 0)))
+            targets.append(_measurement_target(item, data))
+    except (ValueError, TypeError, KeyError, AttributeError) as e:
+        return JsonResponse({'error': 'Invalid payload: ' + str(e)}, status=400)
+
+    if not items:
+        return JsonResponse({'error': 'No curves submitted'}, status=400)
+    if invalid:
+        return JsonResponse({'error': 'Missing or mismatched curve data', 'invalid': invalid}, status=400)
+
+    features = feature_frame(curves, nameplates, type_codes)
+    labels, probabilities, model = classify(features)
+    classes = model.classifier.classes_.tolist()
+
+    # Curves naming a site / string (per item or top-level) are stored in bulk
+    stored = 0
+    if any(targets):
+        rows = features.to_dict('records')
+        stored = record_measurements(
+            _measurement(target, curve[0], curve[1], row, label, proba, model)
+            for target, curve, row, label, proba in zip(targets, curves, rows, labels.tolist(), probabilities)
+            if target is not None)
+
+    return JsonResponse({
+        'model_version': model.version,
+        'classes': classes,
+        'stored': stored,
+        'results': [
+            {'anomaly': label, 'probabilities': dict(zip(classes, row))}
+            for label, row in zip(labels.tolist(), probabilities.round(4).tolist())
+        ]
+    })
+
+@csrf_exempt  # Only for dev; use proper CSRF token in prod
+def detect_anomaly_upload_api(request):
+    """
+    Classifies every trace of an uploaded IV-tracer export (multipart field `file`,
+    csv / tsv / npy, see apps.api.ingest). The reference curve comes from the
+    `manufacturer`, `model`, `irradiance`, `temperature` and `modules` fields.
+    With a `site` field (and optional `measured_at`) every trace is stored as a
+    measurement of the string named by its trace id.
+    Streams NDJSON: a header line with the model version and classes, then one
+    line per trace.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Invalid request method'}, status=405)
+
+    upload = request.FILES.get('file')
+    if upload is None:
+        return JsonResponse({'error': 'No file uploaded'}, status=400)
+
+    fmt = request.POST.get('format') or guess_format(upload.name, upload.content_type or '')
+    if fmt not in FORMATS:
+        return JsonResponse({'error': 'Unsupported format, expected one of: ' + ', '.join(FORMATS)}, status=415)
+
+    try:
+        irr = float(request.POST.get('irradiance', 1000))
+        temp_cell = float(request.POST.get('temperature', 25))
+        mods_per_string = int(request.POST.get('modules', 1))
+        module_type_code = int(request.POST.get('module_type_code', 0))
+        site = request.POST.get('site')
+        target = {'site': site, 'measured_at': parse_timestamp(request.POST.get('measured_at')),
+                  'irradiance': irr, 'temperature': temp_cell} if site else None
+    except ValueError as e:
+        return JsonResponse({'error': 'Invalid parameter: ' + str(e)}, status=400)
+
+    try:
+        m = get_catalog().get(request.POST.get('manufacturer', ''), request.POST.get('model', ''))
+    except (OSError, ValueError) as e:
+        return JsonResponse({'error': 'Module catalog unavailable: ' + str(e)}, status=503)
+    if m is None:
+        return JsonResponse({'error': 'Module not found'}, status=404)
+
+    _, _, _, key_points = compute_iv_curves(stack_module_params([m]), irr, temp_cell, mods_per_string)
+    nameplate = nameplate_from_key_points(key_points_row(key_points))
+    # One snapshot for the whole stream: a reload mid-upload must not change
+    # the classes announced in the header
+    model = get_registry().get()
+    classes = model.classifier.classes_.tolist()
 
-        measured_voltage = np.array(data.get('measured_voltage', []))
-        measured_current = np.array(data.get('measured_current', []))
-        modeled_voltage = np.array(data.get('modeled_voltage', []))
-        modeled_current = np.array(data.get('modeled_current', []))
-        module_type_code = data.get('module_type_code', 0)  # Example default
+    # Spooled-to-disk uploads can be memory-mapped instead of read
+    path = upload.temporary_file_path() if hasattr(upload, 'temporary_file_path') else None
+    traces = iter_traces(upload.file, fmt, path=path)
 
-        # Check measured data presence
-        if measured_voltage.size == 0 or measured_current.size == 0:
-            return JsonResponse({'error': 'Please upload measured data.'})
+    def classify_batch(batch):
+        features = feature_frame(
+            [(v, i) for _, v, i in batch], [nameplate] * len(batch), [module_type_code] * len(batch))
+        labels, probabilities, _ = classify(features, model)
+        if target is not None:
+            record_measurements(
+                _measurement({**target, 'string': str(trace_id)}, v, i, row, label, proba, model)
+                for (trace_id, v, i), row, label, proba
+                in zip(batch, features.to_dict('records'), labels.tolist(), probabilities))
+        for (trace_id, _, _), label, row in zip(batch, labels.tolist(), probabilities.round(4).tolist()):
+            yield json.dumps({'trace': trace_id, 'anomaly': label,
+                              'probabilities': dict(zip(classes, row))}) + '\n'
 
-        P_modeled = modeled_voltage * modeled_current
-        max_power_index = np.argmax(P_modeled)
+    def stream():
+        yield json.dumps({'model_version': model.version, 'classes': classes}) + '\n'
+        batch = []
+        try:
+            for trace_id, voltage, current in traces:
+                if len(voltage) < 3:
+                    yield json.dumps({'trace': trace_id, 'error': 'Trace has fewer than 3 points'}) + '\n'
+                    continue
+                batch.append((trace_id, voltage, current))
+                if len(batch) >= settings.ANOMALY_UPLOAD_BATCH:
+                    yield from classify_batch(batch)
+                    batch = []
+            if batch:
+                yield from classify_batch(batch)
+        except ValueError as e:
+            # Headers are already sent; report parse errors in-band
+            yield json.dumps({'error': 'Invalid file: ' + str(e)}) + '\n'
 
-        nameplate = {
-            'I_sc_ref': max(modeled_current),
-            'V_oc_ref': max(modeled_voltage),
-            'I_mp_ref': modeled_current[max_power_index],
-            'V_mp_ref': modeled_voltage[max_power_index],
+    return StreamingHttpResponse(stream(), content_type='application/x-ndjson')
+
+def measurement_history_api(request):
+    """
+    Stored measurements of a `site`, optionally one `string`, newest first.
+    Filters: since, until (ISO 8601); `limit` rows, `curves=1` adds the curves.
+    """
+    try:
+        site = request.GET['site']
+        since = parse_timestamp(request.GET.get('since'))
+        until = parse_timestamp(request.GET.get('until'))
+        limit = int(request.GET.get('limit', 100))
+        if not 1 <= limit <= settings.MEASUREMENT_PAGE_MAX:
+            raise ValueError(f'limit must be between 1 and {settings.MEASUREMENT_PAGE_MAX}')
+    except KeyError:
+        return JsonResponse({'error': 'site is required'}, status=400)
+    except ValueError as e:
+        return JsonResponse({'error': 'Invalid parameter: ' + str(e)}, status=400)
+
+    with_curves = request.GET.get('curves') in ('1', 'true')
+    queryset = string_history(site, request.GET.get('string'), since, until)
+    if with_curves:
+        queryset = queryset.defer(None).defer('features')
+    results = []
+    for measurement in queryset[:limit]:
+        row = {
+            'string': measurement.string.name,
+            'measured_at': measurement.measured_at.isoformat(),
+            'irradiance': measurement.irradiance,
+            'temperature': measurement.temperature,
+            'anomaly': measurement.fault_class,
+            'probability': measurement.probability,
+            'model_version': measurement.model_version,
         }
-        measured_features = extract_iv_features(measured_voltage, measured_current, nameplate)
-        measured_features['module_type_code'] = module_type_code
+        if with_curves:
+            voltage, current = measurement.curve_arrays()
+            row.update({'voltage': voltage.tolist(), 'current': current.tolist()})
+        results.append(row)
+    return JsonResponse({'site': site, 'results': results})
+
+def measurement_faults_api(request):
+    """
+    Strings with measurements classified as `fault_class` (e.g. PID) between
+    `since` and `until`, optionally within one `site`, most recent first.
+    """
+    try:
+        fault_class = request.GET['fault_class']
+        since = parse_timestamp(request.GET.get('since'))
+        until = parse_timestamp(request.GET.get('until'))
+    except KeyError:
+        return JsonResponse({'error': 'fault_class is required'}, status=400)
+    except ValueError as e:
+        return JsonResponse({'error': 'Invalid parameter: ' + str(e)}, status=400)
+
+    rows = fault_strings(fault_class, since, until, request.GET.get('site'))
+    return JsonResponse({'fault_class': fault_class, 'strings': [
+        {'site': row['site_name'], 'string': row['string_name'], 'count': row['count'],
+         'first': row['first'].isoformat(), 'last': row['last'].isoformat()}
+        for row in rows
+    ]})
+
+@csrf_exempt  # Only for dev; use proper CSRF token in prod
+def fleet_api(request):
+    """
+    Queues a fleet analysis (apps.api.tasks.fleet_analysis_task) of an uploaded
+    IV-tracer export, multipart field `file` as for /api/detect-anomaly/upload/,
+    with the same reference fields and optional `site` / `measured_at` to store
+    the measurements. Answers 202 with the task id; progress on /api/fleet/<id>/.
+    """
+    from apps.api.tasks import fleet_analysis_task
+
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Invalid request method'}, status=405)
+
+    upload = request.FILES.get('file')
+    if upload is None:
+        return JsonResponse({'error': 'No file uploaded'}, status=400)
+    fmt = request.POST.get('format') or guess_format(upload.name, upload.content_type or '')
+    if fmt not in FORMATS:
+        return JsonResponse({'error': 'Unsupported format, expected one of: ' + ', '.join(FORMATS)}, status=415)
+
+    data = request.POST.dict()
+    try:
+        for name in ('irradiance', 'temperature'):
+            float(data.get(name, 0))
+        int(data.get('modules', 1))
+        int(data.get('module_type_code', 0))
+        parse_timestamp(data.get('measured_at'))
+    except ValueError as e:
+        return JsonResponse({'error': 'Invalid parameter: ' + str(e)}, status=400)
+    try:
+        m = get_catalog().get(data.get('manufacturer', ''), data.get('model', ''))
+    except (OSError, ValueError) as e:
+        return JsonResponse({'error': 'Module catalog unavailable: ' + str(e)}, status=503)
+    if m is None:
+        return JsonResponse({'error': 'Module not found'}, status=404)
+
+    # Workers read the export from shared storage, not the request
+    source = os.path.join(settings.FLEET_WORK_DIR, 'uploads', uuid.uuid4().hex + '.' + fmt)
+    os.makedirs(os.path.dirname(source), exist_ok=True)
+    with open(source, 'wb') as f:
+        for block in upload.chunks():
+            f.write(block)
+    task = fleet_analysis_task.delay({**data, 'source': source, 'format': fmt, 'remove_source': True})
+    return JsonResponse({'task_id': task.id}, status=202)
+
+def fleet_task_api(request, task_id):
+    """
+    State of a fleet analysis: splitting / classifying progress, then the
+    merged summary (curves, counts per class, stored measurements).
+    """
+    from apps.api.tasks import fleet_progress
+
+    return JsonResponse(fleet_progress(task_id))
+
+def fleet_results_api(request, task_id):
+    """
+    Downloads the merged per-curve CSV of a finished fleet analysis.
+    """
+    path = os.path.join(settings.FLEET_RESULTS_DIR, os.path.basename(task_id) + '.csv')
+    if not os.path.isfile(path):
+        return JsonResponse({'error': 'No results for this task'}, status=404)
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename=task_id + '.csv')
+
+@csrf_exempt  # Only for dev; use proper CSRF token in prod
+def energy_api(request):
+    """
+    Simulates the maximum-power operation of an array over an irradiance /
+    temperature profile (see apps.api.energy). The profile is either an uploaded
+    file (multipart field `file`) or `weather_file`, a file in settings.WEATHER_DATA_DIR.
+    Other fields: manufacturer, model, modules, strings, degradation_rate (%/year),
+    start_date, interval_minutes, series (0 to return only totals) and
+    async (1 to queue a Celery task and get its id back).
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Invalid request method'}, status=405)
+
+    data = request.POST.dict()
+    upload = request.FILES.get('file')
+    try:
+        options = energy_options(data)
+        if upload is None:
+            profile = resolve_weather_file(data.get('weather_file', ''), settings.WEATHER_DATA_DIR)
+            fmt = guess_profile_format(profile)
+        else:
+            fmt = data.get('format') or guess_profile_format(upload.name)
+    except ValueError as e:
+        return JsonResponse({'error': 'Invalid parameter: ' + str(e)}, status=400)
+    # `fmt` names the saved upload below: only whitelisted extensions
+    if fmt not in PROFILE_FORMATS:
+        return JsonResponse({'error': 'Unsupported format, expected one of: ' + ', '.join(PROFILE_FORMATS)}, status=400)
+
+    try:
+        m = get_catalog().get(data.get('manufacturer', ''), data.get('model', ''))
+    except (OSError, ValueError) as e:
+        return JsonResponse({'error': 'Module catalog unavailable: ' + str(e)}, status=503)
+    if m is None:
+        return JsonResponse({'error': 'Module not found'}, status=404)
+
+    if data.get('async') in ('1', 'true'):
+        from apps.api.tasks import simulate_energy_task
 
-        feature_vector = pd.DataFrame([measured_features])
+        if upload is not None:
+            # Workers read the profile from shared storage, not the request
+            profile = os.path.join(settings.WEATHER_DATA_DIR, 'uploads',
+                                   uuid.uuid4().hex + '.' + fmt)
+            os.makedirs(os.path.dirname(profile), exist_ok=True)
+            with open(profile, 'wb') as f:
+                for block in upload.chunks():
+                    f.write(block)
+        task = simulate_energy_task.delay({**data, 'profile': profile, 'remove_source': upload is not None})
+        return JsonResponse({'task_id': task.id}, status=202)
 
-        # Load models
-        scaler = joblib.load('scaler.pkl')
-        classifier = joblib.load('random_forest_classifier.pkl')
+    source = upload.file if upload is not None else profile
+    year = options['start_date'].year if options['start_date'] else None
+    try:
+        result = simulate_energy(stack_module_params([m]),
+                                 iter_profile(source, fmt, settings.ENERGY_CHUNK_SIZE, year), **options)
+    except (ValueError, KeyError) as e:
+        return JsonResponse({'error': 'Invalid profile: ' + str(e)}, status=400)
 
-        # Reindex columns to match exactly what the scaler was trained with
-        expected_features = scaler.feature_names_in_
-        feature_vector = feature_vector.reindex(columns=expected_features).fillna(0)
+    payload = {'summary': result['summary']}
+    if data.get('series', '1') not in ('0', 'false'):
+        if result['time'] is not None:
+            payload['time'] = result['time'].strftime('%Y-%m-%dT%H:%M:%S').tolist()
+        payload.update({name: result[name].round(4).tolist() for name in ('p_mp', 'v_mp', 'i_mp')})
+    return JsonResponse(payload)
 
-        scaled_features = scaler.transform(feature_vector)
-        prediction = classifier.predict(scaled_features)[0]
+def energy_task_api(request, task_id):
+    """
+    State of a queued energy simulation; the summary once it has finished.
+    """
+    from celery.result import AsyncResult
 
-        return JsonResponse({'anomaly': prediction})
+    result = AsyncResult(task_id)
+    payload = {'task_id': task_id, 'state': result.state}
+    if result.state == 'PROGRESS':
+        payload['progress'] = result.info
+    elif result.successful():
+        payload['summary'] = result.result['summary']
+    elif result.failed():
+        payload['error'] = str(result.result)
+    return JsonResponse(payload)
 
-    return JsonResponse({'error': 'Invalid request method'})
\ No newline at end of file
+def energy_series_api(request, task_id):
+    """
+    Downloads the .npz series written by a finished energy simulation.
+    """
+    path = os.path.join(settings.ENERGY_RESULTS_DIR, os.path.basename(task_id) + '.npz')
+    if not os.path.isfile(path):
+        return JsonResponse({'error': 'No series for this task'}, status=404)
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename=task_id + '.npz')
@@ -0,0 +1,75 @@
+"""
+Task log lookup and incremental reads.
+
+Script tasks register their log file under the task id when they start
+(apps.tasks.models.TaskLog). Readers find it through that index and the
+Django cache instead of listing CELERY_LOGS_DIR. They read only the bytes
+after a given offset, so following a running task costs as much as its new
+output, whatever the size of the file.
+"""
+
+import json
+import os
+
+from django.conf import settings
+from django.core.cache import cache
+from django_celery_results.models import TaskResult
+
+from apps.tasks.models import TaskLog
+
+
+def _cache_key(task_id):
+    return 'task-log:' + task_id
+
+
+def register_log(task_id, path):
+    """
+    Records where the log of `task_id` is written.
+    """
+    TaskLog.objects.update_or_create(task_id=task_id, defaults={'path': path})
+    cache.set(_cache_key(task_id), path, settings.CELERY_LOG_INDEX_CACHE_TIMEOUT)
+
+
+def log_path(task_id):
+    """
+    :rtype: log file path of the task, None when it has none
+    """
+    key = _cache_key(task_id)
+    path = cache.get(key)
+    if path is None:
+        path = TaskLog.objects.filter(task_id=task_id).values_list('path', flat=True).first()
+        if path is None:
+            # Tasks run before the index existed: the finished result names the file
+            result = TaskResult.objects.filter(task_id=task_id).values_list('result', flat=True).first()
+            try:
+                path = json.loads(result).get('log_file')
+            except (TypeError, ValueError, AttributeError):
+                path = None
+        if path is not None:
+            cache.set(key, path, settings.CELERY_LOG_INDEX_CACHE_TIMEOUT)
+    return path
+
+
+def read_log(path, offset=0, limit=None):
+    """
+    Reads at most `limit` bytes of a log file from `offset`. An offset past
+    the end (file replaced or truncated) restarts from the beginning.
+    :rtype: (bytes, next offset, file size)
+    """
+    limit = limit or settings.CELERY_LOG_CHUNK_BYTES
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if offset > size:
+            offset = 0
+        f.seek(offset)
+        data = f.read(min(limit, size - offset))
+    return data, offset + len(data), size
+
+
+def read_log_tail(path, limit):
+    """
+    Last `limit` bytes of a log file, decoded.
+    """
+    size = os.path.getsize(path)
+    data, _, _ = read_log(path, max(size - limit, 0), limit)
+    return data.decode(errors='replace')
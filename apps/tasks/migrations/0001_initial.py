@@ -0,0 +1,23 @@
+# Generated by Django 4.2.9 on 2026-10-16 11:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('task_id', models.CharField(max_length=255, unique=True)),
+                ('path', models.CharField(max_length=1024)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
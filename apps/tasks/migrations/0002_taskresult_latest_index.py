@@ -0,0 +1,26 @@
+from django.db import migrations, models
+
+
+# django_celery_results indexes task_name and date_created separately; the
+# dashboard's latest-result-per-task query needs them together
+INDEX = models.Index(fields=['task_name', 'date_created'], name='taskresult_name_created')
+
+
+def add_index(apps, schema_editor):
+    schema_editor.add_index(apps.get_model('django_celery_results', 'TaskResult'), INDEX)
+
+
+def remove_index(apps, schema_editor):
+    schema_editor.remove_index(apps.get_model('django_celery_results', 'TaskResult'), INDEX)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0001_initial'),
+        ('django_celery_results', '0011_taskresult_periodic_task_name'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_index, remove_index),
+    ]
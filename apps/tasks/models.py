@@ -1,3 +1,16 @@
 from django.db import models
 
 # Create your models here.
+
+
+class TaskLog(models.Model):
+    """
+    Index of task id -> log file, written when a script task starts, so a log
+    is found without scanning CELERY_LOGS_DIR.
+    """
+    task_id = models.CharField(max_length=255, unique=True)
+    path    = models.CharField(max_length=1024)
+    created = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.task_id
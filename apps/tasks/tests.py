@@ -1,3 +1,94 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django_celery_results.models import TaskResult
+
+from apps.tasks.logs import _cache_key, log_path, read_log, read_log_tail, register_log
+from apps.tasks.models import TaskLog
+
+
+class ReadLogTests(SimpleTestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'script.log')
+        with open(self.path, 'wb') as f:
+            f.write(b'0123456789')
+
+    def test_chunks(self):
+        self.assertEqual(read_log(self.path, 0, 4), (b'0123', 4, 10))
+        self.assertEqual(read_log(self.path, 8, 4), (b'89', 10, 10))
+        self.assertEqual(read_log(self.path, 10, 4), (b'', 10, 10))
+
+    def test_offset_past_the_end_restarts(self):
+        # The file was replaced by a shorter one since the last read
+        self.assertEqual(read_log(self.path, 25, 4), (b'0123', 4, 10))
+
+    def test_tail(self):
+        self.assertEqual(read_log_tail(self.path, 3), '789')
+        self.assertEqual(read_log_tail(self.path, 100), '0123456789')
+
+
+class LogPathTests(TestCase):
+
+    TASK_IDS = ['registered', 'legacy', 'no-file', 'unknown']
+
+    def setUp(self):
+        cache.delete_many([_cache_key(task_id) for task_id in self.TASK_IDS])
+
+    def test_registered_log(self):
+        register_log('registered', '/logs/registered.log')
+        self.assertEqual(log_path('registered'), '/logs/registered.log')
+        # Found in the index once the cache entry has expired
+        cache.delete(_cache_key('registered'))
+        self.assertEqual(log_path('registered'), '/logs/registered.log')
+
+    def test_falls_back_to_the_task_result(self):
+        TaskResult.objects.create(task_id='legacy', status='SUCCESS',
+                                  result=json.dumps({'log_file': '/logs/legacy.log'}))
+        self.assertFalse(TaskLog.objects.filter(task_id='legacy').exists())
+        self.assertEqual(log_path('legacy'), '/logs/legacy.log')
+
+    def test_no_log(self):
+        TaskResult.objects.create(task_id='no-file', status='FAILURE', result=json.dumps('Boom'))
+        self.assertIsNone(log_path('no-file'))
+        self.assertIsNone(log_path('unknown'))
+
+
+@override_settings(CELERY_LOG_CHUNK_BYTES=4)
+class LogStreamTests(TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'script.log')
+        with open(self.path, 'wb') as f:
+            f.write(b'0123456789')
+        register_log('stream-task', self.path)
+
+    def stream(self, **params):
+        return self.client.get(reverse('task-log-stream'), {'task_id': 'stream-task', **params})
+
+    def test_limit_is_capped_at_the_chunk_size(self):
+        response = self.stream(offset=2, limit=100)
+        self.assertEqual(response.content, b'2345')
+        self.assertEqual(response['X-Log-Offset'], '6')
+        self.assertEqual(response['X-Log-Size'], '10')
+
+    def test_limit_below_one_reads_one_byte(self):
+        for limit in (0, -1):
+            response = self.stream(offset=3, limit=limit)
+            self.assertEqual(response.content, b'3')
+            self.assertEqual(response['X-Log-Offset'], '4')
+
+    def test_invalid_limit(self):
+        self.assertEqual(self.stream(limit='all').status_code, 400)
+
+    def test_unknown_task(self):
+        response = self.client.get(reverse('task-log-stream'), {'task_id': 'no-such-task'})
+        self.assertEqual(response.status_code, 404)
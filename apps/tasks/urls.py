@@ -9,5 +9,6 @@ urlpatterns = [
     path('tasks/cancel/<str:task_id>' , views.cancel_task, name="cancel-task" ),
     path('tasks/output/'              , views.task_output, name="task-output" ),
     path('tasks/log/'                 , views.task_log,    name="task-log"    ), 
+    path('tasks/log/stream/'          , views.task_log_stream, name="task-log-stream"),
     path('download-log-file/<str:file_path>/', views.download_log_file, name='download_log_file'),
 ]
\ No newline at end of file
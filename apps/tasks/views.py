@@ -1,19 +1,22 @@
 import os
-import time
 import json
 
 from django.http import HttpResponse
 from django.shortcuts import render, redirect
+from django.urls import reverse
 
-from celery import current_app
+from celery import current_app, states, uuid
 from home.tasks import execute_script, get_scripts
+from home.scripts import get_script_registry
+from apps.tasks.logs import log_path, read_log
 from django_celery_results.models import TaskResult
 from celery.contrib.abortable import AbortableAsyncResult
 from home.celery import app
-from django.http import HttpResponse, Http404
-from os import listdir
-from os.path import isfile, join
+from django.http import FileResponse, HttpResponse, HttpResponseBadRequest, Http404
 from django.conf import settings
+from django.core.paginator import Paginator
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
 
 from django.template  import loader
 
@@ -37,9 +40,14 @@ def tasks(request):
             'parent'   : 'apps',
         }
 
-    # django_celery_results_task_result
-    task_results = TaskResult.objects.all()
-    context["task_results"] = task_results
+    # django_celery_results_task_result, newest first, one page at a time
+    task_results = TaskResult.objects.only(
+        'id', 'task_id', 'task_name', 'status', 'result', 'date_created', 'date_done'
+    ).order_by('-date_created', '-id')
+    page = Paginator(task_results, settings.TASK_RESULTS_PAGE_SIZE).get_page(request.GET.get('page'))
+    for result in page:
+        result.meta = result_meta(result.result)
+    context["task_results"] = page
 
     html_template = loader.get_template('apps/tasks.html')
     return HttpResponse(html_template.render(context, request)) 
@@ -56,8 +64,20 @@ def run_task(request, task_name):
     _args   = request.POST.get("args")
     for task in tasks:
         if task.__name__ == task_name:
-            task.delay({"script": _script, "args": _args})
-    time.sleep(1)  # Waiting for task status to update in db
+            # Checked here too, against the cached registry, so bad requests are never queued
+            _, _, ErrInfo = get_script_registry().validate(_script, _args)
+            if ErrInfo:
+                return HttpResponseBadRequest(ErrInfo)
+
+            # Recorded as PENDING before it is queued, so the redirected page lists it
+            # without waiting for a worker to pick it up
+            task_id = uuid()
+            TaskResult.objects.create(
+                task_id=task_id, task_name=task.name, status=states.PENDING,
+                content_type='application/json', content_encoding='utf-8',
+                result=json.dumps({"input": _script, "status": states.PENDING}))
+            task.apply_async(args=[{"script": _script, "args": _args}], task_id=task_id)
+            return redirect(reverse("tasks") + '?task_id=' + task_id)
 
     return redirect("tasks") 
 
@@ -72,31 +92,58 @@ def cancel_task(request, task_id):
     abortable_result = AbortableAsyncResult(
         result.task_id, task_name=result.task_name, app=app)
     if not abortable_result.is_aborted():
+        # Fire and forget: the worker records REVOKED itself
         abortable_result.revoke(terminate=True)
-    time.sleep(1)
     return redirect("tasks")
 
+_registered_tasks = None
+
+def get_registered_tasks():
+    '''
+    Names of the registered Celery tasks, introspected once per process
+    :rtype: list
+    '''
+    global _registered_tasks
+    if _registered_tasks is None:
+        current_app.loader.import_default_modules()
+        _registered_tasks = sorted(name for name in current_app.tasks
+                                   if not name.startswith('celery.'))
+    return _registered_tasks
+
+def result_meta(result):
+    '''
+    Parses the JSON result stored by django_celery_results
+    :rtype: dict (empty when there is no result object)
+    '''
+    try:
+        meta = json.loads(result)
+    except (TypeError, ValueError):
+        return {}
+    return meta if isinstance(meta, dict) else {}
+
 def get_celery_all_tasks():
-    current_app.loader.import_default_modules()
-    tasks = list(sorted(name for name in current_app.tasks
-                        if not name.startswith('celery.')))
-    tasks = [{"name": name.split(".")[-1], "script":name} for name in tasks]
+    names = get_registered_tasks()
+    tasks = [{"name": name.split(".")[-1], "script":name} for name in names]
+
+    # Latest result of every task in one query, served by the (task_name, date_created) index
+    latest = TaskResult.objects.filter(task_name__in=names).annotate(
+        rank=Window(RowNumber(), partition_by=[F('task_name')],
+                    order_by=[F('date_created').desc(), F('id').desc()])
+    ).filter(rank=1).only('task_id', 'task_name', 'status', 'result', 'date_created', 'date_done')
+    latest = {result.task_name: result for result in latest}
+
     for task in tasks:
-        last_task = TaskResult.objects.filter(
-            task_name=task["script"]).order_by("date_created").last()
+        last_task = latest.get(task["script"])
         if last_task:
             task["id"] = last_task.task_id
             task["has_result"] = True
             task["status"] = last_task.status
+            task["running"] = last_task.status in (states.PENDING, states.STARTED)
             task["successfull"] = last_task.status == "SUCCESS" or last_task.status == "STARTED"
             task["date_created"] = last_task.date_created
             task["date_done"] = last_task.date_done
             task["result"] = last_task.result
-
-            try:
-                task["input"] = json.loads(last_task.result).get("input")
-            except:
-                task["input"] = ''
+            task["input"] = result_meta(last_task.result).get("input") or ''
                 
     return tasks
 
@@ -116,38 +163,50 @@ def task_output(request):
 
 def task_log(request):
     '''
-    Returns a task LOG file (if located on disk) 
+    Returns a task LOG file (if located on disk), streamed from disk
     '''
 
     task_id  = request.GET.get('task_id')
     task     = TaskResult.objects.get(id=task_id)
-    task_log = 'NOT FOUND'
 
-    if not task: 
-        return ''
-
-    try: 
-
-        # Get logs file
-        all_logs = [f for f in listdir(settings.CELERY_LOGS_DIR) if isfile(join(settings.CELERY_LOGS_DIR, f))]
-        
-        for log in all_logs:
-
-            # Task HASH name is saved in the log name
-            if task.task_id in log:
-                
-                with open( os.path.join( settings.CELERY_LOGS_DIR, log) ) as f:
-                    
-                    # task_log -> JSON Format
-                    task_log = f.readlines() 
-
-                break    
-    
-    except Exception as e:
+    path = log_path(task.task_id)
+    if not path or not os.path.isfile(path):
+        return HttpResponse('NOT FOUND')
 
-         task_log = json.dumps( { 'Error CELERY_LOGS_DIR: ' : str( e) } )
+    return FileResponse(open(path, 'rb'), content_type='text/plain; charset=utf-8')
 
-    return HttpResponse(task_log)
+def task_log_stream(request):
+    '''
+    Tails a task LOG: returns the bytes after `offset` (at most `limit`, default
+    settings.CELERY_LOG_CHUNK_BYTES). Poll again with X-Log-Offset until
+    X-Task-Done is 1 and no bytes are left.
+    :param task_id str: Celery task id
+    :param offset int: Bytes already read
+    '''
+    task_id = request.GET.get('task_id', '')
+    try:
+        offset = max(int(request.GET.get('offset', 0)), 0)
+        limit = int(request.GET.get('limit', settings.CELERY_LOG_CHUNK_BYTES))
+        limit = max(1, min(limit, settings.CELERY_LOG_CHUNK_BYTES))
+    except ValueError:
+        return HttpResponseBadRequest('Invalid offset or limit')
+
+    path = log_path(task_id)
+    if not path:
+        raise Http404
+    try:
+        data, next_offset, size = read_log(path, offset, limit)
+    except OSError:
+        raise Http404
+
+    status = TaskResult.objects.filter(task_id=task_id).values_list('status', flat=True).first()
+    response = HttpResponse(data, content_type='text/plain; charset=utf-8')
+    response['X-Log-Offset'] = str(next_offset)
+    response['X-Log-Size'] = str(size)
+    response['X-Task-Status'] = status or states.PENDING
+    response['X-Task-Done'] = '1' if status in states.READY_STATES else '0'
+    response['Cache-Control'] = 'no-store'
+    return response
 
 def download_log_file(request, file_path):
     path = file_path.replace('%slash%', '/')
@@ -11,6 +11,9 @@ npx tailwindcss -i ./static/assets/style.css -o ./static/dist/css/output.css
 python -m pip install --upgrade pip
 pip install -r requirements.txt
 
+# Fetch the CEC module catalog (settings.MODULE_DB_URL) unless already present
+python manage.py refresh_module_catalog --if-missing
+
 # Collect Static
 python manage.py collectstatic --no-input
 
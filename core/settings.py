@@ -135,6 +135,26 @@ else:
     }
 
 
+# Cache
+# Uses Redis when CACHE_URL is set (e.g. redis://redis:6379/1), local memory otherwise
+
+CACHE_URL = os.environ.get("CACHE_URL")
+
+if CACHE_URL:
+    CACHES = {
+        'default': {
+            'BACKEND' : 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -185,13 +205,125 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 
+# ### PV Module Catalog ###
+
+# Local CEC module database, refresh via `manage.py refresh_module_catalog [<csv or url>]`.
+# Deploys fetch it from MODULE_DB_URL with `refresh_module_catalog --if-missing` (build.sh, Dockerfile)
+MODULE_DB_PATH = os.environ.get("MODULE_DB_PATH", os.path.join(BASE_DIR, "module_db.csv"))
+MODULE_DB_URL  = os.environ.get("MODULE_DB_URL",
+                                "https://raw.githubusercontent.com/streetplantsolar/pv_ivy_web/refs/heads/main/module_db.csv")
+
+# Page size limit for /api/modules/ (the search index is built once per catalog revision)
+MODULE_SEARCH_MAX_PAGE_SIZE = 1000
+
+# Limits for /api/iv-curve/batch/
+IV_CURVE_BATCH_MAX  = int(os.environ.get("IV_CURVE_BATCH_MAX", 10000))
+IV_CURVE_MAX_POINTS = 1000
+
+# Limit for /api/iv-curve/array/ (strings x modules x bypass diodes)
+IV_ARRAY_MAX_SUBSTRINGS = int(os.environ.get("IV_ARRAY_MAX_SUBSTRINGS", 200000))
+
+# IV-curve cache: inputs are quantized, then served from an in-process LRU
+# backed by the shared Django cache (IV_CURVE_CACHE_ALIAS, set to '' to disable)
+IV_CURVE_IRRADIANCE_STEP  = 1.0   # W/m2
+IV_CURVE_TEMPERATURE_STEP = 0.1   # degC
+IV_CURVE_CACHE_SIZE       = int(os.environ.get("IV_CURVE_CACHE_SIZE", 2048))
+IV_CURVE_CACHE_ALIAS      = os.environ.get("IV_CURVE_CACHE_ALIAS", "default")
+IV_CURVE_CACHE_TIMEOUT    = 60*60*24
+IV_CURVE_CACHE_MAX_AGE    = 60*60  # Cache-Control max-age for browsers / nginx
+
+# Precomputed IV-curve surfaces (`manage.py build_iv_surfaces`): /api/iv-curve/
+# interpolates inside the grid when the cell error is within IV_SURFACE_MAX_ERROR
+# (relative to Isc and to each key point), and solves exactly otherwise
+IV_SURFACE_DIR         = os.environ.get("IV_SURFACE_DIR", os.path.join(BASE_DIR, "artifacts", "surfaces"))
+IV_SURFACE_IRRADIANCE  = [25, 50, 75, 100, 150] + list(range(200, 1401, 50))  # W/m2
+IV_SURFACE_TEMPERATURE = list(range(-20, 86, 5))                             # degC
+IV_SURFACE_MAX_ERROR   = float(os.environ.get("IV_SURFACE_MAX_ERROR", 0.005))
+
+# Thread pool running solver / inference work for the async endpoints
+# (/api/iv-curve/async/, /api/detect-anomaly/async/); past COMPUTE_POOL_MAX_PENDING
+# queued or running jobs they answer 503 instead of queueing more
+COMPUTE_POOL_WORKERS     = int(os.environ.get("COMPUTE_POOL_WORKERS", os.cpu_count() or 1))
+COMPUTE_POOL_MAX_PENDING = int(os.environ.get("COMPUTE_POOL_MAX_PENDING", 256))
+
+# ### Anomaly Classifier Artifacts ###
+
+ANOMALY_SCALER_PATH     = os.environ.get("ANOMALY_SCALER_PATH"    , os.path.join(BASE_DIR, "scaler.pkl"))
+ANOMALY_CLASSIFIER_PATH = os.environ.get("ANOMALY_CLASSIFIER_PATH", os.path.join(BASE_DIR, "random_forest_classifier.pkl"))
+
+# Pure-NumPy compilation of the two pickles (`manage.py export_anomaly_forest`);
+# served instead of them, without importing sklearn, whenever the file exists
+ANOMALY_COMPILED_PATH   = os.environ.get("ANOMALY_COMPILED_PATH"  , os.path.join(BASE_DIR, "random_forest_compiled.npz"))
+
+# Versioned output of `manage.py train_anomaly_classifier`
+ANOMALY_ARTIFACTS_DIR   = os.environ.get("ANOMALY_ARTIFACTS_DIR"  , os.path.join(BASE_DIR, "artifacts", "anomaly"))
+
+# Limit for /api/detect-anomaly/batch/
+ANOMALY_BATCH_MAX = int(os.environ.get("ANOMALY_BATCH_MAX", 10000))
+
+# Traces classified per predict call while streaming /api/detect-anomaly/upload/
+ANOMALY_UPLOAD_BATCH = 1000
+
+# Micro-batching of single-curve /api/detect-anomaly/ requests: the first request
+# waits up to the window (0 disables) for others, up to MAX rows per predict call;
+# past MAX_QUEUE waiting requests new ones get 503. Metrics on /api/compute/
+ANOMALY_MICRO_BATCH_WINDOW_MS = float(os.environ.get("ANOMALY_MICRO_BATCH_WINDOW_MS", 3))
+ANOMALY_MICRO_BATCH_MAX       = int(os.environ.get("ANOMALY_MICRO_BATCH_MAX", 64))
+ANOMALY_MICRO_BATCH_MAX_QUEUE = int(os.environ.get("ANOMALY_MICRO_BATCH_MAX_QUEUE", 4096))
+
+# Measurements stored per bulk INSERT when classified curves carry a site / string
+MEASUREMENT_INSERT_BATCH = int(os.environ.get("MEASUREMENT_INSERT_BATCH", 1000))
+
+# Row limit for /api/measurements/
+MEASUREMENT_PAGE_MAX = 1000
+
+# ### Fleet Analysis ###
+
+# Chunk files of running jobs, on storage shared by the web and Celery workers
+FLEET_WORK_DIR     = os.environ.get("FLEET_WORK_DIR"    , os.path.join(BASE_DIR, "artifacts", "fleet", "work"))
+
+# Merged per-curve results (<task id>.csv)
+FLEET_RESULTS_DIR  = os.environ.get("FLEET_RESULTS_DIR" , os.path.join(BASE_DIR, "artifacts", "fleet", "results"))
+
+# Curves per chunk task: one feature extraction + predict call each
+FLEET_CHUNK_CURVES = int(os.environ.get("FLEET_CHUNK_CURVES", 5000))
+
+# ### Energy Simulation ###
+
+# Local weather / profile files selectable by name on /api/energy/
+WEATHER_DATA_DIR   = os.environ.get("WEATHER_DATA_DIR"  , os.path.join(BASE_DIR, "weather"))
+
+# Series written by background simulations (<task id>.npz)
+ENERGY_RESULTS_DIR = os.environ.get("ENERGY_RESULTS_DIR", os.path.join(BASE_DIR, "artifacts", "energy"))
+
+# Profile samples simulated per vectorized singlediode call
+ENERGY_CHUNK_SIZE  = int(os.environ.get("ENERGY_CHUNK_SIZE", 100000))
+
 # ### Async Tasks (Celery) Settings ###
 
 CELERY_SCRIPTS_DIR        = os.path.join(BASE_DIR, "tasks_scripts" )
 
+# The script list is cached per process and rescanned when the directory
+# changes, or after this many seconds to pick up scripts edited in place
+CELERY_SCRIPTS_RESCAN     = 60
+
 CELERY_LOGS_URL           = "/tasks_logs/"
 CELERY_LOGS_DIR           = os.path.join(BASE_DIR, "tasks_logs"    )
 
+# execute_script: seconds between output updates in the result backend,
+# and characters of output kept there (the full output is in the log file)
+CELERY_SCRIPT_PROGRESS_INTERVAL = 1
+CELERY_SCRIPT_LOG_TAIL          = 64 * 1024
+
+# Task logs: bytes per read of /tasks/tasks/log/stream/, cache lifetime of the
+# task id -> log file index, bytes shown by the log_to_text template filter
+CELERY_LOG_CHUNK_BYTES          = 1024 * 1024
+CELERY_LOG_INDEX_CACHE_TIMEOUT  = 60 * 60 * 24
+CELERY_LOG_PREVIEW_BYTES        = 64 * 1024
+
+# Rows per page of the results list on the tasks page
+TASK_RESULTS_PAGE_SIZE          = 50
+
 CELERY_BROKER_URL         = os.environ.get("CELERY_BROKER", "redis://redis:6379")
 CELERY_RESULT_BACKEND     = os.environ.get("CELERY_BROKER", "redis://redis:6379")
 
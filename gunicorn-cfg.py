@@ -3,9 +3,29 @@
 Copyright (c) 2019 - present AppSeed.us
 """
 
+import os
+
 bind = '0.0.0.0:5005'
 workers = 1
+# Async endpoints need an ASGI worker:
+#   GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker gunicorn --config gunicorn-cfg.py core.asgi:application
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'sync')
 accesslog = '-'
 loglevel = 'debug'
 capture_output = True
 enable_stdio_inheritance = True
+
+def post_worker_init(worker):
+    # Heavy numeric imports are deferred at module level; pay for them here,
+    # together with the anomaly model, before the first request arrives
+    import pandas, pvlib  # noqa: F401
+    try:
+        from apps.api.model_registry import get_registry
+        get_registry().load()
+    except Exception as e:
+        worker.log.warning('Anomaly model not preloaded: %s', e)
+    try:
+        from apps.api.module_search import get_search_index
+        get_search_index()
+    except Exception as e:
+        worker.log.warning('Module search index not preloaded: %s', e)
@@ -0,0 +1,150 @@
+# -*- encoding: utf-8 -*-
+"""
+Registry of the scripts runnable by `execute_script` (settings.CELERY_SCRIPTS_DIR).
+
+The directory is listed once and the result cached per process, in the web
+workers and the Celery workers alike. A single stat of the directory on each
+access detects added, removed or renamed scripts. In-place edits do not
+change the directory mtime, so the listing is also refreshed after
+settings.CELERY_SCRIPTS_RESCAN seconds. Checking a requested script is a
+dictionary lookup.
+
+A script may declare its arguments with a top-level literal, read without
+importing the script:
+
+    ARGS = [{"name": "table", "required": True, "help": "Table to clean"}]
+
+Scripts without ARGS accept any arguments.
+"""
+
+import ast
+import os
+import shlex
+import threading
+import time
+from collections import namedtuple
+
+from django.conf import settings
+
+
+IGNORED_EXTENSIONS = ['db', 'txt']
+
+ScriptInfo = namedtuple('ScriptInfo', ['name', 'path', 'size', 'mtime', 'args'])
+
+
+def declared_args(path):
+    """
+    Returns the ARGS literal of a Python script, or None when it declares none
+    """
+    try:
+        with open(path, 'rb') as f:
+            tree = ast.parse(f.read(), path)
+    except (OSError, SyntaxError, ValueError):
+        return None
+
+    for node in tree.body:
+        if (isinstance(node, ast.Assign) and len(node.targets) == 1
+                and isinstance(node.targets[0], ast.Name) and node.targets[0].id == 'ARGS'):
+            try:
+                args = ast.literal_eval(node.value)
+            except ValueError:
+                return None
+            if isinstance(args, (list, tuple)) and all(isinstance(arg, dict) and 'name' in arg for arg in args):
+                return list(args)
+            return None
+    return None
+
+
+class ScriptRegistry:
+
+    def __init__(self, directory, max_age):
+        self.directory = directory
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._scripts = None
+        self._error = None
+        self._dir_mtime = None
+        self._scanned = 0.0
+
+    def _scan(self):
+        scripts = {}
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                ext = entry.name.split(".")[-1]
+                if ext in IGNORED_EXTENSIONS or not entry.is_file():
+                    continue
+                stat = entry.stat()
+                args = declared_args(entry.path) if ext == 'py' else None
+                scripts[entry.name] = ScriptInfo(entry.name, entry.path, stat.st_size, stat.st_mtime, args)
+        return scripts
+
+    def _current(self):
+        try:
+            dir_mtime = os.stat(self.directory).st_mtime_ns
+        except OSError as e:
+            dir_mtime, error = None, 'Error CELERY_SCRIPTS_DIR: ' + str(e)
+        else:
+            error = None
+
+        if (self._scripts is not None or self._error is not None) and dir_mtime == self._dir_mtime \
+                and time.monotonic() - self._scanned < self.max_age:
+            return self._scripts, self._error
+
+        with self._lock:
+            scripts = None
+            if error is None:
+                try:
+                    scripts = self._scan()
+                except OSError as e:
+                    error = 'Error CELERY_SCRIPTS_DIR: ' + str(e)
+            self._scripts, self._error = scripts, error
+            self._dir_mtime, self._scanned = dir_mtime, time.monotonic()
+            return scripts, error
+
+    def scripts(self):
+        """
+        :rtype: (dict name -> ScriptInfo, None) or (None, error message)
+        """
+        return self._current()
+
+    def get(self, name):
+        """
+        :rtype: ScriptInfo, None when there is no such script
+        """
+        scripts, _ = self._current()
+        return scripts.get(name) if scripts and name else None
+
+    def validate(self, name, args):
+        """
+        Checks a requested script and its argument string against the registry
+        :rtype: (ScriptInfo, argument list, None) or (None, None, error message)
+        """
+        info = self.get(name)
+        if info is None:
+            return None, None, 'Unknown script: ' + str(name)
+        try:
+            values = shlex.split(args or '')
+        except ValueError as e:
+            return None, None, 'Invalid arguments: ' + str(e)
+        if info.args is not None:
+            required = sum(1 for arg in info.args if arg.get('required'))
+            if not required <= len(values) <= len(info.args):
+                names = ' '.join(arg['name'] for arg in info.args)
+                return None, None, f'{name} expects {required} to {len(info.args)} arguments: {names}'
+        return info, values, None
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_script_registry():
+    """
+    Returns the process-wide registry of settings.CELERY_SCRIPTS_DIR
+    """
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ScriptRegistry(settings.CELERY_SCRIPTS_DIR, settings.CELERY_SCRIPTS_RESCAN)
+    return _registry
@@ -1,7 +1,5 @@
-import os, time, subprocess
+import os, sys, time, logging, subprocess
 import datetime
-from os import listdir
-from os.path import isfile, join
 
 from .celery import app
 from celery.contrib.abortable import AbortableTask
@@ -9,77 +7,81 @@ from django_celery_results.models import TaskResult
 
 from django.contrib.auth.models import User
 from django.conf import settings
+from apps.tasks.logs import register_log
+from home.scripts import get_script_registry
 from celery.exceptions import Ignore, TaskError
 
+logger = logging.getLogger(__name__)
+
 
 def get_scripts():
     """
-    Returns all scripts from 'ROOT_DIR/celery_scripts'
+    Returns all scripts from 'ROOT_DIR/celery_scripts', from the cached script registry
     """
-    raw_scripts = []
-    scripts     = []
-    ignored_ext = ['db', 'txt']
-
-    try:
-        raw_scripts = [f for f in listdir(settings.CELERY_SCRIPTS_DIR) if isfile(join(settings.CELERY_SCRIPTS_DIR, f))]
-    except Exception as e:
-        return None, 'Error CELERY_SCRIPTS_DIR: ' + str( e ) 
-
-    for filename in raw_scripts:
+    scripts, error = get_script_registry().scripts()
+    if error:
+        return None, error
+    return sorted(scripts), None
 
-        ext = filename.split(".")[-1]
-        if ext not in ignored_ext:
-           scripts.append( filename )
-
-    return scripts, None           
-
-def write_to_log_file(logs, script_name):
+def log_file_for(script_name, task_id):
     """
-    Writes logs to a log file with formatted name in the CELERY_LOGS_DIR directory.
+    Returns a new log file path with formatted name in the CELERY_LOGS_DIR directory.
+    The task id keeps apart two runs of a script started in the same second.
     """
     script_base_name = os.path.splitext(script_name)[0]  # Remove the .py extension
     current_time = datetime.datetime.now().strftime("%y%m%d-%H%M%S")
-    log_file_name = f"{script_base_name}-{current_time}.log"
-    log_file_path = os.path.join(settings.CELERY_LOGS_DIR, log_file_name)
-    
-    with open(log_file_path, 'w') as log_file:
-        log_file.write(logs)
-    
-    return log_file_path
+    log_file_name = f"{script_base_name}-{current_time}-{task_id}.log"
+    return os.path.join(settings.CELERY_LOGS_DIR, log_file_name)
 
 @app.task(bind=True, base=AbortableTask)
 def execute_script(self, data: dict):
     """
     This task executes scripts found in settings.CELERY_SCRIPTS_DIR and logs are later generated and stored in settings.CELERY_LOGS_DIR
+    Output (stdout and stderr) is appended to the log file line by line while the script runs, and its
+    tail is published to the result backend at most every CELERY_SCRIPT_PROGRESS_INTERVAL seconds.
+    The task finishes as soon as the script exits.
     :param data dict: contains data needed for task execution. Example `input` which is the script to be executed.
     :rtype: None
     """
     script = data.get("script")
-    args   = data.get("args")
-
-    print( '> EXEC [' + script + '] -> ('+args+')' ) 
-
-    scripts, ErrInfo = get_scripts()
-
-    if script and script in scripts:
-        # Executing related script
-        script_path = os.path.join(settings.CELERY_SCRIPTS_DIR, script)
-        process = subprocess.Popen(
-            f"python {script_path} {args}", shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        time.sleep(8)
-
-        exit_code = process.wait()
-        error = False
-        status = "STARTED"
-        if exit_code == 0:  # If script execution successfull
-            logs = process.stdout.read().decode()
-            status = "SUCCESS"
-        else:
-            logs = process.stderr.read().decode()
-            error = True
-            status = "FAILURE"
-
-
-        log_file = write_to_log_file(logs, script)
-
-        return {"logs": logs, "input": script, "error": error, "output": "", "status": status, "log_file": log_file}
\ No newline at end of file
+    args   = data.get("args") or ''
+
+    # Checked again here, the registry may have been rescanned since the request was queued
+    info, values, ErrInfo = get_script_registry().validate(script, args)
+    if ErrInfo:
+        logger.warning('Rejected script %s: %s', script, ErrInfo)
+        return {"logs": ErrInfo, "input": script, "error": True, "output": "", "status": "FAILURE", "log_file": ""}
+
+    # Executing related script
+    logger.info('Executing script %s with arguments %s', script, values)
+    script_path = info.path
+    log_file = log_file_for(script, self.request.id)
+    os.makedirs(settings.CELERY_LOGS_DIR, exist_ok=True)
+
+    # One merged pipe, drained while the script runs: nothing can fill up and block it
+    process = subprocess.Popen(
+        [sys.executable, script_path] + values,
+        stdout=subprocess.PIPE, stderr=subprocess.STDOUT, bufsize=0)
+
+    # Indexed and published right away so the log can be followed while the script runs
+    register_log(self.request.id, log_file)
+    self.update_state(state="STARTED", meta={"logs": "", "input": script, "status": "STARTED", "log_file": log_file})
+
+    tail = ''
+    published = time.monotonic()
+    with open(log_file, 'wb') as log:
+        for line in iter(process.stdout.readline, b''):
+            log.write(line)
+            log.flush()
+            tail = (tail + line.decode(errors='replace'))[-settings.CELERY_SCRIPT_LOG_TAIL:]
+            if time.monotonic() - published >= settings.CELERY_SCRIPT_PROGRESS_INTERVAL:
+                self.update_state(state="STARTED", meta={
+                    "logs": tail, "input": script, "status": "STARTED", "log_file": log_file})
+                published = time.monotonic()
+
+    # stdout is at EOF: the script has exited
+    exit_code = process.wait()
+    error = exit_code != 0
+    status = "FAILURE" if error else "SUCCESS"
+
+    return {"logs": tail, "input": script, "error": error, "output": "", "status": status, "log_file": log_file}
@@ -9,6 +9,8 @@ import os
 from django import template
 from django.conf import settings
 
+from apps.tasks.logs import read_log_tail
+
 register = template.Library()
 
 def date_format(date):
@@ -50,15 +52,15 @@ register.filter("log_file_path", log_file_path)
 
 
 def log_to_text(path):
+    """
+    Returns the end of a log file (settings.CELERY_LOG_PREVIEW_BYTES), never the whole file
+    """
     path = path.lstrip('/')
 
     full_path = os.path.join(settings.CELERY_LOGS_DIR, path)
 
     try:
-        with open(full_path, 'r') as file:
-            text = file.read()
-        
-        return text
+        return read_log_tail(full_path, settings.CELERY_LOG_PREVIEW_BYTES)
     except:
         return 'NO LOGS'
 
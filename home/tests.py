@@ -1,3 +1,97 @@
-from django.test import TestCase
+import os
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from django.test import SimpleTestCase
+
+from home.scripts import ScriptRegistry, declared_args
+from home.tasks import log_file_for
+
+
+class LogFileTests(SimpleTestCase):
+
+    def test_runs_started_in_the_same_second_get_their_own_file(self):
+        with mock.patch('home.tasks.datetime') as clock:
+            clock.datetime.now.return_value.strftime.return_value = '260101-120000'
+            first = log_file_for('report.py', 'task-1')
+            second = log_file_for('report.py', 'task-2')
+        self.assertNotEqual(first, second)
+        self.assertTrue(first.endswith('report-260101-120000-task-1.log'))
+
+
+class ScriptRegistryTests(SimpleTestCase):
+
+    SCRIPTS = {
+        'clean.py': 'ARGS = [{"name": "table", "required": True}, {"name": "days"}]\n',
+        'free.py': 'print("any arguments")\n',
+        'notes.txt': 'not a script\n',
+    }
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        for name, source in self.SCRIPTS.items():
+            with open(os.path.join(directory.name, name), 'w') as f:
+                f.write(source)
+        self.registry = ScriptRegistry(directory.name, max_age=60)
+
+    def test_listing(self):
+        scripts, error = self.registry.scripts()
+        self.assertIsNone(error)
+        self.assertEqual(sorted(scripts), ['clean.py', 'free.py'])
+        self.assertIsNone(scripts['free.py'].args)
+
+    def test_required_and_optional_args(self):
+        for args, values in (('users', ['users']), ('users 30', ['users', '30']),
+                             ('"audit log" 7', ['audit log', '7'])):
+            info, parsed, error = self.registry.validate('clean.py', args)
+            self.assertIsNone(error)
+            self.assertEqual(info.name, 'clean.py')
+            self.assertEqual(parsed, values)
+
+        for args in ('', None, 'users 30 extra'):
+            info, parsed, error = self.registry.validate('clean.py', args)
+            self.assertIsNone(info)
+            self.assertEqual(error, 'clean.py expects 1 to 2 arguments: table days')
+
+    def test_undeclared_args_accept_anything(self):
+        _, parsed, error = self.registry.validate('free.py', 'a b c d')
+        self.assertIsNone(error)
+        self.assertEqual(parsed, ['a', 'b', 'c', 'd'])
+
+    def test_malformed_args(self):
+        info, parsed, error = self.registry.validate('free.py', 'users "unclosed')
+        self.assertIsNone(info)
+        self.assertTrue(error.startswith('Invalid arguments: '), error)
+
+    def test_unknown_script(self):
+        for name in ('missing.py', 'notes.txt', '../clean.py', '', None):
+            info, _, error = self.registry.validate(name, '')
+            self.assertIsNone(info)
+            self.assertEqual(error, 'Unknown script: ' + str(name))
+
+    def test_new_scripts_are_picked_up(self):
+        self.assertIsNone(self.registry.get('added.py'))
+        path = os.path.join(self.registry.directory, 'added.py')
+        with open(path, 'w') as f:
+            f.write('')
+        # The directory mtime may not move within its resolution: force the rescan
+        self.registry.max_age = 0
+        self.assertEqual(self.registry.get('added.py').path, path)
+
+
+class DeclaredArgsTests(SimpleTestCase):
+
+    def parse(self, source):
+        with tempfile.NamedTemporaryFile('w', suffix='.py', delete=False) as f:
+            f.write(source)
+        self.addCleanup(os.unlink, f.name)
+        return declared_args(f.name)
+
+    def test_literal(self):
+        self.assertEqual(self.parse('ARGS = [{"name": "a"}]\n'), [{'name': 'a'}])
+
+    def test_not_a_literal(self):
+        self.assertIsNone(self.parse('ARGS = load()\n'))
+        self.assertIsNone(self.parse('ARGS = ["a"]\n'))
+        self.assertIsNone(self.parse('def broken(:\n'))
@@ -1,4 +1,4 @@
-import { fetchModuleData } from './modelData.js';
+import { fetchManufacturers, fetchManufacturerModels } from './modelData.js';
 
 let currentChart = null;
 let currentManufacturer = null;
@@ -33,40 +33,43 @@ const renderPVChart = async (manufacturer, model) => {
     modsInput.value = modules;
   }
 
-  const degradationRate = parseFloat(degInput.value) / 100; // %
-  const startDate = new Date(startDateInput.value);
-  const endDate = new Date(endDateInput.value);
-  const diffYears = (endDate - startDate) / (365.25 * 24 * 3600 * 1000);
-  const totalDegradation = degradationRate * diffYears;
-  const scalingFactor = Math.sqrt(1 - totalDegradation);
+  // Degradation (%/year between the two dates) is applied server-side
+  const degradationRate = parseFloat(degInput.value) || 0;
+  const degradationParams = `&degradation_rate=${degradationRate}&start_date=${startDateInput.value}&end_date=${endDateInput.value}`;
 
-  const url = `/api/iv-curve/?manufacturer=${encodeURIComponent(manufacturer)}&model=${encodeURIComponent(model)}&temperature=${temperature}&irradiance=${irradiance}&modules=${modules}`;
+  const url = `/api/iv-curve/?manufacturer=${encodeURIComponent(manufacturer)}&model=${encodeURIComponent(model)}&temperature=${temperature}&irradiance=${irradiance}&modules=${modules}${degradationParams}`;
   const res = await fetch(url);
   const data = await res.json();
 
-  if (!data.voltage || !data.current) {
+  if (!data.voltage || !data.current || !data.key_points) {
     console.warn('Invalid IV curve response:', data);
     return;
   }
 
   const ivData = data.voltage.map((v, i) => ({
-    x: v * scalingFactor,
-    y: data.current[i] * scalingFactor
+    x: v,
+    y: data.current[i]
   }));
   const powerData = data.voltage.map((v, i) => ({
-    x: v * scalingFactor,
-    y: data.power[i] * (1 - totalDegradation)
+    x: v,
+    y: data.power[i]
   }));
 
-  // Calculate modeled values for the table
-  const modeledVoc = Math.max(...data.voltage) * scalingFactor;
-  const modeledIsc = Math.max(...data.current) * scalingFactor;
-
-  const powerValues = data.voltage.map((v, i) => v * data.current[i]);
-  const maxPowerIndex = powerValues.indexOf(Math.max(...powerValues));
-  const modeledVmp = data.voltage[maxPowerIndex] * scalingFactor;
-  const modeledImp = data.current[maxPowerIndex] * scalingFactor;
-  const modeledPmp = modeledVmp * modeledImp * (1 - totalDegradation);
+  // Modeled values for the table: exact single-diode key points from the API
+  const keyPoints = data.key_points;
+  const modeledVoc = keyPoints.v_oc;
+  const modeledIsc = keyPoints.i_sc;
+  const modeledVmp = keyPoints.v_mp;
+  const modeledImp = keyPoints.i_mp;
+  const modeledPmp = keyPoints.p_mp;
+
+  // Degraded key points, used to normalize measured curves in anomaly detection
+  window.modeledKeyPoints = {
+    i_sc: modeledIsc,
+    v_oc: modeledVoc,
+    i_mp: modeledImp,
+    v_mp: modeledVmp
+  };
 
   const tableBody = document.querySelector('#module-info-table tbody');
   tableBody.querySelectorAll('tr').forEach(row => {
@@ -154,22 +157,25 @@ const renderPVChart = async (manufacturer, model) => {
 };
 
 const initPVChart = async () => {
-  const modules = await fetchModuleData();
-  console.log('Parsed Module Data:', modules);
+  const manufacturers = await fetchManufacturers();
+  // Models of the selected manufacturer only, fetched on demand
+  let modules = [];
 
   const makeSelect = document.getElementById('make-select');
   const modelSelect = document.getElementById('model-select');
 
-  const uniqueManufacturers = [...new Set(modules.map(m => m.Manufacturer))];
   makeSelect.innerHTML =
     `<option value="">Select Manufacturer</option>` +
-    uniqueManufacturers.map(m => `<option value="${m}">${m}</option>`).join('');
+    manufacturers.map(m => `<option value="${m}">${m}</option>`).join('');
 
-  makeSelect.addEventListener('change', () => {
+  makeSelect.addEventListener('change', async () => {
     const selected = makeSelect.value;
-    const models = modules
-      .filter(m => m.Manufacturer === selected)
-      .map(m => m.Model);
+    const loaded = selected ? await fetchManufacturerModels(selected) : [];
+    if (makeSelect.value !== selected) {
+      return;  // A newer selection is loading
+    }
+    modules = loaded;
+    const models = modules.map(m => m.Model);
 
     modelSelect.innerHTML =
       `<option value="">Select Model</option>` +
@@ -403,6 +409,7 @@ document.getElementById('detect-anomaly').addEventListener('click', async () =>
       measured_current,
       modeled_voltage,
       modeled_current,
+      modeled_key_points: window.modeledKeyPoints,
       module_type_code: 0
     })
   });
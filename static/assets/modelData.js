@@ -1,26 +1,41 @@
 // modelData.js
 
-export const fetchModuleData = async () => {
-    const url = 'https://raw.githubusercontent.com/streetplantsolar/pv_ivy_web/refs/heads/main/module_db.csv';
+// Manufacturer / technology lists for the dropdowns (small, cached by the browser)
+export const fetchManufacturers = async () => {
     try {
-        const response = await fetch(url);
-        const text = await response.text();
-        const [headerLine, ...lines] = text.trim().split("\n");
-        const headers = headerLine.split(",").map(h => h.trim());
-
-        const rows = lines.map(line => {
-            const cols = line.split(",");
-            const row = {};
-            headers.forEach((h, i) => {
-                row[h] = isNaN(cols[i]) ? cols[i]?.trim() : parseFloat(cols[i]);
-            });
-            return row;
-        });
-
-        console.log("Parsed module data:", rows);
-        return rows;
+        const response = await fetch('/api/modules/manufacturers/');
+        const data = await response.json();
+        return data.manufacturers || [];
     } catch (e) {
-        console.error("Failed to fetch module data:", e);
+        console.error("Failed to fetch manufacturers:", e);
         return [];
     }
 };
+
+// One page of modules; see /api/modules/ for the query and filter fields
+export const searchModules = async (params = {}) => {
+    const query = new URLSearchParams(
+        Object.entries(params).filter(([, value]) => value !== undefined && value !== null && value !== '')
+    );
+    try {
+        const response = await fetch(`/api/modules/?${query}`);
+        return await response.json();
+    } catch (e) {
+        console.error("Failed to search modules:", e);
+        return { total: 0, results: [] };
+    }
+};
+
+// Every model of one manufacturer, with the fields shown in the module table.
+// Pages are requested until `total` is reached (page_size is capped server-side)
+export const fetchManufacturerModels = async (manufacturer) => {
+    const models = [];
+    for (let page = 1; ; page++) {
+        const data = await searchModules({ manufacturer, page, page_size: 1000 });
+        const results = data.results || [];
+        models.push(...results);
+        if (!results.length || models.length >= (data.total || 0)) {
+            return models;
+        }
+    }
+};